@@ -0,0 +1,361 @@
+"""
+Conversor por lotes sin navegador: documentos PDF/DOCX/TXT -> audiolibros WAV.
+
+Reparte los chunks de todos los libros entre varios procesos (uno por núcleo o pareja
+de núcleos), cada uno con su propio modelo Kokoro. Solo el proceso coordinador toca el
+estado de los proyectos; los procesos de síntesis únicamente escriben los ficheros de
+cada chunk. Usa la misma carpeta de proyectos que la app, así que una ejecución
+interrumpida se reanuda volviendo a lanzar el mismo comando (los libros se reconocen
+por el hash de su contenido). No lanzar a la vez que el servidor sobre la misma carpeta.
+
+Uso:
+    python Texto_a_voz_batch/batch_convert.py libros/ "otros/*.pdf" --voice em_alex --lang es --output audiolibros
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from manager import BatchManager
+from processor import TextProcessor
+from audio_format import OUTPUT_PRESETS
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# Manager del proceso de síntesis (uno por proceso del pool)
+_worker = None
+
+def _init_worker(projects_dir, model_path, voices_path, session_config, model_variants, default_variant):
+    global _worker
+    # Solo carga la variante del lote y no arranca los servicios de la app (render_only)
+    _worker = BatchManager(projects_dir, model_path, voices_path, background_load=False, warmup=False,
+                           session_config=session_config, model_variants=model_variants,
+                           default_variant=default_variant, render_only=True)
+
+def _render(job):
+    """Sintetiza un chunk en el proceso de trabajo. No lanza: devuelve el error."""
+    start = time.perf_counter()
+    try:
+        metadata, _ = _worker.render_chunk(**job)
+        audio_seconds = sum(m["duration"] for m in metadata)
+        return job["project_id"], job["chunk_id"], audio_seconds, time.perf_counter() - start, None
+    except Exception as e:
+        return job["project_id"], job["chunk_id"], 0.0, time.perf_counter() - start, str(e)
+
+def collect_inputs(patterns):
+    """Expande directorios (recursivo) y patrones glob a una lista de documentos soportados."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.extend(os.path.join(root, n) for n in names)
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    seen = set()
+    result = []
+    for f in sorted(files):
+        path = os.path.abspath(f)
+        if path.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(path) and path not in seen:
+            seen.add(path)
+            result.append(path)
+    return result
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def safe_filename(name, fallback):
+    name = "".join(c for c in name if c.isprintable())
+    name = re.sub(r'[\\/:*?"<>|]', '', name).strip(' ._')
+    return name or fallback
+
+class BatchRun:
+    def __init__(self, manager, options):
+        self.manager = manager
+        self.options = options
+        self.books = {} # project_id -> resumen del libro
+        self._assembler = None # Hilo que ensambla y exporta los libros terminados (ver run)
+
+    def prepare(self, paths):
+        """Crea o reanuda un proyecto por documento."""
+        existing = {}
+        for p in self.manager.get_projects():
+            sha1 = (p.get("source") or {}).get("sha1")
+            if sha1:
+                existing[sha1] = p["id"]
+
+        for path in paths:
+            sha1 = file_sha1(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+            project_id = existing.get(sha1)
+            resumed = project_id is not None
+            has_work = True
+            if resumed:
+                # Limpiar restos de una ejecución interrumpida y reintentar errores
+                has_work = self.manager.reconcile_project(project_id)
+            else:
+                try:
+                    text = TextProcessor.extract_text(path)
+                    headings = TextProcessor.extract_headings(path)
+                    chunks = TextProcessor.split_into_chunks(text, target_len=self.options.chunk_len, chapter_breaks=True,
+                                                             headings=headings)
+                    chapters = TextProcessor.detect_chapters(chunks, headings)
+                except Exception as e:
+                    print(f"[ERROR] No se pudo leer {path}: {e}")
+                    self.books[path] = {"name": name, "source": path, "error": str(e), "failed": 1}
+                    continue
+                if not chunks:
+                    print(f"[AVISO] {path} no contiene texto, se omite.")
+                    continue
+                project_id = self.manager.create_project(
+                    name, chunks, self.options.voice, self.options.speed, self.options.lang,
+                    model_variant=self.options.variant, source={"path": path, "sha1": sha1}, chapters=chapters,
+                    output_format=self.options.audio
+                )
+                existing[sha1] = project_id
+
+            project = self.manager.get_project(project_id)
+            self.books[project_id] = {
+                "name": project["name"],
+                "source": path,
+                "resumed": resumed,
+                "total_chunks": project["total_chunks"],
+                "pending": [c["id"] for c in project["chunks"] if c["status"] != "completed"],
+                "characters": 0,
+                "done": 0,
+                "failed": 0,
+                "audio_seconds": 0.0,
+                "compute_seconds": 0.0,
+                "finished": bool(project.get("is_finished")) and not any(c["status"] != "completed" for c in project["chunks"]),
+                "output": None
+            }
+            state = "reanudado" if resumed else "nuevo"
+            print(f"[{state}] {project['name']}: {len(self.books[project_id]['pending'])}/{project['total_chunks']} chunks pendientes")
+            if resumed and has_work and not self.books[project_id]["pending"]:
+                # Todo el audio en disco pero sin ensamblar (caída durante el ensamblado):
+                # no queda ningún chunk que lo dispare, así que se ensambla y exporta aquí
+                print(f"[reanudado] {project['name']}: ensamblando el audio final")
+                self.finish(project_id)
+
+    def jobs(self):
+        for project_id, book in self.books.items():
+            for chunk_id in book.get("pending", []):
+                job = self.manager.get_chunk_job(project_id, chunk_id)
+                if job is not None:
+                    yield job
+
+    def run(self, executor):
+        """
+        Envía los chunks con un número acotado en vuelo y registra los resultados. Los
+        libros que se completan se ensamblan en otro hilo para no frenar el reparto de
+        chunks de los demás; run no vuelve hasta que terminan.
+        """
+        with ThreadPoolExecutor(max_workers=1) as assembler:
+            self._assembler = assembler
+            try:
+                self._dispatch(executor)
+            finally:
+                self._assembler = None
+
+    def _dispatch(self, executor):
+        in_flight = {}
+        jobs = self.jobs()
+        limit = max(1, self.options.workers) * 2
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < limit:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                self.manager.journal.begin(job["project_id"], job["chunk_id"])
+                future = executor.submit(_render, job)
+                in_flight[future] = len(job["text"])
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                characters = in_flight.pop(future)
+                self._record(*future.result(), characters=characters)
+
+    def _record(self, project_id, chunk_id, audio_seconds, compute_seconds, error, characters=0):
+        book = self.books[project_id]
+        book["compute_seconds"] += compute_seconds
+        if error:
+            book["failed"] += 1
+            print(f"[ERROR] {book['name']} chunk {chunk_id}: {error}")
+            self.manager.mark_chunk_result(project_id, chunk_id, ok=False)
+            return
+        book["done"] += 1
+        book["characters"] += characters
+        book["audio_seconds"] += audio_seconds
+        if self.manager.mark_chunk_result(project_id, chunk_id, ok=True, finish=False):
+            self._assembler.submit(self.finish, project_id)
+        if self.options.verbose:
+            print(f"  {book['name']}: chunk {chunk_id} listo ({audio_seconds:.0f}s de audio en {compute_seconds:.1f}s)")
+
+    def finish(self, project_id):
+        """Ensambla un libro completo y lo exporta."""
+        try:
+            if not self.manager._finish_project(project_id):
+                return
+        except Exception as e:
+            print(f"[ERROR] No se pudo ensamblar {self.books[project_id]['name']}: {e}")
+            return
+        self.books[project_id]["finished"] = True
+        self.export(project_id)
+
+    def export(self, project_id):
+        """Copia el audio final del proyecto (WAV, o M4B/Ogg con capítulos) a la carpeta de salida."""
+        book = self.books[project_id]
+        final_path = self.manager.final_audio_path(project_id)
+        if not self.options.output or final_path is None:
+            return
+        if self.options.format == "wav":
+            source_path, extension = final_path, os.path.splitext(final_path)[1]
+        else:
+            try:
+                source_path = self.manager.export_project(project_id, self.options.format)
+            except Exception as e:
+                print(f"[ERROR] No se pudo exportar {book['name']} a {self.options.format}: {e}")
+                return
+            extension = os.path.splitext(source_path)[1]
+        os.makedirs(self.options.output, exist_ok=True)
+        out_path = os.path.join(self.options.output, safe_filename(book["name"], project_id) + extension)
+        shutil.copyfile(source_path, out_path)
+        book["output"] = out_path
+        print(f"[OK] {book['name']} -> {out_path}")
+
+    def summary(self, wall_seconds):
+        books = list(self.books.values())
+        audio = sum(b.get("audio_seconds", 0.0) for b in books)
+        compute = sum(b.get("compute_seconds", 0.0) for b in books)
+        chunks = sum(b.get("done", 0) for b in books)
+        characters = sum(b.get("characters", 0) for b in books)
+        failed = sum(b.get("failed", 0) for b in books)
+        return {
+            "books": books,
+            "wall_seconds": wall_seconds,
+            "chunks_done": chunks,
+            "chunks_failed": failed,
+            "audio_seconds": audio,
+            "chunks_per_minute": chunks / wall_seconds * 60 if wall_seconds else 0.0,
+            "characters_per_second": characters / wall_seconds if wall_seconds else 0.0,
+            # RTF por proceso (cómputo / audio) y efectivo del lote (reloj / audio)
+            "rtf_per_worker": compute / audio if audio else None,
+            "rtf_wall": wall_seconds / audio if audio else None,
+        }
+
+def print_summary(summary):
+    print("\n================ RESUMEN ================")
+    for b in summary["books"]:
+        if "error" in b:
+            print(f"  ✗ {b['name']}: {b['error']}")
+            continue
+        state = "terminado" if b["finished"] else "incompleto"
+        print(f"  {'✓' if b['finished'] else '…'} {b['name']}: {state}, {b['done']} chunks nuevos, "
+              f"{b['failed']} fallidos, {b['audio_seconds'] / 60:.1f} min de audio")
+    print(f"Tiempo total: {summary['wall_seconds']:.1f}s")
+    print(f"Chunks: {summary['chunks_done']} ({summary['chunks_per_minute']:.1f}/min), fallidos: {summary['chunks_failed']}")
+    print(f"Audio generado: {summary['audio_seconds'] / 60:.1f} min, {summary['characters_per_second']:.0f} caracteres/s")
+    if summary["rtf_wall"] is not None:
+        print(f"RTF por proceso: {summary['rtf_per_worker']:.3f}  RTF efectivo del lote: {summary['rtf_wall']:.3f}")
+
+def parse_args(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Convierte carpetas de documentos en audiolibros sin navegador.")
+    parser.add_argument("inputs", nargs="+", help="Directorios, ficheros o patrones glob (PDF, DOCX, TXT)")
+    parser.add_argument("--output", default="audiolibros", help="Carpeta donde copiar los audiolibros terminados")
+    parser.add_argument("--format", choices=["wav", "m4b", "ogg"], default="wav",
+                        help="Formato de salida (m4b/ogg incluyen capítulos)")
+    parser.add_argument("--projects-dir", default=os.path.join(ROOT, "projects"))
+    parser.add_argument("--model", default=os.path.join(ROOT, "kokoro-v1.0.onnx"))
+    parser.add_argument("--voices", default=os.path.join(ROOT, "voices-v1.0.bin"))
+    parser.add_argument("--variant", choices=["fp32", "fp16", "int8"], default="fp32",
+                        help="Variante del modelo: cada proceso carga solo esta")
+    parser.add_argument("--voice", default="em_alex")
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--chunk-len", type=int, default=2500)
+    parser.add_argument("--audio", choices=sorted(OUTPUT_PRESETS), default="original",
+                        help="Formato del audio: original (24 kHz) o voz (16 kHz, dither y normalización)")
+    parser.add_argument("--workers", type=int, default=max(1, cpus // 2),
+                        help="Procesos de síntesis (cada uno con su modelo)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Hilos de onnxruntime por proceso (por defecto CPUs / workers)")
+    parser.add_argument("--share-weights", action="store_true",
+                        help="Compartir los pesos del modelo entre procesos (menos RAM, sin pre-empaquetado)")
+    parser.add_argument("--summary", default=None, help="Guardar el resumen en JSON")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def model_variants_for(model_path):
+    base, ext = os.path.splitext(model_path)
+    return {"fp32": model_path, "fp16": f"{base}.fp16{ext}", "int8": f"{base}.int8{ext}"}
+
+def worker_args(options, session_config):
+    """Argumentos de _init_worker: la variante del lote es la que se carga, y la única."""
+    variants = model_variants_for(options.model)
+    return (options.projects_dir, variants[options.variant], options.voices,
+            session_config, variants, options.variant)
+
+def main(argv=None, init_worker=_init_worker, init_args=None):
+    options = parse_args(argv)
+    paths = collect_inputs(options.inputs)
+    if not paths:
+        print("No se encontraron documentos PDF, DOCX o TXT.")
+        return 1
+
+    # El coordinador no carga el modelo: solo gestiona proyectos y ensambla
+    # Con las mismas variantes que los procesos: los chunks se registran con la del lote
+    variants = model_variants_for(options.model)
+    manager = BatchManager(options.projects_dir, variants[options.variant], options.voices, load_model=False,
+                           model_variants=variants, default_variant=options.variant)
+    batch = BatchRun(manager, options)
+    batch.prepare(paths)
+
+    threads = options.threads or max(1, (os.cpu_count() or 1) // options.workers)
+    session_config = {"intra_op_num_threads": threads}
+    if options.share_weights:
+        # Los pesos pre-empaquetados serían una copia privada en cada proceso
+        session_config.update(shared_weights=True, prepack_weights=False)
+    if init_args is None:
+        init_args = worker_args(options, session_config)
+
+    start = time.perf_counter()
+    print(f"Sintetizando con {options.workers} proceso(s) x {threads} hilo(s)...")
+    executor = ProcessPoolExecutor(max_workers=options.workers, initializer=init_worker, initargs=init_args)
+    try:
+        batch.run(executor)
+        executor.shutdown()
+    except KeyboardInterrupt:
+        print("\nInterrumpido. El progreso está guardado; vuelve a lanzar el comando para continuar.")
+        executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        manager.shutdown()
+
+    # Libros que ya estaban terminados en una ejecución anterior
+    for project_id, book in batch.books.items():
+        if book.get("finished") and not book.get("output"):
+            batch.export(project_id)
+
+    summary = batch.summary(time.perf_counter() - start)
+    print_summary(summary)
+    if options.summary:
+        with open(options.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 1 if summary["chunks_failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,26 @@
 import os
-import json
 import io
 import time
 import re
 import soundfile as sf
 import numpy as np
 import ctypes
+import threading
 from flask import Flask, render_template, request, send_file, jsonify
 from werkzeug.utils import secure_filename
 
-from manager import BatchManager
+from manager import BatchManager, ModelUnavailable
 from processor import TextProcessor
+from audiobook_export import EXPORT_FORMATS, chapters_sidecar_path
+from extract_cache import ExtractCache, hash_stream, chunks_key
+from synthesis_jobs import SynthesisJobs, QueueFull
+from metrics import METRICS
+from profiling import PROFILE_MODES, list_profiles
+from http_cache import HotFileCache, send_cached
+from preview_cache import PreviewCache, SAMPLE_TEXTS, preview_key, precompute_voice_samples
+from storage import StorageManager
+from hls import PLAYLIST_MIMETYPE, SEGMENT_MIMETYPE, SEGMENT_EXTENSION, media_playlist
+from audio_format import parse_output_format
 
 # Configurar ruta de espeak-ng para Windows
 ESPEAK_PATH = r"C:\Program Files\eSpeak NG"
@@ -19,6 +29,16 @@ os.environ["PHONEMIZER_ESPEAK_PATH"] = ESPEAK_PATH
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['PROJECTS_FOLDER'] = 'projects'
+app.config['CACHE_FOLDER'] = 'cache'
+# Tamaño máximo de la caché de extracción (texto y chunks de documentos ya subidos)
+app.config['EXTRACT_CACHE_MAX_BYTES'] = 512 * 1024 * 1024
+# Caché en memoria de los últimos chunks servidos (audio y metadata); 0 la desactiva
+app.config['HOT_CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+# Caché de previsualizaciones de /api/speak y muestras de voz (WAVs cortos en cache/previews)
+app.config['PREVIEW_CACHE_MAX_BYTES'] = 128 * 1024 * 1024
+# Cuota de disco de los proyectos: al superarla se libera el audio de los menos escuchados
+# (se regenera al volver a escucharlos). None desactiva la cuota; la compactación sigue activa
+app.config['STORAGE_QUOTA_BYTES'] = 20 * 1024 ** 3
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROJECTS_FOLDER'], exist_ok=True)
 
@@ -63,11 +83,74 @@ def boost_performance():
 boost_performance()
 
 # Inicializar Manager y Processor
-# Nota: manager inicializa Kokoro internamente
+# Nota: manager carga y calienta Kokoro en segundo plano; el servidor arranca al momento
+# y /api/health informa del estado (loading, warming, ready)
 MODEL_PATH = "kokoro-v1.0.onnx"
 VOICES_PATH = "voices-v1.0.bin"
-manager = BatchManager(app.config['PROJECTS_FOLDER'], MODEL_PATH, VOICES_PATH)
+# Variantes del modelo (ficheros publicados junto a kokoro-v1.0.onnx). DEFAULT_VARIANT se carga
+# al arrancar; cada proyecto puede elegir otra con "model_variant". Elegir con
+# benchmarks/bench_model_variants.py (RTF, memoria y diferencia frente a fp32) sobre los
+# ficheros reales: las cifras de benchmarks/README.md son del modelo sintético.
+MODEL_VARIANTS = {
+    "fp32": MODEL_PATH,
+    "fp16": "kokoro-v1.0.fp16.onnx",
+    "int8": "kokoro-v1.0.int8.onnx",
+}
+DEFAULT_VARIANT = os.environ.get("KOKORO_VARIANT", "fp32")
+# Ajustes de onnxruntime; el grafo optimizado se guarda junto al .onnx y se reutiliza.
+# Ver session_config.DEFAULT_SESSION_CONFIG y benchmarks/bench_onnx_threads.py para elegir hilos.
+SESSION_CONFIG = {
+    "graph_optimization_level": "all",
+    "intra_op_num_threads": None,
+    "inter_op_num_threads": None,
+    "execution_mode": "sequential",
+    "cache_optimized_model": True,
+}
+manager = BatchManager(app.config['PROJECTS_FOLDER'], MODEL_VARIANTS.get(DEFAULT_VARIANT, MODEL_PATH), VOICES_PATH,
+                       session_config=SESSION_CONFIG, model_variants=MODEL_VARIANTS, default_variant=DEFAULT_VARIANT)
 processor = TextProcessor()
+extract_cache = ExtractCache(app.config['CACHE_FOLDER'], app.config['EXTRACT_CACHE_MAX_BYTES'])
+hot_cache = HotFileCache(app.config['HOT_CACHE_MAX_BYTES']) if app.config['HOT_CACHE_MAX_BYTES'] else None
+preview_cache = PreviewCache(os.path.join(app.config['CACHE_FOLDER'], "previews"), app.config['PREVIEW_CACHE_MAX_BYTES'])
+# Síntesis fuera de los hilos del servidor: los endpoints de chunks devuelven un id de
+# trabajo (202) y el cliente consulta /api/jobs/<id>. Estado de la cola en /api/jobs.
+SYNTHESIS_WORKERS = 1
+SYNTHESIS_MAX_QUEUE = 64
+jobs = SynthesisJobs(manager, max_workers=SYNTHESIS_WORKERS, max_queue=SYNTHESIS_MAX_QUEUE)
+# Cuota, compactación a FLAC de proyectos inactivos y papelera, en segundo plano
+storage = StorageManager(manager, quota_bytes=app.config['STORAGE_QUOTA_BYTES'], is_busy=jobs.has_project)
+storage.start()
+
+# Métricas calculadas al exportar /metrics (el resto las registra el código instrumentado)
+def _cache_metrics():
+    stats = extract_cache.stats()
+    return {(("stat", k),): v for k, v in stats.items() if k != "max_bytes"}
+
+def _rtf():
+    audio = METRICS.get("tts_audio_seconds_total")
+    return METRICS.get("tts_synthesis_seconds_total") / audio if audio else None
+
+METRICS.register_gauge("tts_jobs", lambda: {(("state", k),): v for k, v in jobs.stats().items()},
+                       "Cola de síntesis: workers, en curso, en espera, completados, fallidos, rechazados")
+METRICS.register_gauge("tts_resume_queue_depth", lambda: manager.resume_queue.qsize(),
+                       "Proyectos pendientes de reanudar en segundo plano")
+METRICS.register_gauge("tts_extract_cache", _cache_metrics,
+                       "Caché de extracción: entradas, bytes, aciertos, fallos, tasa de acierto, ahorro")
+METRICS.register_gauge("tts_hot_cache",
+                       lambda: {(("stat", k),): v for k, v in hot_cache.stats().items()} if hot_cache else None,
+                       "Caché en memoria de chunks servidos: entradas, bytes, aciertos, fallos, expulsiones")
+METRICS.register_gauge("tts_preview_cache", lambda: {(("stat", k),): v for k, v in preview_cache.stats().items()},
+                       "Caché de previsualizaciones y muestras de voz: entradas, bytes, aciertos, fallos")
+METRICS.register_gauge("tts_rtf", _rtf, "Tiempo de síntesis / duración del audio generado (acumulado)")
+METRICS.register_gauge("tts_model_ready", lambda: 1 if manager.model_state == "ready" else 0,
+                       "1 si el modelo está cargado y caliente")
+
+# Reconciliar proyectos tras un posible cierre inesperado y reanudar los que no terminaron.
+# No necesita el modelo; el trabajo reanudado espera a que esté listo.
+AUTO_RESUME = True
+threading.Thread(target=manager.recover_projects, kwargs={"resume": AUTO_RESUME}, daemon=True).start()
+# Indexar para la búsqueda los proyectos que aún no lo están (ver search_index.py)
+threading.Thread(target=manager.sync_search_index, daemon=True).start()
 
 # Mapeo de prefijos de voz a idiomas para el frontend
 VOICE_LANG_MAP = {
@@ -91,10 +174,67 @@ VOICE_LANG_MAP = {
     "zm": {"lang": "zh", "label": "Chinese - Male"},
 }
 
+def voice_lang(voice):
+    return VOICE_LANG_MAP.get(voice[:2], {"lang": "en-us"})["lang"]
+
+def voice_sample(voice):
+    """(clave de caché, argumentos de render_preview) de la muestra de una voz del catálogo."""
+    lang = voice_lang(voice)
+    text = SAMPLE_TEXTS.get(lang, SAMPLE_TEXTS["en-us"])
+    return preview_key(text, voice, 1.0, lang, manager.default_variant), (text, voice, 1.0, lang)
+
+def ready_kokoro():
+    """El modelo, o ModelUnavailable (503) si aún se carga: un hilo de petición no espera."""
+    return manager.get_kokoro(timeout=0)
+
+def render_preview(text, voice, speed, lang):
+    """WAV (bytes) de una previsualización. Soporta mezclas de voces."""
+    kokoro = ready_kokoro()
+    voice_obj = manager._get_voice_style(voice)
+    samples, sample_rate = kokoro.create(text, voice=voice_obj, speed=speed, lang=lang)
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format='WAV')
+    return buffer.getvalue()
+
+def synthesis_idle():
+    stats = jobs.stats()
+    return (stats["running"] == 0 and stats["queued"] == 0 and manager.resume_queue.empty()
+            and not manager.lock.locked())
+
+# Muestras de todas las voces en segundo plano, cuando no se está convirtiendo ningún libro
+PRECOMPUTE_VOICE_SAMPLES = True
+
+def _precompute_voice_samples():
+    try:
+        voices = manager.get_kokoro().get_voices()
+    except Exception:
+        return # Sin modelo no hay muestras; /api/voices tampoco responde
+    generated = precompute_voice_samples(preview_cache, [voice_sample(v) for v in voices], render_preview,
+                                         synthesis_idle, lock=manager.lock)
+    if generated:
+        print(f"Muestras de voz precalculadas: {generated}")
+
+if PRECOMPUTE_VOICE_SAMPLES:
+    threading.Thread(target=_precompute_voice_samples, daemon=True).start()
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.route("/api/health")
+def health():
+    readiness = manager.readiness()
+    code = 200 if readiness["state"] == "ready" else 503
+    return jsonify(readiness), code
+
+# Segundos que se sugiere esperar (Retry-After) mientras el modelo no está listo
+MODEL_RETRY_AFTER = 5
+
+@app.errorhandler(ModelUnavailable)
+def model_unavailable(e):
+    """Lo mismo que /api/health: 503 con el estado del modelo."""
+    return jsonify(dict(manager.readiness(), error=str(e))), 503, {"Retry-After": str(MODEL_RETRY_AFTER)}
+
 @app.route("/api/extract", methods=["POST"])
 def extract():
     if 'file' not in request.files:
@@ -103,13 +243,28 @@ def extract():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
+    # Volver a subir el mismo documento no lo procesa de nuevo
+    digest = hash_stream(file.stream)
+    cache_key = f"text:{digest}"
+    cached = extract_cache.get(cache_key)
+    if isinstance(cached, str): # Entradas de antes de guardar el índice
+        cached = {"text": cached, "headings": []}
+    if cached is not None:
+        return jsonify({"text": cached["text"], "headings": cached["headings"], "cached": True})
+
     filename = secure_filename(file.filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
     
     try:
-        text = processor.extract_text(filepath)
-        return jsonify({"text": text})
+        start = time.perf_counter()
+        with METRICS.span("extract"):
+            text = processor.extract_text(filepath)
+            # Índice del documento: el cliente lo devuelve al crear el proyecto (capítulos)
+            headings = processor.extract_headings(filepath)
+        extract_cache.put(cache_key, {"text": text, "headings": headings}, source_bytes=os.path.getsize(filepath),
+                          compute_seconds=time.perf_counter() - start)
+        return jsonify({"text": text, "headings": headings, "cached": False})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -128,10 +283,75 @@ def split():
     chunks = processor.split_into_chunks(text)
     return jsonify({"chunks": chunks})
 
+def split_cached(text, headings=None, **params):
+    """
+    split_into_chunks + detect_chapters, memorizado por hash del texto y parámetros.
+    `headings` es el índice que devolvió /api/extract (ver TextProcessor.extract_headings).
+    """
+    key = chunks_key(text, headings=headings or [], **params)
+    cached = extract_cache.get(key)
+    if cached is not None:
+        return cached["chunks"], cached["chapters"]
+    start = time.perf_counter()
+    with METRICS.span("segment"):
+        chunks = processor.split_into_chunks(text, headings=headings, **params)
+        chapters = processor.detect_chapters(chunks, headings)
+    extract_cache.put(key, {"chunks": chunks, "chapters": chapters},
+                      source_bytes=len(text.encode("utf-8")), compute_seconds=time.perf_counter() - start)
+    return chunks, chapters
+
+@app.route("/metrics")
+def metrics():
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/api/projects/<project_id>/trace", methods=["GET", "POST"])
+def project_trace(project_id):
+    """POST {"enabled": true|false} activa la traza por etapas; GET descarga trace.jsonl."""
+    if request.method == "POST":
+        enabled = (request.json or {}).get("enabled", True)
+        if manager.set_trace(project_id, enabled):
+            return jsonify({"status": "ok", "trace": bool(enabled)})
+        return jsonify({"error": "Project not found"}), 404
+    trace_path = os.path.join(app.config['PROJECTS_FOLDER'], project_id, "trace.jsonl")
+    if os.path.exists(trace_path):
+        return send_file(trace_path, as_attachment=True, download_name=f"{project_id}_trace.jsonl",
+                         mimetype="application/x-ndjson")
+    return jsonify({"error": "Trace not found"}), 404
+
+@app.route("/api/projects/<project_id>/profile", methods=["POST"])
+def set_project_profile(project_id):
+    """{"mode": "cprofile" | "sample" | null}: perfila cada chunk que se sintetice del proyecto."""
+    mode = (request.json or {}).get("mode")
+    if mode is not None and mode not in PROFILE_MODES:
+        return jsonify({"error": f"Unknown profile mode: {mode}"}), 400
+    if manager.set_profile(project_id, mode):
+        return jsonify({"status": "ok", "profile": mode})
+    return jsonify({"error": "Project not found"}), 404
+
+@app.route("/api/projects/<project_id>/profiles")
+def get_project_profiles(project_id):
+    profiles_dir = os.path.join(app.config['PROJECTS_FOLDER'], project_id, "profiles")
+    return jsonify(list_profiles(profiles_dir))
+
+@app.route("/api/projects/<project_id>/profiles/<name>")
+def download_project_profile(project_id, name):
+    profile_path = os.path.join(app.config['PROJECTS_FOLDER'], project_id, "profiles", secure_filename(name))
+    if os.path.exists(profile_path):
+        return send_file(profile_path, as_attachment=True, download_name=f"{project_id}_{secure_filename(name)}")
+    return jsonify({"error": "Profile not found"}), 404
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    stats = extract_cache.stats()
+    stats["previews"] = preview_cache.stats()
+    if hot_cache is not None:
+        stats["hot_files"] = hot_cache.stats()
+    return jsonify(stats)
+
 @app.route("/api/voices")
 def get_voices():
     # Usar el modelo interno del manager
-    all_voices = manager.kokoro.get_voices()
+    all_voices = ready_kokoro().get_voices()
     voices_data = []
     for v in all_voices:
         prefix = v[:2]
@@ -140,10 +360,50 @@ def get_voices():
             "id": v,
             "label": f"{v.replace('_', ' ').title()}",
             "lang": info["lang"],
-            "group": info["label"]
+            "group": info["label"],
+            "sample_url": f"/api/voices/{v}/sample"
         })
     return jsonify(voices_data)
 
+def send_preview(key, args):
+    """
+    Sirve la previsualización cacheada de `key`, o la genera con render_preview(*args).
+    Otra petición puede expulsar el fichero entre get() y el envío (FileNotFoundError):
+    entonces se regenera y, si tampoco sigue en disco, se sirve desde memoria.
+    """
+    path = preview_cache.get(key)
+    if path is not None:
+        try:
+            return send_cached(path, "audio/wav", immutable=True, cache=hot_cache)
+        except FileNotFoundError:
+            pass
+    wav = render_preview(*args)
+    path = preview_cache.put(key, wav)
+    if path is not None:
+        try:
+            return send_cached(path, "audio/wav", immutable=True, cache=hot_cache)
+        except FileNotFoundError:
+            pass
+    # Demasiado grande para la caché, o ya expulsado: se sirve sin guardar
+    return send_file(io.BytesIO(wav), mimetype="audio/wav")
+
+@app.route("/api/voices/<voice>/sample")
+def get_voice_sample(voice):
+    """Muestra corta de una voz: precalculada en segundo plano, o generada y cacheada al pedirla."""
+    if voice not in ready_kokoro().get_voices():
+        return jsonify({"error": "Unknown voice"}), 404
+    key, args = voice_sample(voice)
+    try:
+        return send_preview(key, args)
+    except ModelUnavailable as e:
+        return model_unavailable(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/models")
+def get_models():
+    return jsonify(manager.list_variants())
+
 @app.route("/api/projects", methods=["GET"])
 def get_projects():
     return jsonify(manager.get_projects())
@@ -163,26 +423,70 @@ def create_project():
     voice = data.get("voice", "af_nicole")
     speed = float(data.get("speed", 1.0))
     lang = data.get("lang", "en-us")
+    model_variant = data.get("model_variant")
+    # Preset ("original", "voz") u objeto {"samplerate", "dither", "normalize_db"}
+    output_format = data.get("output_format")
+    # Índice del documento tal como lo devolvió /api/extract
+    headings = data.get("headings") or []
 
     if not text:
         return jsonify({"error": "No text provided"}), 400
+    if model_variant and model_variant not in manager.model_variants:
+        return jsonify({"error": f"Unknown model variant: {model_variant}"}), 400
+    # Misma comprobación que "available" en /api/models: sin el fichero fallaría cada chunk
+    if model_variant and not manager.variant_available(model_variant):
+        return jsonify({"error": f"Model variant not available: {model_variant}"}), 400
+    try:
+        parse_output_format(output_format)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not isinstance(headings, list) or not all(
+            isinstance(h, str) or (isinstance(h, dict) and isinstance(h.get("title"), str)) for h in headings):
+        return jsonify({"error": "headings must be a list of titles"}), 400
 
     # Usar el nuevo split asimétrico: 4000 caracteres para el primero, el resto 2500
-    chunks = processor.split_into_chunks(text, target_len=2500, first_chunk_len=4000)
-    project_id = manager.create_project(name, chunks, voice, speed, lang)
+    chunks, chapters = split_cached(text, headings=headings, target_len=2500, first_chunk_len=4000,
+                                    chapter_breaks=True)
+    project_id = manager.create_project(name, chunks, voice, speed, lang, model_variant, chapters=chapters,
+                                        output_format=output_format)
     return jsonify({"project_id": project_id, "chunks": chunks})
 
 @app.route("/api/projects/<project_id>/chunk/<int:chunk_id>/prepare", methods=["POST"])
 def prepare_chunk(project_id, chunk_id):
-    try:
-        project = manager.get_project(project_id)
-        if project and project.get("is_optimized"):
-            return jsonify({"error": "Project is optimized. Chunks are no longer available for playback, but you can download the full audio."}), 400
-            
-        manager.process_chunk(project_id, chunk_id)
+    project = manager.get_project(project_id)
+    if project and project.get("is_optimized"):
+        return jsonify({"error": "Project is optimized. Chunks are no longer available for playback, but you can download the full audio."}), 400
+    profile = request.args.get("profile")
+    if profile and profile not in PROFILE_MODES:
+        return jsonify({"error": f"Unknown profile mode: {profile}"}), 400
+    return enqueue_chunk(project_id, chunk_id, project, profile)
+
+def enqueue_chunk(project_id, chunk_id, project, profile=None):
+    """
+    200 si el chunk ya está en disco; si no, encola su síntesis y responde 202 con el trabajo.
+    Con ?profile=cprofile|sample en prepare se perfila esa síntesis (ver /api/projects/<id>/profiles).
+    """
+    if not project or not (0 <= chunk_id < project["total_chunks"]):
+        return jsonify({"error": "Chunk not found"}), 404
+    chunk_path = os.path.join(app.config['PROJECTS_FOLDER'], project_id, "audio_chunks", f"chunk_{chunk_id}.wav")
+    if os.path.exists(chunk_path):
         return jsonify({"status": "ready", "chunk_id": chunk_id})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    try:
+        job = jobs.submit(project_id, chunk_id, profile)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify(dict(job, job_url=f"/api/jobs/{job['id']}")), 202, {"Retry-After": "1"}
+
+@app.route("/api/jobs")
+def jobs_stats():
+    return jsonify(jobs.stats())
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 @app.route("/api/projects/<project_id>/delete", methods=["DELETE"])
 def delete_project(project_id):
@@ -208,6 +512,20 @@ def rename_project(project_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/projects/<project_id>/position", methods=["POST"])
+def update_position(project_id):
+    data = request.json or {}
+    try:
+        chunk = int(data.get("chunk", 0))
+        sub_part = int(data.get("sub_part", 0))
+        offset = float(data.get("offset", 0.0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid position"}), 400
+
+    if manager.update_last_chunk(project_id, chunk, sub_part, offset):
+        return jsonify({"status": "ok"})
+    return jsonify({"error": "Project not found"}), 404
+
 @app.route("/api/projects/<project_id>/chunk/<int:chunk_id>")
 def get_chunk_audio(project_id, chunk_id):
     # Intentar obtener el chunk del disco si ya existe
@@ -215,18 +533,15 @@ def get_chunk_audio(project_id, chunk_id):
     chunk_path = os.path.join(project_path, "audio_chunks", f"chunk_{chunk_id}.wav")
 
     if os.path.exists(chunk_path):
-        return send_file(chunk_path, mimetype="audio/wav")
+        # El WAV solo aparece completo (rename atómico) y no vuelve a cambiar
+        return send_cached(chunk_path, "audio/wav", immutable=True, cache=hot_cache)
 
-    # Si no existe, generarlo (esta es la parte "on-demand" del streaming persistente)
-    try:
-        project = manager.get_project(project_id)
-        if project and project.get("is_optimized"):
-             return jsonify({"error": "Project is optimized. Use full download."}), 410 # Gone
-             
-        manager.process_chunk(project_id, chunk_id)
-        return send_file(chunk_path, mimetype="audio/wav")
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    # Si no existe, encolar su generación (parte "on-demand" del streaming persistente);
+    # el cliente espera al trabajo y vuelve a pedir el audio
+    project = manager.get_project(project_id)
+    if project and project.get("is_optimized"):
+         return jsonify({"error": "Project is optimized. Use full download."}), 410 # Gone
+    return enqueue_chunk(project_id, chunk_id, project)
 
 @app.route("/api/projects/<project_id>/chunk/<int:chunk_id>/metadata")
 def get_chunk_metadata(project_id, chunk_id):
@@ -234,39 +549,56 @@ def get_chunk_metadata(project_id, chunk_id):
     meta_path = os.path.join(project_path, "audio_chunks", f"chunk_{chunk_id}.json")
 
     if os.path.exists(meta_path):
-        return send_file(meta_path, mimetype="application/json")
+        # La metadata se escribe antes que el WAV: solo es definitiva cuando el WAV existe
+        complete = os.path.exists(meta_path[:-len(".json")] + ".wav")
+        return send_cached(meta_path, "application/json", immutable=complete, cache=hot_cache)
     
     return jsonify({"error": "Metadata not found"}), 404
 
+@app.route("/api/storage")
+def storage_usage():
+    return jsonify(storage.usage())
+
+@app.route("/api/storage/maintenance", methods=["POST"])
+def storage_maintenance():
+    """Compactación y cuota ahora, sin esperar al ciclo periódico."""
+    return jsonify(storage.run_once())
+
+@app.route("/api/projects/<project_id>/evict", methods=["POST"])
+def evict_project_audio(project_id):
+    """Libera el audio de un proyecto conservando texto y tiempos (se regenera al escucharlo)."""
+    if manager.get_project(project_id) is None:
+        return jsonify({"error": "Project not found"}), 404
+    if jobs.has_project(project_id):
+        return jsonify({"error": "Project is being synthesized"}), 409
+    return jsonify({"status": "ok", "bytes_freed": manager.evict_audio(project_id)})
+
 @app.route("/api/projects/<project_id>/download")
 def download_project_audio(project_id):
     project_path = os.path.join(app.config['PROJECTS_FOLDER'], project_id)
     final_path = os.path.join(project_path, "final_output.wav")
-    status_path = os.path.join(project_path, "status.json")
+    status = manager.get_project(project_id)
     
-    # Intentar obtener el nombre personalizado del status.json
+    # Intentar obtener el nombre personalizado del status
     custom_name = project_id
-    if os.path.exists(status_path):
-        try:
-            with open(status_path, "r", encoding="utf-8") as f:
-                status = json.load(f)
-                custom_name = status.get("name", project_id)
-                # Sanitizar para nombre de archivo
-                custom_name = "".join(c for c in custom_name if c.isprintable())
-                custom_name = re.sub(r'[\\/:*?"<>|]', '', custom_name).strip(' ._')
-                if not custom_name: custom_name = project_id
-        except:
-            pass
+    if status:
+        custom_name = status.get("name", project_id)
+        # Sanitizar para nombre de archivo
+        custom_name = "".join(c for c in custom_name if c.isprintable())
+        custom_name = re.sub(r'[\\/:*?"<>|]', '', custom_name).strip(' ._')
+        if not custom_name: custom_name = project_id
 
     if os.path.exists(final_path):
         return send_file(final_path, as_attachment=True, download_name=f"{custom_name}.wav", mimetype="audio/wav")
+    compacted_path = manager.final_audio_path(project_id)
+    if compacted_path:
+        # Proyecto compactado por el gestor de almacenamiento: el audio final es FLAC
+        return send_file(compacted_path, as_attachment=True, download_name=f"{custom_name}.flac", mimetype="audio/flac")
     
     # Si no existe, ver si el proyecto está terminado para ensamblarlo
-    if os.path.exists(status_path):
-        with open(status_path, "r", encoding="utf-8") as f:
-            status = json.load(f)
-        
+    if status:
         # Robustez: Aceptar si el flag está activo O si los contadores coinciden
+        # (completed_chunks viene de la tabla de estados, no del JSON en disco)
         total = status.get("total_chunks", 999999)
         completed = status.get("completed_chunks", 0)
         
@@ -280,6 +612,82 @@ def download_project_audio(project_id):
 
     return jsonify({"error": "Audio not ready for download. Please wait until conversion finishes."}), 404
 
+@app.route("/api/projects/<project_id>/export/<fmt>")
+def export_project_audio(project_id, fmt):
+    """Audiolibro comprimido con capítulos (m4b u ogg), generado bajo demanda."""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format: {fmt}"}), 400
+    status = manager.get_project(project_id)
+    if not status:
+        return jsonify({"error": "Project not found"}), 404
+
+    custom_name = "".join(c for c in status.get("name", project_id) if c.isprintable())
+    custom_name = re.sub(r'[\\/:*?"<>|]', '', custom_name).strip(' ._') or project_id
+
+    try:
+        out_path = manager.export_project(project_id, fmt, bitrate=request.args.get("bitrate"))
+    except Exception as e:
+        return jsonify({"error": f"Error exporting audio: {str(e)}"}), 500
+    if not out_path:
+        return jsonify({"error": "Audio not ready for download. Please wait until conversion finishes."}), 404
+    spec = EXPORT_FORMATS[fmt]
+    response = send_file(out_path, as_attachment=True, download_name=f"{custom_name}{spec['extension']}",
+                         mimetype=spec["mimetype"])
+    # Sin ffmpeg los capítulos no van dentro del audio: avisar y decir dónde están
+    embedded = not os.path.exists(chapters_sidecar_path(out_path))
+    response.headers["X-Chapters-Embedded"] = "true" if embedded else "false"
+    if not embedded:
+        chapters_url = f"/api/projects/{project_id}/export/{fmt}/chapters"
+        response.headers["X-Chapters-Url"] = chapters_url
+        response.headers["Warning"] = f'199 - "chapters not embedded (no ffmpeg); see {chapters_url}"'
+    return response
+
+@app.route("/api/projects/<project_id>/export/<fmt>/chapters")
+def export_project_chapters(project_id, fmt):
+    """Capítulos (formato OGM) de una exportación hecha sin ffmpeg."""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format: {fmt}"}), 400
+    if not manager.get_project(project_id):
+        return jsonify({"error": "Project not found"}), 404
+    sidecar = chapters_sidecar_path(manager.export_path(project_id, fmt))
+    if not os.path.exists(sidecar):
+        return jsonify({"error": "No chapters file: chapters are embedded or the project was not exported"}), 404
+    return send_file(sidecar, mimetype="text/plain; charset=utf-8", as_attachment=True,
+                     download_name=f"{project_id}.chapters.txt")
+
+# Chunks que se encolan por delante del audio disponible al consultar la lista HLS
+HLS_LOOKAHEAD_CHUNKS = 2
+
+@app.route("/api/projects/<project_id>/hls/playlist.m3u8")
+def hls_playlist(project_id):
+    """
+    Lista HLS en directo: un segmento MP3 por sub-parte, crece según avanza la síntesis.
+    Sirve a cualquier reproductor HLS (Safari, hls.js, VLC, mpv...). Consultarla encola
+    los siguientes chunks pendientes, como hace el pregenerador de la interfaz.
+    """
+    playlist = manager.hls_segments(project_id)
+    if playlist is None:
+        return jsonify({"error": "Project not found"}), 404
+    if not playlist["finished"]:
+        last = min(playlist["next_chunk"] + HLS_LOOKAHEAD_CHUNKS, playlist["total_chunks"])
+        for chunk_id in range(playlist["next_chunk"], last):
+            try:
+                jobs.submit(project_id, chunk_id)
+            except QueueFull:
+                break
+    body = media_playlist(playlist["segments"], playlist["samplerate"], playlist["finished"],
+                          lambda index: f"seg_{index}{SEGMENT_EXTENSION}")
+    response = app.response_class(body, mimetype=PLAYLIST_MIMETYPE)
+    response.cache_control.no_cache = True # Lista en directo: el reproductor la vuelve a pedir
+    return response
+
+@app.route(f"/api/projects/<project_id>/hls/seg_<int:index>{SEGMENT_EXTENSION}")
+def hls_segment(project_id, index):
+    seg_path = manager.hls_segment_file(project_id, index)
+    if seg_path is None:
+        return jsonify({"error": "Segment not available yet"}), 404
+    return send_cached(seg_path, SEGMENT_MIMETYPE, immutable=True, cache=hot_cache)
+
 @app.route("/api/speak", methods=["POST"])
 def speak():
     # Mantener compatibilidad con el modo "usar sin guardar" si se desea
@@ -292,17 +700,15 @@ def speak():
     if not text:
         return jsonify({"error": "No text provided"}), 400
 
+    # Las previsualizaciones se repiten: mismo texto, voz (o mezcla), velocidad e idioma
+    key = preview_key(text, voice, speed, lang, manager.default_variant)
     try:
-        # Soporte para mezcla de voces
-        voice_obj = manager._get_voice_style(voice)
-        
-        samples, sample_rate = manager.kokoro.create(text, voice=voice_obj, speed=speed, lang=lang)
-        buffer = io.BytesIO()
-        sf.write(buffer, samples, sample_rate, format='WAV')
-        buffer.seek(0)
-        return send_file(buffer, mimetype="audio/wav")
+        return send_preview(key, (text, voice, speed, lang))
+    except ModelUnavailable as e:
+        return model_unavailable(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    # Sin reloader: con él, el proceso vigilante y el hijo cargarían el modelo dos veces
+    app.run(debug=True, port=5000, use_reloader=False)
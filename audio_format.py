@@ -0,0 +1,210 @@
+"""
+Formato de salida del audio: remuestreo, conversión a int16 con dither y normalización.
+
+Kokoro genera float32 a 24 kHz. Para escuchar voz en el móvil basta con 16 kHz mono
+int16, que ocupa un tercio menos y reduce la E/S de chunks, ensamblado y segmentos.
+Cada proyecto puede guardar en su status un "output_format":
+
+    {"samplerate": 16000, "dither": true, "normalize_db": -1.0}
+
+- samplerate: frecuencia de salida (None = la del modelo). Remuestreo polifásico con un
+  FIR sinc enventanado (Kaiser), vectorizado con NumPy y en streaming: Resampler
+  procesa bloques de cualquier tamaño y conserva el estado entre ellos.
+- dither: ruido TPDF de ±1 LSB antes de cuantizar a int16 (sin él, el redondeo del
+  silencio y de las colas de las frases deja distorsión armónica audible).
+- normalize_db: pico objetivo en dBFS del audio final (None = sin normalizar). Se
+  aplica al ensamblar, con un único factor para todo el libro, para no cambiar el
+  volumen entre chunks.
+
+Sin "output_format" el comportamiento es el de siempre (24 kHz, sin dither).
+"""
+from math import gcd
+import numpy as np
+
+OUTPUT_PRESETS = {
+    "original": None,
+    "voz": {"samplerate": 16000, "dither": True, "normalize_db": -1.0},
+}
+SUPPORTED_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000)
+TAPS_PER_PHASE = 32 # Longitud del filtro por fase: ~1.3 ms a 24 kHz, atenuación > 80 dB
+KAISER_BETA = 8.0
+ROLLOFF = 0.94 # Corte del filtro respecto a la Nyquist de salida (banda de transición)
+MAX_NORMALIZE_GAIN = 10.0 # +20 dB como mucho: no amplificar un libro casi en silencio
+OUTPUTS_PER_SLICE = 8192 # Salidas por producto vectorizado (acota la matriz de ventanas)
+INT16_SCALE = 32767.0
+
+def parse_output_format(value):
+    """
+    Normaliza el formato pedido (nombre de preset, dict o None) al dict que se guarda en
+    el status, o None si es el formato nativo. ValueError si no es válido.
+    """
+    if value is None or isinstance(value, str):
+        if value is not None and value not in OUTPUT_PRESETS:
+            raise ValueError(f"Formato de salida desconocido: {value}")
+        preset = OUTPUT_PRESETS.get(value)
+        return dict(preset) if preset else None
+    if not isinstance(value, dict):
+        raise ValueError("output_format debe ser un preset o un objeto")
+    unknown = set(value) - {"samplerate", "dither", "normalize_db"}
+    if unknown:
+        raise ValueError(f"Campos desconocidos en output_format: {', '.join(sorted(unknown))}")
+    samplerate = value.get("samplerate")
+    if samplerate is not None:
+        samplerate = int(samplerate)
+        if samplerate not in SUPPORTED_RATES:
+            raise ValueError(f"Frecuencia de muestreo no soportada: {samplerate}")
+    normalize_db = value.get("normalize_db")
+    if normalize_db is not None:
+        normalize_db = float(normalize_db)
+        if not -30.0 <= normalize_db <= 0.0:
+            raise ValueError("normalize_db debe estar entre -30 y 0 dBFS")
+    fmt = {"samplerate": samplerate, "dither": bool(value.get("dither", True)), "normalize_db": normalize_db}
+    if samplerate is None and not fmt["dither"] and normalize_db is None:
+        return None
+    return fmt
+
+def output_rate(fmt, native_rate):
+    """Frecuencia con la que se guarda el audio de un proyecto con formato `fmt`."""
+    return (fmt or {}).get("samplerate") or native_rate
+
+def output_frames(frames, in_rate, out_rate):
+    """Muestras que produce el remuestreo de `frames` muestras (ceil(frames * out / in))."""
+    return -(-frames * out_rate // in_rate)
+
+def design_filter(up, down, taps_per_phase=TAPS_PER_PHASE, beta=KAISER_BETA, rolloff=ROLLOFF):
+    """
+    Filtro paso bajo para remuestrear por up/down, repartido en fases: devuelve una
+    matriz (up, taps_per_phase) con cada fase invertida (lista para un producto
+    escalar con la ventana de entrada en orden temporal) y el retardo del filtro en
+    muestras de la señal sobremuestreada.
+    """
+    n_taps = taps_per_phase * up - 1 # Impar: retardo de grupo entero
+    cutoff = rolloff * 0.5 / max(up, down) # En ciclos por muestra sobremuestreada
+    t = np.arange(n_taps) - (n_taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(n_taps, beta)
+    h *= up / h.sum() # Ganancia unidad en continua tras insertar up-1 ceros
+    h = np.append(h, 0.0)
+    phases = h.reshape(taps_per_phase, up).T # phases[p, j] = h[p + j * up]
+    return np.ascontiguousarray(phases[:, ::-1], dtype=np.float32), (n_taps - 1) // 2
+
+class Resampler:
+    """
+    Remuestreo polifásico en streaming. process(bloque) devuelve las muestras de salida
+    que ya se pueden calcular; flush() devuelve el resto. La salida está alineada con la
+    entrada (se compensa el retardo del filtro) y mide output_frames(entrada).
+    """
+    def __init__(self, in_rate, out_rate, taps_per_phase=TAPS_PER_PHASE):
+        g = gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps = taps_per_phase
+        self.phases, self.delay = design_filter(self.up, self.down, taps_per_phase)
+        # Historial de entrada; buffer[0] es la muestra absoluta self.start. Empieza con
+        # ceros para las ventanas de las primeras salidas
+        self.buffer = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self.start = -(taps_per_phase - 1)
+        self.received = 0
+        self.produced = 0
+
+    def _produce(self, end):
+        """Calcula las salidas [produced, end) con el historial disponible."""
+        if end <= self.produced:
+            return np.zeros(0, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(self.buffer, self.taps)
+        out = np.empty(end - self.produced, dtype=np.float32)
+        for first in range(self.produced, end, OUTPUTS_PER_SLICE):
+            n = np.arange(first, min(end, first + OUTPUTS_PER_SLICE), dtype=np.int64)
+            m = n * self.down + self.delay # Posición en la señal sobremuestreada
+            # La ventana de la salida n acaba en la entrada m // up
+            rows = m // self.up - (self.taps - 1) - self.start
+            out[first - self.produced:first - self.produced + len(n)] = np.einsum(
+                "ij,ij->i", windows[rows], self.phases[m % self.up])
+        self.produced = end
+        # Descartar el historial que ya no necesita ninguna salida futura
+        keep_from = (self.produced * self.down + self.delay) // self.up - (self.taps - 1) - self.start
+        if keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self.start += keep_from
+        return out
+
+    def process(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.received += len(samples)
+        # Salidas cuya ventana termina dentro de la entrada recibida
+        ready = (self.received * self.up - 1 - self.delay) // self.down + 1
+        return self._produce(max(ready, self.produced))
+
+    def flush(self):
+        total = output_frames(self.received, self.in_rate, self.out_rate)
+        if total > self.produced:
+            last_input = ((total - 1) * self.down + self.delay) // self.up
+            padding = last_input + 1 - (self.start + len(self.buffer))
+            if padding > 0:
+                self.buffer = np.concatenate([self.buffer, np.zeros(padding, dtype=np.float32)])
+        return self._produce(total)
+
+def to_mono(samples):
+    samples = np.asarray(samples)
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+def to_int16(samples, dither=True, gain=1.0, rng=None):
+    """Cuantiza float [-1, 1] a int16, con dither TPDF opcional y una ganancia previa."""
+    x = np.asarray(samples, dtype=np.float32) * np.float32(gain * INT16_SCALE)
+    if dither and len(x):
+        rng = rng or np.random.default_rng()
+        # TPDF: diferencia de dos uniformes en [0, 1) -> triangular en ±1 LSB
+        noise = rng.random(len(x), dtype=np.float32)
+        noise -= rng.random(len(x), dtype=np.float32)
+        x += noise
+    np.rint(x, out=x)
+    np.clip(x, -32768, 32767, out=x)
+    return x.astype(np.int16)
+
+def peak_gain(peak, normalize_db):
+    """Factor que lleva el pico `peak` (0-1) a normalize_db dBFS, acotado a MAX_NORMALIZE_GAIN."""
+    if normalize_db is None or peak <= 0:
+        return 1.0
+    return min(MAX_NORMALIZE_GAIN, 10 ** (normalize_db / 20) / peak)
+
+class OutputStage:
+    """
+    Etapa de salida en streaming: mono -> remuestreo -> ganancia -> int16 con dither.
+    process(bloque) acepta float (o int16, que se reescala) y devuelve int16.
+    """
+    def __init__(self, in_rate, out_rate=None, dither=True, gain=1.0, rng=None):
+        self.samplerate = out_rate or in_rate
+        self.resampler = Resampler(in_rate, self.samplerate) if self.samplerate != in_rate else None
+        self.dither = dither
+        self.gain = gain
+        self.rng = rng or np.random.default_rng()
+
+    def _finish(self, samples):
+        return to_int16(samples, self.dither, self.gain, self.rng)
+
+    def process(self, samples):
+        samples = to_mono(samples)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        return self._finish(samples)
+
+    def flush(self):
+        if self.resampler is None:
+            return np.zeros(0, dtype=np.int16)
+        return self._finish(self.resampler.flush())
+
+def convert(samples, in_rate, fmt, rng=None):
+    """
+    Aplica el formato del proyecto a un fragmento completo (una sub-parte). Devuelve
+    (muestras, samplerate); sin formato devuelve el audio tal cual.
+    """
+    if not fmt:
+        return samples, in_rate
+    stage = OutputStage(in_rate, fmt.get("samplerate"), fmt.get("dither", True), rng=rng)
+    head = stage.process(samples)
+    tail = stage.flush()
+    return (np.concatenate([head, tail]) if len(tail) else head), stage.samplerate
@@ -0,0 +1,183 @@
+"""
+Exportación del audiolibro a un contenedor comprimido con capítulos (M4B/AAC u Ogg/Opus).
+
+Los capítulos se calculan al ensamblar (ver BatchManager.assemble_audio): cada encabezado
+detectado por TextProcessor.detect_chapters se sitúa al inicio de la sub-parte de Karaoke
+que lo contiene y se guarda en chapters.json con su posición en muestras. La exportación
+lee final_output.wav por bloques y los pasa a ffmpeg por una tubería, así que la memoria
+no depende de la duración del libro y la codificación corre en otro proceso, en paralelo
+con la síntesis de otros proyectos.
+"""
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+import soundfile as sf
+
+EXPORT_FORMATS = {
+    "m4b": {"extension": ".m4b", "mimetype": "audio/mp4", "codec": "aac", "muxer": "ipod", "bitrate": "64k"},
+    "ogg": {"extension": ".ogg", "mimetype": "audio/ogg", "codec": "libopus", "muxer": "ogg", "bitrate": "32k"},
+}
+BLOCK_FRAMES = 65536 # ~2,7 s a 24 kHz por escritura en la tubería
+
+def _normalize(text):
+    return re.sub(r'\W+', ' ', text).strip().lower()
+
+def locate_sub_part(title, offset, chunk_text, sub_parts):
+    """
+    Índice de la sub-parte de Karaoke donde empieza un encabezado. Se busca el título en
+    el texto de cada sub-parte (el texto se limpia antes de sintetizar, así que no se puede
+    usar el offset directamente); si aparece varias veces o ninguna, se elige la sub-parte
+    más cercana a la posición proporcional del offset dentro del chunk.
+    """
+    if not sub_parts:
+        return 0
+    lengths = [len(p.get("text", "")) for p in sub_parts]
+    total = sum(lengths) or 1
+    target = offset / max(1, len(chunk_text)) * total
+    starts = []
+    pos = 0
+    for length in lengths:
+        starts.append(pos)
+        pos += length
+    nearest = lambda candidates: min(candidates, key=lambda i: abs(starts[i] - target))
+
+    norm_title = _normalize(title)
+    matches = [i for i, p in enumerate(sub_parts) if norm_title and norm_title in _normalize(p.get("text", ""))]
+    if matches:
+        return nearest(matches)
+    # Sub-parte que contiene la posición proporcional
+    return max(i for i in range(len(starts)) if starts[i] <= target) if target > 0 else 0
+
+def chapter_marks(chapters, timeline, samplerate, default_title="Inicio"):
+    """
+    Convierte los capítulos del proyecto ({"title", "chunk_id", "offset"}) en marcas de
+    audio. `timeline` es {chunk_id: (frame_inicial, metadata_karaoke, texto_del_chunk)}.
+    Si el primer capítulo no empieza en 0 se añade uno inicial con `default_title`.
+    """
+    marks = []
+    for chapter in chapters or []:
+        entry = timeline.get(chapter["chunk_id"])
+        if entry is None:
+            continue # Chunk que falta en el ensamblado
+        start, sub_parts, chunk_text = entry
+        sub_part = locate_sub_part(chapter["title"], chapter.get("offset", 0), chunk_text, sub_parts)
+        frame = start + sum(int(round(p["duration"] * samplerate)) for p in sub_parts[:sub_part])
+        if marks and frame <= marks[-1]["start"]:
+            continue # Dos encabezados en la misma sub-parte: se queda el primero
+        marks.append({"title": chapter["title"], "chunk_id": chapter["chunk_id"],
+                      "sub_part": sub_part, "start": frame})
+    if not marks or marks[0]["start"] > 0:
+        marks.insert(0, {"title": default_title, "chunk_id": 0, "sub_part": 0, "start": 0})
+    return marks
+
+def _timestamp(frames, samplerate):
+    ms = int(round(frames * 1000 / samplerate))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+def _escape(value):
+    return re.sub(r'([=;#\\\n])', r'\\\1', value)
+
+def ffmetadata(marks, total_frames, samplerate, title):
+    """Fichero FFMETADATA1 con un [CHAPTER] por marca, en unidades de muestra."""
+    lines = [";FFMETADATA1", f"title={_escape(title)}", "genre=Audiobook"]
+    for i, mark in enumerate(marks):
+        end = marks[i + 1]["start"] if i + 1 < len(marks) else total_frames
+        lines += ["[CHAPTER]", f"TIMEBASE=1/{samplerate}", f"START={mark['start']}",
+                  f"END={max(end, mark['start'])}", f"title={_escape(mark['title'])}"]
+    return "\n".join(lines) + "\n"
+
+def ogm_chapters(marks, samplerate):
+    """Capítulos en formato OGM (CHAPTER01=hh:mm:ss.mmm / CHAPTER01NAME=...)."""
+    lines = []
+    for i, mark in enumerate(marks, start=1):
+        lines.append(f"CHAPTER{i:02d}={_timestamp(mark['start'], samplerate)}")
+        lines.append(f"CHAPTER{i:02d}NAME={mark['title']}")
+    return "\n".join(lines) + "\n"
+
+def _encode_ffmpeg(ffmpeg, wav_path, tmp_path, marks, title, fmt, bitrate):
+    spec = EXPORT_FORMATS[fmt]
+    info = sf.info(wav_path)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as meta:
+        meta.write(ffmetadata(marks, info.frames, info.samplerate, title))
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-threads", "1",
+           "-f", "s16le", "-ar", str(info.samplerate), "-ac", str(info.channels), "-i", "pipe:0",
+           "-i", meta.name, "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1",
+           "-c:a", spec["codec"], "-b:a", bitrate or spec["bitrate"], "-f", spec["muxer"], tmp_path]
+    try:
+        with tempfile.TemporaryFile() as errors:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=errors)
+            try:
+                for block in sf.blocks(wav_path, blocksize=BLOCK_FRAMES, dtype="int16"):
+                    proc.stdin.write(block.tobytes())
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass # ffmpeg terminó antes de tiempo: el código de salida lo explica
+            except BaseException:
+                proc.kill()
+                raise
+            if proc.wait() != 0:
+                errors.seek(0)
+                raise RuntimeError(f"ffmpeg falló: {errors.read().decode('utf-8', 'replace').strip()}")
+    finally:
+        os.remove(meta.name)
+
+def _encode_soundfile(wav_path, tmp_path, marks):
+    """Ogg/Opus sin ffmpeg. libsndfile no escribe comentarios arbitrarios: los capítulos
+    van en un fichero .chapters.txt junto al audio (ver chapters_sidecar_path)."""
+    info = sf.info(wav_path)
+    with sf.SoundFile(tmp_path, mode="w", samplerate=info.samplerate, channels=info.channels,
+                      format="OGG", subtype="OPUS") as out:
+        for block in sf.blocks(wav_path, blocksize=BLOCK_FRAMES, dtype="float32"):
+            out.write(block)
+    return ogm_chapters(marks, info.samplerate)
+
+def chapters_sidecar_path(out_path):
+    """Capítulos OGM que acompañan a una exportación hecha sin ffmpeg (no van dentro del audio)."""
+    return out_path + ".chapters.txt" # audiobook.ogg.chapters.txt: uno por formato
+
+def _temp_path(path):
+    # Temporal único en el mismo directorio (mismo sistema de ficheros para os.replace):
+    # dos exportaciones a la vez, aunque sea del mismo proceso, no se pisan
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    return tmp_path
+
+def export_audiobook(wav_path, out_path, marks, title, fmt="m4b", bitrate=None, ffmpeg="auto"):
+    """
+    Codifica `wav_path` en `out_path` con los capítulos `marks` (ver chapter_marks).
+    ffmpeg="auto" lo busca en el PATH; None fuerza la ruta sin ffmpeg (solo Ogg), que
+    deja los capítulos en chapters_sidecar_path(out_path) en lugar de dentro del audio.
+    Escribe a un temporal y lo renombra: una exportación interrumpida no deja un
+    fichero a medias. Devuelve out_path.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: {fmt}")
+    if ffmpeg == "auto":
+        ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg and fmt != "ogg":
+        raise RuntimeError("Se necesita ffmpeg para exportar a M4B (instálalo o usa el formato ogg)")
+
+    sidecar = chapters_sidecar_path(out_path)
+    tmp_path = _temp_path(out_path)
+    tmp_sidecar = None
+    try:
+        if ffmpeg:
+            _encode_ffmpeg(ffmpeg, wav_path, tmp_path, marks, title, fmt, bitrate)
+            os.replace(tmp_path, out_path)
+            if os.path.exists(sidecar):
+                os.remove(sidecar) # Los capítulos ya van dentro: el adjunto de antes sobra
+        else:
+            chapters = _encode_soundfile(wav_path, tmp_path, marks)
+            tmp_sidecar = _temp_path(sidecar)
+            with open(tmp_sidecar, "w", encoding="utf-8") as f:
+                f.write(chapters)
+            os.replace(tmp_sidecar, sidecar)
+            os.replace(tmp_path, out_path)
+    finally:
+        for path in (tmp_path, tmp_sidecar):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return out_path
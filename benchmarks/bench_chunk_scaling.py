@@ -0,0 +1,92 @@
+"""
+Benchmark de escalado de la contabilidad de chunks.
+
+Crea proyectos sintéticos (hasta 20 000 chunks), sustituye Kokoro por un generador
+trivial y mide el coste por chunk completado. Compara con el esquema anterior
+(leer status.json, buscar el chunk con next(), recontar con sum() y reescribir todo).
+
+Uso: python benchmarks/bench_chunk_scaling.py [--sizes 1000 5000 20000] [--sample 200]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from manager import BatchManager
+
+class StubBatchManager(BatchManager):
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self._init_state()
+
+    def _synthesize_sub_chunks(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        yield text, np.zeros(240, dtype=np.float32), 24000
+
+def synthetic_chunks(n):
+    sentence = "Harry Haller era un lobo estepario que vagaba por la ciudad. "
+    return [sentence * 40 for _ in range(n)]
+
+def legacy_completion(status_path, chunk_id):
+    """Reproduce la contabilidad previa: O(N) lecturas, búsquedas y escrituras."""
+    with open(status_path, "r", encoding="utf-8") as f:
+        status = json.load(f)
+    c = next((ch for ch in status["chunks"] if ch["id"] == chunk_id), None)
+    if c:
+        c["status"] = "completed"
+    status["completed_chunks"] = sum(1 for ch in status["chunks"] if ch["status"] == "completed")
+    with open(status_path, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+
+def bench_size(root, n, sample):
+    manager = StubBatchManager(os.path.join(root, f"n{n}"))
+    t0 = time.perf_counter()
+    project_id = manager.create_project(f"Sintetico {n}", synthetic_chunks(n), "em_alex", 1.0, "es")
+    create_s = time.perf_counter() - t0
+
+    # Completar `sample` chunks repartidos por el libro con la ruta actual
+    ids = np.linspace(0, n - 2, sample, dtype=int).tolist()
+    t0 = time.perf_counter()
+    for cid in ids:
+        manager.process_chunk(project_id, cid)
+    current_ms = (time.perf_counter() - t0) / len(ids) * 1000
+
+    t0 = time.perf_counter()
+    for _ in range(sample):
+        manager.process_next_chunk(project_id)
+    next_ms = (time.perf_counter() - t0) / sample * 1000
+
+    # Misma cantidad de completados con el esquema antiguo (solo contabilidad)
+    status_path = os.path.join(manager.projects_dir, project_id, "status.json")
+    legacy_ids = ids[: max(1, sample // 10)]
+    t0 = time.perf_counter()
+    for cid in legacy_ids:
+        legacy_completion(status_path, cid)
+    legacy_ms = (time.perf_counter() - t0) / len(legacy_ids) * 1000
+
+    manager.shutdown()
+    return create_s, current_ms, next_ms, legacy_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado de la contabilidad de chunks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_chunks_")
+    try:
+        print(f"{'chunks':>8} {'crear (s)':>10} {'chunk (ms)':>11} {'next (ms)':>10} {'antiguo (ms)':>13} {'total antiguo (s)':>18}")
+        for n in args.sizes:
+            create_s, current_ms, next_ms, legacy_ms = bench_size(root, n, args.sample)
+            # Coste de contabilidad de un libro entero con el esquema antiguo
+            legacy_total = legacy_ms * n / 1000
+            print(f"{n:>8} {create_s:>10.2f} {current_ms:>11.3f} {next_ms:>10.3f} {legacy_ms:>13.2f} {legacy_total:>18.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de arranque en frío: del inicio del proceso al primer audio.
+
+Cada modo se ejecuta en un proceso nuevo (arranque realmente en frío):
+- antes:     carga síncrona del modelo sin calentamiento ni grafo en caché
+             (comportamiento previo; el servidor no podía escuchar hasta el final).
+- sin-cache: carga en segundo plano con calentamiento, optimizando el grafo al cargar.
+- despues:   carga en segundo plano con calentamiento y grafo optimizado en caché; el
+             servidor escucha al instante y la primera petición no paga la
+             inicialización del grafo.
+Antes de medir se hace un arranque sin contar que crea el grafo en caché.
+
+Con --synthetic usa los modelos sintéticos de synthetic_model.py (uno de pesos y otro
+de muchos nodos) con la interfaz de Kokoro, en lugar de kokoro-v1.0.onnx.
+
+Uso: python benchmarks/bench_cold_start.py [--model kokoro-v1.0.onnx] [--voices voices-v1.0.bin] [--synthetic]
+Requiere eSpeak NG y los ficheros del modelo (salvo con --synthetic).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from synthetic_model import make_model, make_graph_model, make_voices
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    "antes": {"background_load": False, "warmup": False, "session_config": {"cache_optimized_model": False}},
+    "sin-cache": {"background_load": True, "warmup": True, "session_config": {"cache_optimized_model": False}},
+    "despues": {"background_load": True, "warmup": True, "session_config": None},
+}
+FIRST_TEXT = ("Era el lobo estepario un hombre de unos cincuenta años que una tarde llegó a nuestra casa "
+              "y preguntó por una habitación amueblada.")
+
+def child(mode, model, voices):
+    t0 = time.perf_counter()
+    sys.path.append(ROOT)
+    from manager import BatchManager
+    projects_dir = tempfile.mkdtemp(prefix="bench_cold_")
+
+    manager = BatchManager(projects_dir, model, voices, **MODES[mode])
+    http_ready = time.perf_counter() - t0  # Momento en que app.run podría escuchar
+
+    manager.get_kokoro()
+    model_ready = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    manager._generate_audio_safe(FIRST_TEXT, "em_alex", 1.0, "es")
+    first_request = time.perf_counter() - t1
+    first_audio = time.perf_counter() - t0
+    manager.shutdown()
+    print(json.dumps({
+        "http_ready": http_ready,
+        "model_ready": model_ready,
+        "first_request": first_request,
+        "first_audio": first_audio,
+    }))
+
+def run_child(mode, model, voices):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--model", model, "--voices", voices],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+def measure(model, voices, runs):
+    run_child("despues", model, voices) # Crea el grafo en caché y el paquete de voces
+    print(f"{'modo':>10} {'HTTP (s)':>9} {'modelo (s)':>11} {'1ª petición (s)':>16} {'1er audio (s)':>14}")
+    for mode in MODES:
+        for _ in range(runs):
+            r = run_child(mode, model, voices)
+            print(f"{mode:>10} {r['http_ready']:>9.2f} {r['model_ready']:>11.2f} {r['first_request']:>16.2f} {r['first_audio']:>14.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque en frío hasta el primer audio")
+    parser.add_argument("--model", default=os.path.join(ROOT, "kokoro-v1.0.onnx"))
+    parser.add_argument("--voices", default=os.path.join(ROOT, "voices-v1.0.bin"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=list(MODES))
+    parser.add_argument("--synthetic", action="store_true", help="Modelos sintéticos con la interfaz de Kokoro")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.model, args.voices)
+        return
+
+    if args.synthetic:
+        tmp = tempfile.mkdtemp(prefix="bench_cold_")
+        try:
+            voices = os.path.join(tmp, "voices.bin")
+            make_voices(voices)
+            for label, make in (("pesos", make_model), ("nodos", make_graph_model)):
+                model = os.path.join(tmp, f"{label}.onnx")
+                make(model)
+                print(f"\nModelo sintético de {label} ({os.path.getsize(model) / 2**20:.0f} MB)")
+                measure(model, voices, args.runs)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    if not (os.path.exists(args.model) and os.path.exists(args.voices)):
+        print(f"No se encuentran {args.model} / {args.voices}. Descarga los ficheros del modelo.")
+        sys.exit(1)
+    measure(args.model, args.voices, args.runs)
+
+if __name__ == "__main__":
+    main()
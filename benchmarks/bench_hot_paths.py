@@ -0,0 +1,236 @@
+"""
+Micro-benchmarks de las rutas calientes de texto y audio, con comparación contra una base.
+
+Fixtures: el PDF incluido (El lobo estepario) y los status.json de projects/ (copiados a
+una carpeta temporal, nunca se modifican los originales). El audio lo produce un motor
+simulado (tono de la duración esperada, sin dormir), así que se mide solo el código propio.
+
+Etapas:
+- extract_text: TextProcessor.extract_text sobre el PDF.
+- split_into_chunks / detect_chapters: segmentación del libro (4000/2500, como app.py).
+- split_sub_chunks: limpieza por regex y split_text anidado de BatchManager.
+- generate_audio_safe: sub-partes + concatenación en memoria de varios chunks.
+- update_project_status: reescritura de status.json en cada proyecto de projects/.
+- assemble_audio: ensamblado por streaming de un proyecto con chunks ya sintetizados.
+
+Cada etapa se calienta una vez y se repite --repeats veces (mediana, mínimo y rango
+intercuartílico); una ejecución adicional con tracemalloc da el pico de memoria reservada.
+Los resultados se guardan en JSON; con --baseline se comparan y se marca regresión si la
+mediana empeora más de --tolerance (y más de --noise-ms) o el pico de memoria más de
+--mem-tolerance. Sale con código 1 si hay regresiones.
+
+Uso:
+    python benchmarks/bench_hot_paths.py --save-baseline benchmarks/results/base.json
+    python benchmarks/bench_hot_paths.py --baseline benchmarks/results/base.json [--stages split_sub_chunks]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+import numpy as np
+import soundfile as sf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from manager import BatchManager
+from processor import TextProcessor
+
+PDF_PATH = os.path.join(ROOT, "Hesse_Hermann - El lobo estepario.pdf")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SAMPLE_RATE = 24000
+CHARS_PER_SECOND = 15
+
+class StubBatchManager(BatchManager):
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self._init_state()
+
+    def _synthesize_sub_chunks(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        for sub_text in self._split_sub_chunks(text):
+            n = int(len(sub_text) / CHARS_PER_SECOND * SAMPLE_RATE)
+            yield sub_text, np.full(n, 0.01, dtype=np.float32), SAMPLE_RATE
+
+class Fixtures:
+    def __init__(self, workdir, assemble_chunks):
+        self.workdir = workdir
+        self.text = TextProcessor.extract_text(PDF_PATH)
+        self.chunks = TextProcessor.split_into_chunks(self.text, target_len=2500, first_chunk_len=4000)
+        self.manager = StubBatchManager(os.path.join(workdir, "projects"))
+
+        # Proyectos reales: solo status.json (la tabla de estados se reconstruye al cargar)
+        self.project_ids = []
+        for status_path in sorted(glob.glob(os.path.join(ROOT, "projects", "*", "status.json"))):
+            pid = os.path.basename(os.path.dirname(status_path))
+            os.makedirs(os.path.join(self.manager.projects_dir, pid), exist_ok=True)
+            shutil.copyfile(status_path, os.path.join(self.manager.projects_dir, pid, "status.json"))
+            self.project_ids.append(pid)
+
+        # Chunks sintetizados una vez; cada repetición del ensamblado parte de una copia
+        self.assemble_source = os.path.join(workdir, "assemble_source")
+        os.makedirs(self.assemble_source)
+        for i, chunk in enumerate(self.chunks[:assemble_chunks]):
+            metadata, _ = self.manager._generate_audio_to_file(
+                chunk, "em_alex", 1.0, "es", os.path.join(self.assemble_source, f"chunk_{i}.wav"))
+            with open(os.path.join(self.assemble_source, f"chunk_{i}.json"), "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+        self.assemble_chunks = self.chunks[:assemble_chunks]
+
+STAGES = {}
+
+def stage(func):
+    STAGES[func.__name__] = func
+    return func
+
+# Cada etapa devuelve (preparación, ejecución); solo se cronometra la ejecución
+
+@stage
+def extract_text(fx):
+    return None, lambda: TextProcessor.extract_text(PDF_PATH)
+
+@stage
+def split_into_chunks(fx):
+    return None, lambda: TextProcessor.split_into_chunks(fx.text, target_len=2500, first_chunk_len=4000)
+
+@stage
+def detect_chapters(fx):
+    def run():
+        chunks = TextProcessor.split_into_chunks(fx.text, target_len=2500, first_chunk_len=4000, chapter_breaks=True)
+        TextProcessor.detect_chapters(chunks)
+    return None, run
+
+@stage
+def split_sub_chunks(fx):
+    def run():
+        for chunk in fx.chunks:
+            fx.manager._split_sub_chunks(chunk)
+    return None, run
+
+@stage
+def generate_audio_safe(fx):
+    def run():
+        for chunk in fx.chunks[:10]:
+            fx.manager._generate_audio_safe(chunk, "em_alex", 1.0, "es")
+    return None, run
+
+@stage
+def update_project_status(fx):
+    counter = [0]
+    def update(status):
+        counter[0] += 1
+        status["last_chunk"] = counter[0] % max(1, status["total_chunks"])
+    def run():
+        for pid in fx.project_ids:
+            fx.manager._update_project_status(pid, update)
+    return None, run
+
+@stage
+def assemble_audio(fx):
+    state = {}
+    def setup():
+        pid = fx.manager.create_project("Ensamblado", fx.assemble_chunks, "em_alex", 1.0, "es")
+        chunks_dir = os.path.join(fx.manager.projects_dir, pid, "audio_chunks")
+        for name in os.listdir(fx.assemble_source):
+            shutil.copyfile(os.path.join(fx.assemble_source, name), os.path.join(chunks_dir, name))
+        # Marcar como completado sin pasar por la síntesis
+        fx.manager._update_project_status(pid, lambda s: [c.update(status="completed") for c in s["chunks"]])
+        state["pid"] = pid
+    def run():
+        fx.manager.assemble_audio(state["pid"])
+    return setup, run
+
+def measure(fx, name, repeats):
+    setup, run = STAGES[name](fx)
+    samples = []
+    for i in range(repeats + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        if i: # La primera ejecución es de calentamiento
+            samples.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ms = sorted(s * 1000 for s in samples)
+    q1, _, q3 = statistics.quantiles(ms, n=4) if len(ms) > 1 else (ms[0], None, ms[0])
+    return {"median_ms": statistics.median(ms), "min_ms": ms[0], "iqr_ms": q3 - q1,
+            "peak_alloc_kb": peak / 1024, "repeats": repeats}
+
+def compare(results, baseline, tolerance, mem_tolerance, noise_ms):
+    """Devuelve la lista de regresiones frente a la base (etapas presentes en ambas)."""
+    regressions = []
+    for name, current in results["stages"].items():
+        base = baseline["stages"].get(name)
+        if not base:
+            continue
+        slower = current["median_ms"] - base["median_ms"]
+        if slower > noise_ms and current["median_ms"] > base["median_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: mediana {base['median_ms']:.2f} -> {current['median_ms']:.2f} ms")
+        if current["peak_alloc_kb"] > base["peak_alloc_kb"] * (1 + mem_tolerance) + 64:
+            regressions.append(f"{name}: memoria {base['peak_alloc_kb']:.0f} -> {current['peak_alloc_kb']:.0f} KB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de texto y audio con comparación")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--assemble-chunks", type=int, default=20)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "hot_paths_latest.json"))
+    parser.add_argument("--baseline", default=None, help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument("--save-baseline", default=None, help="Guardar también esta ejecución como base")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Empeoramiento relativo de la mediana admitido")
+    parser.add_argument("--mem-tolerance", type=float, default=0.10)
+    parser.add_argument("--noise-ms", type=float, default=0.5, help="Diferencias menores se ignoran")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_hot_")
+    fx = None
+    try:
+        fx = Fixtures(workdir, args.assemble_chunks)
+        print(f"Fixtures: PDF de {len(fx.text)} caracteres, {len(fx.chunks)} chunks, "
+              f"{len(fx.project_ids)} proyectos de projects/")
+        results = {
+            "meta": {"python": platform.python_version(), "numpy": np.__version__,
+                     "soundfile": sf.__version__, "machine": platform.machine(),
+                     "platform": platform.platform(), "timestamp": time.time()},
+            "stages": {}
+        }
+        print(f"{'etapa':>22} {'mediana (ms)':>13} {'mín (ms)':>10} {'IQR (ms)':>9} {'pico (KB)':>10}")
+        for name in args.stages:
+            r = measure(fx, name, args.repeats)
+            results["stages"][name] = r
+            print(f"{name:>22} {r['median_ms']:>13.2f} {r['min_ms']:>10.2f} {r['iqr_ms']:>9.2f} {r['peak_alloc_kb']:>10.0f}")
+    finally:
+        if fx is not None:
+            fx.manager.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.mem_tolerance, args.noise_ms)
+        if regressions:
+            print("REGRESIONES frente a la base:")
+            for r in regressions:
+                print(f"  ✗ {r}")
+            sys.exit(1)
+        print("Sin regresiones frente a la base.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Comparativa de variantes del modelo (fp32, fp16, int8...): velocidad, memoria y calidad.
+
+Cada variante se ejecuta en un proceso nuevo sobre un corpus fijo en español e inglés.
+Se informa de:
+- RTF: tiempo de cómputo / duración del audio (menor es mejor).
+- RSS pico del proceso (MB).
+- Diferencia a nivel de señal frente a fp32: distancia log-espectral media (dB, menor
+  es más parecido) y relación de duraciones. Se compara el espectro y no la forma de
+  onda porque pequeñas diferencias de fase o de duración invalidan un SNR muestra a muestra.
+
+Con --synthetic las variantes salen del modelo sintético de pesos de synthetic_model.py
+(interfaz de Kokoro): fp16 de pesos con Cast a float32 e int8 con quantize_dynamic de
+onnxruntime. Mide lo que cuesta y lo que se aleja cada formato en un grafo dominado por
+MatMul, no la calidad de la voz de Kokoro.
+
+Uso: python benchmarks/bench_model_variants.py [--variants fp32 fp16 int8] [--synthetic]
+Requiere eSpeak NG y los ficheros de cada variante y voices-v1.0.bin (salvo con --synthetic).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import shutil
+import subprocess
+import numpy as np
+from synthetic_model import make_model, make_voices, make_fp16_model, make_int8_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANT_FILES = {
+    "fp32": "kokoro-v1.0.onnx",
+    "fp16": "kokoro-v1.0.fp16.onnx",
+    "int8": "kokoro-v1.0.int8.onnx",
+}
+
+CORPUS = [
+    ("es", "em_alex", "Había una vez un hombre llamado Harry Haller que se denominaba a sí mismo el lobo estepario."),
+    ("es", "ef_dora", "¿Qué te parece el sonido? Esta voz se ejecuta en tu ordenador, sin conexión y sin coste."),
+    ("es", "em_alex", "Vivía solo, leía mucho y paseaba de noche por las calles de una ciudad que no terminaba de entender, "
+                      "entre tabernas, conciertos y largas conversaciones consigo mismo."),
+    ("en-us", "af_bella", "The quick brown fox jumps over the lazy dog while the audiobook keeps playing."),
+    ("en-us", "am_adam", "Chapter one. It was a bright cold day in April, and the clocks were striking thirteen."),
+]
+
+SYNTHETIC_VARIANTS = {"fp16": make_fp16_model, "int8": make_int8_model}
+
+def peak_rss_mb():
+    # VmHWM es del propio proceso: ru_maxrss en Linux conserva tras exec el pico del padre
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+    except ImportError: # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except Exception:
+            return float("nan")
+
+def child(model, voices, out_path):
+    sys.path.append(ROOT)
+    from kokoro_onnx import Kokoro
+    from session_config import build_session
+
+    t0 = time.perf_counter()
+    kokoro = Kokoro.from_session(build_session(model), voices)
+    load_s = time.perf_counter() - t0
+    kokoro.create("Hola.", voice=CORPUS[0][1], lang="es")  # Calentamiento
+
+    outputs, compute, audio = {}, 0.0, 0.0
+    for i, (lang, voice, text) in enumerate(CORPUS):
+        t0 = time.perf_counter()
+        samples, sr = kokoro.create(text, voice=voice, speed=1.0, lang=lang)
+        compute += time.perf_counter() - t0
+        audio += len(samples) / sr
+        outputs[f"s{i}"] = samples.astype(np.float32)
+    np.savez(out_path, **outputs)
+    print(json.dumps({"load_s": load_s, "rtf": compute / audio, "peak_rss_mb": peak_rss_mb()}))
+
+def log_spectral_distance(a, b, n_fft=1024, hop=256):
+    """Distancia log-espectral media (dB) entre dos señales, sobre la longitud común."""
+    n = min(len(a), len(b))
+    if n < n_fft:
+        return float("nan")
+    window = np.hanning(n_fft).astype(np.float32)
+
+    def spectrum(x):
+        frames = np.lib.stride_tricks.sliding_window_view(x[:n], n_fft)[::hop] * window
+        return 20 * np.log10(np.abs(np.fft.rfft(frames, axis=1)) + 1e-6)
+
+    diff = spectrum(a) - spectrum(b)
+    return float(np.mean(np.sqrt(np.mean(diff ** 2, axis=1))))
+
+def run_variants(args, tmp):
+    files = {variant: os.path.join(ROOT, VARIANT_FILES.get(variant, variant)) for variant in args.variants}
+    if args.synthetic:
+        args.voices = os.path.join(tmp, "voices.bin")
+        make_voices(args.voices)
+        files = {"fp32": os.path.join(tmp, "modelo.onnx")}
+        make_model(files["fp32"])
+        for variant in args.variants:
+            if variant in SYNTHETIC_VARIANTS:
+                files[variant] = os.path.join(tmp, f"modelo.{variant}.onnx")
+                SYNTHETIC_VARIANTS[variant](files["fp32"], files[variant])
+    results = {}
+    for variant in args.variants:
+        model = files.get(variant)
+        if not model or not os.path.exists(model):
+            print(f"[{variant}] No se encuentra {model}, se omite.")
+            continue
+        out_path = os.path.join(tmp, f"{variant}.npz")
+        out = subprocess.run(
+            [sys.executable, __file__, "--voices", args.voices, "--child", model, out_path],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        results[variant] = dict(json.loads(out), outputs=dict(np.load(out_path)))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="RTF, memoria y calidad por variante del modelo")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANT_FILES))
+    parser.add_argument("--voices", default=os.path.join(ROOT, "voices-v1.0.bin"))
+    parser.add_argument("--child", nargs=2, metavar=("MODEL", "OUT"))
+    parser.add_argument("--synthetic", action="store_true", help="Variantes de un modelo sintético")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.voices, args.child[1])
+        return
+
+    if "fp32" not in args.variants:
+        args.variants.insert(0, "fp32")  # Referencia de calidad
+    tmp = tempfile.mkdtemp(prefix="bench_variants_")
+    try:
+        results = run_variants(args, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if "fp32" not in results:
+        print("Hace falta la variante fp32 como referencia.")
+        sys.exit(1)
+
+    reference = results["fp32"]["outputs"]
+    print(f"{'variante':>9} {'carga (s)':>10} {'RTF':>7} {'RSS pico (MB)':>14} {'LSD vs fp32 (dB)':>17} {'duración vs fp32':>17}")
+    for variant, r in results.items():
+        lsd = [log_spectral_distance(reference[k], r["outputs"][k]) for k in reference]
+        ratio = [len(r["outputs"][k]) / len(reference[k]) for k in reference]
+        print(f"{variant:>9} {r['load_s']:>10.2f} {r['rtf']:>7.3f} {r['peak_rss_mb']:>14.0f} "
+              f"{np.nanmean(lsd):>17.2f} {np.mean(ratio):>17.3f}")
+
+if __name__ == "__main__":
+    main()
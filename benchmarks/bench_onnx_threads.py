@@ -0,0 +1,100 @@
+"""
+Barrido de configuraciones de onnxruntime: hilos intra/inter-op y modo de ejecución.
+
+Para cada configuración crea una sesión nueva, calienta el modelo y sintetiza varias
+veces un texto fijo en español, imprimiendo el RTF (tiempo de cómputo / duración del
+audio; menor es mejor). Sirve para elegir SESSION_CONFIG en app.py en cada máquina.
+
+Con --synthetic usa el modelo sintético de pesos de synthetic_model.py (interfaz de
+Kokoro) en lugar de kokoro-v1.0.onnx: el RTF no es el de Kokoro, pero sí la diferencia
+entre configuraciones para un grafo dominado por MatMul.
+
+Uso: python benchmarks/bench_onnx_threads.py [--repeats 3] [--threads 1 2 4 8] [--synthetic]
+Requiere eSpeak NG y kokoro-v1.0.onnx y voices-v1.0.bin (salvo con --synthetic).
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from kokoro_onnx import Kokoro
+from session_config import build_session
+from synthetic_model import make_model, make_voices
+
+TEXT = ("Había una vez un hombre llamado Harry Haller que se denominaba a sí mismo el lobo estepario. "
+        "Vivía solo, leía mucho y paseaba de noche por las calles de una ciudad que no terminaba de entender.")
+
+def default_thread_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+def run_config(model, voices, config, repeats):
+    start = time.perf_counter()
+    session = build_session(model, config)
+    kokoro = Kokoro.from_session(session, voices)
+    load_s = time.perf_counter() - start
+    kokoro.create(TEXT[:60], voice="em_alex", speed=1.0, lang="es")  # Calentamiento
+
+    compute, audio = 0.0, 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        samples, sr = kokoro.create(TEXT, voice="em_alex", speed=1.0, lang="es")
+        compute += time.perf_counter() - t0
+        audio += len(samples) / sr
+    return load_s, compute / audio
+
+def main():
+    parser = argparse.ArgumentParser(description="RTF por configuración de onnxruntime")
+    parser.add_argument("--model", default=os.path.join(ROOT, "kokoro-v1.0.onnx"))
+    parser.add_argument("--voices", default=os.path.join(ROOT, "voices-v1.0.bin"))
+    parser.add_argument("--threads", type=int, nargs="+", default=default_thread_counts())
+    parser.add_argument("--inter", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="No usar el grafo optimizado en caché")
+    parser.add_argument("--synthetic", action="store_true", help="Modelo sintético con la interfaz de Kokoro")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.synthetic:
+        tmp = tempfile.mkdtemp(prefix="bench_threads_")
+        args.model, args.voices = os.path.join(tmp, "modelo.onnx"), os.path.join(tmp, "voices.bin")
+        make_model(args.model)
+        make_voices(args.voices)
+    elif not (os.path.exists(args.model) and os.path.exists(args.voices)):
+        print(f"No se encuentran {args.model} / {args.voices}. Descarga los ficheros del modelo.")
+        sys.exit(1)
+
+    configs = [{"execution_mode": "sequential", "intra_op_num_threads": t, "inter_op_num_threads": None}
+               for t in args.threads]
+    configs += [{"execution_mode": "parallel", "intra_op_num_threads": t, "inter_op_num_threads": i}
+                for t, i in itertools.product(args.threads, args.inter)]
+
+    print(f"CPU lógicas: {os.cpu_count()}")
+    print(f"{'modo':>11} {'intra':>6} {'inter':>6} {'carga (s)':>10} {'RTF':>8}")
+    results = []
+    try:
+        for config in configs:
+            config = dict(config, cache_optimized_model=not args.no_cache)
+            load_s, rtf = run_config(args.model, args.voices, config, args.repeats)
+            results.append((rtf, config))
+            print(f"{config['execution_mode']:>11} {config['intra_op_num_threads']:>6} "
+                  f"{str(config['inter_op_num_threads'] or '-'):>6} {load_s:>10.2f} {rtf:>8.3f}")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    rtf, best = min(results, key=lambda r: r[0])
+    print(f"\nMejor configuración (RTF {rtf:.3f}): {best}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Rendimiento de la etapa de salida (audio_format): remuestreo, dither y normalización.
+
+Dos partes:
+- Etapa aislada: Resampler, to_int16 con dither y convert completo sobre --seconds de
+  ruido rosa-ish a 24 kHz, en bloques del tamaño de una sub-parte. Da segundos de audio
+  procesados por segundo de CPU (x tiempo real) para cada frecuencia de salida.
+- Proyecto: un libro simulado (Kokoro sustituido por un tono de la duración esperada)
+  sintetizado y ensamblado con el formato original y con el preset "voz". Compara el
+  tiempo de escritura de chunks y de ensamblado y el tamaño en disco del audio final.
+
+Uso: python benchmarks/bench_output_format.py [--seconds 600] [--rates 16000 22050] [--chunks 20]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from manager import BatchManager
+from audio_format import Resampler, to_int16, convert, parse_output_format
+
+SAMPLE_RATE = 24000
+CHARS_PER_SECOND = 15
+BLOCK_SECONDS = 15 # Duración típica de una sub-parte
+
+class StubBatchManager(BatchManager):
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self._init_state()
+
+    def _synthesize_sub_chunks(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        for sub_text in self._split_sub_chunks(text):
+            n = int(len(sub_text) / CHARS_PER_SECOND * SAMPLE_RATE)
+            t = np.arange(n, dtype=np.float32)
+            yield sub_text, (0.3 * np.sin(t / 11) * np.sin(t / 2400)).astype(np.float32), SAMPLE_RATE
+
+def make_audio(seconds):
+    rng = np.random.default_rng(0)
+    white = rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32)
+    # Ruido con más energía en graves, parecido al espectro de la voz
+    return (np.cumsum(white) * 0.001 % 1.0 - 0.5).astype(np.float32) * 0.5
+
+def timed(func, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def stage_benchmark(seconds, rates):
+    audio = make_audio(seconds)
+    blocks = np.array_split(audio, max(1, seconds // BLOCK_SECONDS))
+
+    def resample(rate):
+        resampler = Resampler(SAMPLE_RATE, rate)
+        for block in blocks:
+            resampler.process(block)
+        resampler.flush()
+
+    print(f"Etapa aislada: {seconds} s de audio a {SAMPLE_RATE} Hz en bloques de {BLOCK_SECONDS} s")
+    print(f"{'etapa':<28} {'tiempo (s)':>11} {'x tiempo real':>14}")
+    rows = [("int16 sin dither", lambda: [to_int16(b, dither=False) for b in blocks]),
+            ("int16 con dither TPDF", lambda: [to_int16(b) for b in blocks])]
+    for rate in rates:
+        rows.append((f"remuestreo -> {rate}", lambda rate=rate: resample(rate)))
+        fmt = {"samplerate": rate, "dither": True}
+        rows.append((f"convert -> {rate} + dither", lambda fmt=fmt: [convert(b, SAMPLE_RATE, fmt) for b in blocks]))
+    for name, func in rows:
+        elapsed = timed(func)
+        print(f"{name:<28} {elapsed:>11.3f} {seconds / elapsed:>14.0f}")
+
+def project_benchmark(chunks):
+    sentence = "El lobo estepario caminaba despacio por la ciudad dormida, pensando en Hermine. "
+    texts = [sentence * 30 for _ in range(chunks)]
+    print(f"\nProyecto simulado: {chunks} chunks de {len(texts[0])} caracteres")
+    print(f"{'formato':<10} {'chunks (s)':>11} {'ensamblado (s)':>15} {'final (MB)':>11} {'Hz':>7}")
+    for preset in ("original", "voz"):
+        tmp = tempfile.mkdtemp(prefix="bench_format_")
+        manager = StubBatchManager(tmp)
+        try:
+            project_id = manager.create_project("Bench", texts, "em_alex", 1.0, "es",
+                                                output_format=parse_output_format(preset))
+            t0 = time.perf_counter()
+            for chunk_id in range(len(texts) - 1):
+                manager.process_chunk(project_id, chunk_id)
+            render_s = time.perf_counter() - t0
+            # El último chunk dispara el ensamblado: se mide aparte
+            t0 = time.perf_counter()
+            manager.process_chunk(project_id, len(texts) - 1)
+            last_s = time.perf_counter() - t0
+            final_path = manager.final_audio_path(project_id)
+            rate = sf.info(final_path).samplerate
+            size_mb = os.path.getsize(final_path) / 2**20
+            print(f"{preset:<10} {render_s:>11.2f} {last_s:>15.2f} {size_mb:>11.1f} {rate:>7}")
+        finally:
+            manager.shutdown()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento de la etapa de salida de audio")
+    parser.add_argument("--seconds", type=int, default=600)
+    parser.add_argument("--rates", type=int, nargs="+", default=[16000, 22050])
+    parser.add_argument("--chunks", type=int, default=20)
+    args = parser.parse_args()
+    stage_benchmark(args.seconds, args.rates)
+    project_benchmark(args.chunks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Memoria total de N procesos de síntesis: pesos privados frente a pesos compartidos.
+
+Lanza N procesos (como los workers de batch_convert) que crean la sesión con
+build_session, abren las voces y hacen unas inferencias; con todos vivos a la vez se
+leen sus /proc/<pid>/smaps_rollup. Modos:
+- normal:       sesión por defecto, voces del .npz (cada proceso con su copia de pesos).
+- compartido:   shared_weights sin pre-empaquetado y voces de voice_pack.
+- comp+prepack: shared_weights con pre-empaquetado (ORT vuelve a copiar los pesos).
+
+RSS cuenta también las páginas compartidas en cada proceso, así que su suma no baja al
+compartir: la métrica es PSS (cada página compartida se reparte entre quienes la
+mapean; la suma es la memoria real del conjunto) y USS (memoria privada). También se da
+el tiempo de inferencia, porque sin pre-empaquetado MatMul/Conv van algo más lentos, y
+el tiempo de consulta de una voz (.npz frente al paquete mapeado).
+
+Sin --model usa el modelo sintético de pesos de synthetic_model.py (--model-mb de
+pesos) y unas voces sintéticas con la forma de voices-v1.0.bin; necesita el paquete onnx. Con --model
+y --voices usa Kokoro de verdad (requiere eSpeak NG). Solo Linux.
+
+Uso: python benchmarks/bench_shared_memory.py [--workers 1 2 4] [--model-mb 160] [--model kokoro-v1.0.onnx --voices voices-v1.0.bin]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from synthetic_model import make_model, make_voices, make_inputs
+
+MODES = {
+    "normal": {},
+    "compartido": {"shared_weights": True, "prepack_weights": False},
+    "comp+prepack": {"shared_weights": True},
+}
+INFERENCES = 5
+TEXT = "El lobo estepario caminaba despacio por la ciudad dormida, pensando en Hermine."
+
+def memory(pid):
+    """Rss, Pss y USS (privada) de un proceso, en MB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values["Rss"], values["Pss"], values["Private_Clean"] + values["Private_Dirty"]
+
+def voices_for(mode, voices_path):
+    if mode == "normal":
+        return np.load(voices_path) # Como kokoro-onnx: cada consulta lee del .npz
+    from voice_pack import load_voice_pack
+    return load_voice_pack(voices_path)
+
+def worker(mode, model_path, voices_path, real, ready, done, results):
+    from session_config import build_session
+    config = dict(MODES[mode], intra_op_num_threads=1)
+    if real:
+        from manager import BatchManager
+        manager = BatchManager(tempfile.mkdtemp(prefix="bench_shared_"), model_path, voices_path,
+                               background_load=False, warmup=False, session_config=config)
+        kokoro = manager.get_kokoro()
+        voices = kokoro.voices
+        run = lambda: kokoro.create(TEXT, voice="em_alex", speed=1.0, lang="es")
+    else:
+        session = build_session(model_path, config)
+        voices = voices_for(mode, voices_path)
+        inputs = make_inputs()
+        run = lambda: session.run(None, inputs)
+    run()
+    t0 = time.perf_counter()
+    for _ in range(INFERENCES):
+        run()
+    infer_s = (time.perf_counter() - t0) / INFERENCES
+    names = sorted(voices.keys())
+    t0 = time.perf_counter()
+    for i in range(200):
+        voices[names[i % len(names)]][100] # Lo que hace Kokoro con cada chunk
+    lookup_us = (time.perf_counter() - t0) / 200 * 1e6
+    results.put((os.getpid(), infer_s, lookup_us))
+    ready.wait() # Vivo hasta que el coordinador mide a todos
+    done.wait()
+
+def measure(mode, workers, model_path, voices_path, real):
+    ctx = mp.get_context("spawn")
+    ready, done, results = ctx.Barrier(workers + 1), ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, model_path, voices_path, real, ready, done, results))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    stats = [results.get() for _ in procs]
+    ready.wait()
+    usage = [memory(p.pid) for p in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    rss, pss, uss = (sum(u[i] for u in usage) for i in range(3))
+    infer_s = sum(s[1] for s in stats) / workers
+    lookup_us = sum(s[2] for s in stats) / workers
+    return rss, pss, uss, infer_s, lookup_us
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria de N procesos con y sin pesos compartidos")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model-mb", type=int, default=160)
+    parser.add_argument("--model", default=None, help="Modelo real (kokoro-v1.0.onnx)")
+    parser.add_argument("--voices", default=None, help="Voces reales (voices-v1.0.bin)")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("Este benchmark necesita /proc/<pid>/smaps_rollup (Linux).")
+        return
+
+    tmp = tempfile.mkdtemp(prefix="bench_shared_")
+    try:
+        real = bool(args.model and args.voices)
+        if real:
+            # Los ficheros derivados (grafo optimizado, pesos, paquete) se crean junto al original
+            model_path, voices_path = args.model, args.voices
+        else:
+            model_path, voices_path = os.path.join(tmp, "modelo.onnx"), os.path.join(tmp, "voices.bin")
+            make_model(model_path, args.model_mb)
+            make_voices(voices_path)
+        print(f"Modelo: {model_path} ({os.path.getsize(model_path) / 2**20:.0f} MB)")
+        # Primera pasada de cada modo en un proceso aparte: crea las cachés sin medirlas
+        for mode in args.modes:
+            measure(mode, 1, model_path, voices_path, real)
+
+        print(f"{'modo':<13} {'N':>3} {'RSS (MB)':>9} {'PSS (MB)':>9} {'USS (MB)':>9} "
+              f"{'PSS/N':>7} {'infer (s)':>10} {'voz (us)':>9}")
+        for mode in args.modes:
+            for n in args.workers:
+                rss, pss, uss, infer_s, lookup_us = measure(mode, n, model_path, voices_path, real)
+                print(f"{mode:<13} {n:>3} {rss:>9.0f} {pss:>9.0f} {uss:>9.0f} "
+                      f"{pss / n:>7.0f} {infer_s:>10.3f} {lookup_us:>9.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
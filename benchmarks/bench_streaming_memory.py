@@ -0,0 +1,88 @@
+"""
+Memoria pico por chunk: concatenación en memoria, escritura por sub-partes y
+sub-partes con checkpoint.
+
+La app usa la ruta con checkpoint (checkpoint_sub_parts, activo por defecto): cada
+sub-parte va a chunk_N.parts/ y al final se concatenan por bloques. Las otras dos son
+las alternativas de render_chunk sin checkpoint y sirven de referencia.
+
+Sustituye Kokoro por un sintetizador que produce la misma cantidad de muestras que el
+modelo real (~15 caracteres por segundo de habla a 24 kHz, float32) y mide con
+tracemalloc el pico de memoria de cada ruta para distintas longitudes de chunk
+(target_len de TextProcessor.split_into_chunks). numpy informa de sus reservas a
+tracemalloc, así que el pico incluye los buffers de audio.
+
+Uso: python benchmarks/bench_streaming_memory.py [--lengths 2500 10000 40000]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_manager import StubBatchManager
+
+SAMPLE_RATE = 24000
+CHARS_PER_SECOND = 15
+
+def speech(sub_text):
+    """Tantas muestras como duraría la sub-parte hablada."""
+    return np.full(int(len(sub_text) / CHARS_PER_SECOND * SAMPLE_RATE), 0.01, dtype=np.float32)
+
+def make_text(length):
+    sentence = "El lobo estepario caminaba despacio por la ciudad dormida, pensando en Hermine. "
+    return (sentence * (length // len(sentence) + 1))[:length]
+
+def measure(func):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria pico por chunk según la ruta de escritura")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[2500, 10000, 40000])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_stream_")
+    manager = StubBatchManager(tmp, samples=speech)
+    out_path = os.path.join(tmp, "chunk.wav")
+    parts_dir = os.path.join(tmp, "chunk.parts")
+
+    def concatenated(text):
+        metadata, samples, sr = manager._generate_audio_safe(text, "em_alex", 1.0, "es")
+        sf.write(out_path, samples, sr)
+
+    def streamed(text):
+        manager._generate_audio_to_file(text, "em_alex", 1.0, "es", out_path)
+
+    def checkpointed(text):
+        # Como en render_chunk: las sub-partes se borran cuando el WAV del chunk está hecho
+        manager._generate_audio_checkpointed(text, "em_alex", 1.0, "es", out_path, parts_dir)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    routes = [("concat", concatenated), ("streaming", streamed), ("checkpoint (app)", checkpointed)]
+    try:
+        print(f"{'caracteres':>10} {'audio (s)':>10} " + " ".join(f"{name + ' MB':>20} {name + ' s':>20}" for name, _ in routes))
+        for length in args.lengths:
+            text = make_text(length)
+            audio_s = length / CHARS_PER_SECOND
+            cells = []
+            for _, route in routes:
+                peak, elapsed = measure(lambda: route(text))
+                cells.append(f"{peak:>20.1f} {elapsed:>20.2f}")
+            print(f"{length:>10} {audio_s:>10.0f} " + " ".join(cells))
+    finally:
+        manager.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Prueba de carga de la API HTTP con un motor de síntesis simulado.
+
+Levanta app.py en un servidor werkzeug local (puerto libre, sin red externa) sobre una
+carpeta temporal y sustituye Kokoro por un motor determinista con un RTF configurable:
+cada petición de síntesis duerme duración_del_audio * RTF y devuelve un tono. Los locks
+del manager se instrumentan para medir la espera. Mezcla de clientes:
+- oyentes: crean un proyecto y lo recorren como el reproductor (prepare -> consulta del
+  trabajo -> audio del chunk -> metadata -> posiciones), y al terminar lo descargan;
+- consultores: /api/projects, /api/projects/<id>, /api/health y /api/jobs en bucle;
+- editores: renombran proyectos y actualizan posiciones de lectura.
+
+Informa de latencias p50/p95/p99 por endpoint, peticiones por segundo, espera en los
+locks del manager y estado de la cola de síntesis.
+
+Uso: python benchmarks/load_test.py [--duration 20] [--listeners 6] [--pollers 3] [--editors 2] [--rtf 0.01]
+Sale con código 1 si hay errores inesperados (5xx distintos de 503 o fallos de conexión).
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SAMPLE_RATE = 24000
+CHARS_PER_SECOND = 15
+
+class FakeKokoro:
+    """Sustituto determinista de Kokoro: tono de la duración esperada tras dormir audio * rtf."""
+    def __init__(self, rtf):
+        self.rtf = rtf
+
+    def create(self, text, voice=None, speed=1.0, lang="es"):
+        audio_s = len(text) / CHARS_PER_SECOND / speed
+        time.sleep(audio_s * self.rtf)
+        t = np.arange(int(audio_s * SAMPLE_RATE)) / SAMPLE_RATE
+        return (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), SAMPLE_RATE
+
+    def get_voices(self):
+        return ["ef_dora", "em_alex", "af_bella"]
+
+    def get_voice_style(self, name):
+        return np.zeros((510, 1, 256), dtype=np.float32)
+
+class TimedLock:
+    """threading.Lock que registra cuánto espera cada adquisición."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = []
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self.waits.append(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {} # endpoint -> [segundos]
+        self.statuses = {} # endpoint -> {código: n}
+        self.unexpected = []
+
+    def add(self, name, seconds, status):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            codes = self.statuses.setdefault(name, {})
+            codes[status] = codes.get(status, 0) + 1
+            if status == 0 or (status >= 500 and status != 503):
+                self.unexpected.append((name, status))
+
+class Client:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+
+    def call(self, name, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as res:
+                status, payload = res.status, res.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except OSError:
+            status, payload = 0, b""
+        self.recorder.add(name, time.perf_counter() - start, status)
+        if payload[:1] in (b"{", b"["):
+            return status, json.loads(payload)
+        return status, payload
+
+def book_text(chapters, paragraphs):
+    sentence = "Harry Haller paseaba de noche por la ciudad dormida, pensando en Hermine y en el teatro mágico. "
+    parts = []
+    for c in range(chapters):
+        parts.append(f"Capítulo {c + 1}")
+        parts.extend(sentence * 6 for _ in range(paragraphs))
+    return "\n\n".join(parts)
+
+def listener(client, deadline, args, rng):
+    while time.time() < deadline:
+        status, created = client.call("create", "POST", "/api/projects/create", {
+            "name": f"Carga {rng.randint(0, 10**6)}", "text": book_text(args.chapters, args.paragraphs),
+            "voice": "em_alex", "speed": 1.0, "lang": "es"})
+        if status != 200:
+            time.sleep(1)
+            continue
+        pid = created["project_id"]
+        for idx in range(len(created["chunks"])):
+            status, job = client.call("prepare", "POST", f"/api/projects/{pid}/chunk/{idx}/prepare")
+            while status == 503 and time.time() < deadline:
+                time.sleep(1)
+                status, job = client.call("prepare", "POST", f"/api/projects/{pid}/chunk/{idx}/prepare")
+            if status == 202:
+                while time.time() < deadline:
+                    time.sleep(args.poll_interval)
+                    _, state = client.call("job_poll", "GET", job["job_url"])
+                    if not isinstance(state, dict) or state.get("status") in ("done", "error"):
+                        break
+            if time.time() >= deadline:
+                return
+            client.call("chunk_audio", "GET", f"/api/projects/{pid}/chunk/{idx}")
+            client.call("chunk_metadata", "GET", f"/api/projects/{pid}/chunk/{idx}/metadata")
+            for sub_part in range(3):
+                client.call("position", "POST", f"/api/projects/{pid}/position",
+                            {"chunk": idx, "sub_part": sub_part, "offset": rng.random() * 10})
+        client.call("download", "GET", f"/api/projects/{pid}/download")
+
+def poller(client, deadline, args, rng):
+    while time.time() < deadline:
+        _, projects = client.call("list_projects", "GET", "/api/projects")
+        if isinstance(projects, list) and projects:
+            client.call("get_project", "GET", f"/api/projects/{rng.choice(projects)['id']}")
+        client.call("health", "GET", "/api/health")
+        client.call("jobs_stats", "GET", "/api/jobs")
+        time.sleep(args.poll_interval)
+
+def editor(client, deadline, args, rng):
+    while time.time() < deadline:
+        _, projects = client.call("list_projects", "GET", "/api/projects")
+        if isinstance(projects, list) and projects:
+            p = rng.choice(projects)
+            client.call("rename", "POST", f"/api/projects/{p['id']}/rename", {"name": f"Renombrado {rng.randint(0, 999)}"})
+            client.call("position", "POST", f"/api/projects/{p['id']}/position",
+                        {"chunk": rng.randrange(max(1, p["total_chunks"])), "sub_part": 0, "offset": 0.0})
+        time.sleep(args.poll_interval * 2)
+
+def percentiles(values):
+    ms = np.array(values) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95), np.percentile(ms, 99), ms.max()
+
+def start_server(workdir, rtf, workers, max_queue):
+    """Importa app.py dentro de workdir y sustituye manager y cola por versiones instrumentadas."""
+    os.chdir(workdir)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    import app as app_module
+    from manager import BatchManager
+    from synthesis_jobs import SynthesisJobs
+    from werkzeug.serving import make_server
+
+    app_module.jobs.shutdown()
+    manager = BatchManager(os.path.join(workdir, "projects_carga"), "fake.onnx", "fake.bin", load_model=False)
+    manager.kokoro = FakeKokoro(rtf)
+    manager.model_state, manager.model_error = "ready", None
+    manager.lock, manager.status_lock = TimedLock(), TimedLock()
+    app_module.manager = manager
+    app_module.jobs = SynthesisJobs(manager, max_workers=workers, max_queue=max_queue)
+    app_module.app.config["PROJECTS_FOLDER"] = manager.projects_dir
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, manager, app_module.jobs
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con motor simulado")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos de carga")
+    parser.add_argument("--listeners", type=int, default=6)
+    parser.add_argument("--pollers", type=int, default=3)
+    parser.add_argument("--editors", type=int, default=2)
+    parser.add_argument("--rtf", type=float, default=0.01, help="RTF del motor simulado")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de la cola de síntesis")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--chapters", type=int, default=2)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default=None, help="Guardar el informe en JSON")
+    parser.add_argument("--verbose", action="store_true", help="No silenciar la salida del servidor")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    cwd = os.getcwd()
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    recorder = Recorder()
+    try:
+        with quiet:
+            server, manager, jobs = start_server(workdir, args.rtf, args.workers, args.max_queue)
+            client = Client(f"http://127.0.0.1:{server.server_port}", recorder)
+            deadline = time.time() + args.duration
+            roles = [listener] * args.listeners + [poller] * args.pollers + [editor] * args.editors
+            threads = [threading.Thread(target=role, args=(client, deadline, args, random.Random(args.seed + i)))
+                       for i, role in enumerate(roles)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            server.shutdown()
+            jobs.shutdown(wait=True)
+            manager.shutdown()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"duration_s": elapsed, "endpoints": {}, "locks": {}, "jobs": jobs.stats()}
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"Clientes: {args.listeners} oyentes, {args.pollers} consultores, {args.editors} editores; "
+          f"RTF simulado {args.rtf}, {args.workers} worker(s) de síntesis")
+    print(f"{'endpoint':>15} {'n':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'máx (ms)':>9}  códigos")
+    for name in sorted(recorder.latencies):
+        p50, p95, p99, worst = percentiles(recorder.latencies[name])
+        codes = recorder.statuses[name]
+        report["endpoints"][name] = {"count": len(recorder.latencies[name]), "p50_ms": p50, "p95_ms": p95,
+                                     "p99_ms": p99, "max_ms": worst, "statuses": codes}
+        print(f"{name:>15} {len(recorder.latencies[name]):>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {worst:>9.1f}  "
+              + " ".join(f"{c}:{n}" for c, n in sorted(codes.items())))
+    print(f"\nPeticiones: {total} en {elapsed:.1f}s ({total / elapsed:.1f}/s)")
+    for name, lock in (("manager.lock", manager.lock), ("status_lock", manager.status_lock)):
+        waits = np.array(lock.waits) * 1000 if lock.waits else np.zeros(1)
+        report["locks"][name] = {"acquisitions": len(lock.waits), "total_wait_s": float(waits.sum() / 1000),
+                                 "p95_ms": float(np.percentile(waits, 95)), "max_ms": float(waits.max())}
+        print(f"{name:>13}: {len(lock.waits)} adquisiciones, espera total {waits.sum() / 1000:.2f}s, "
+              f"p95 {np.percentile(waits, 95):.2f} ms, máx {waits.max():.1f} ms")
+    print(f"Cola de síntesis: {report['jobs']}")
+    if recorder.unexpected:
+        print(f"\n[ERROR] {len(recorder.unexpected)} respuestas inesperadas, p. ej. {recorder.unexpected[:5]}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=float)
+    sys.exit(1 if recorder.unexpected else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Modelo ONNX sintético con la interfaz de Kokoro, para medir sin kokoro-v1.0.onnx.
+
+Sin los ficheros del modelo no se puede sintetizar voz, pero sí medir todo lo que lo
+rodea: carga de la sesión, grafo optimizado en caché, calentamiento, hilos, pesos
+compartidos y variantes cuantizadas. make_model crea un grafo con las mismas entradas y
+salida que kokoro-v1.0.onnx (input_ids, style, speed -> waveform), así que Kokoro,
+BatchManager y los benchmarks lo usan igual que el real: la fonetización con eSpeak NG
+es la de verdad y solo la red es sintética. Dos formas de coste:
+- pesos: capas MatMul + Tanh anchas (--model-mb de pesos en float32).
+- nodos: capas estrechas con la LayerNorm descompuesta como la exporta PyTorch (11 nodos
+  por capa) que el optimizador de ORT fusiona: cuesta sobre todo optimizar el grafo.
+El audio es ruido determinista y los tiempos no son los de Kokoro: sirven para comparar
+modos entre sí en la misma máquina. Necesita el paquete onnx.
+"""
+import numpy as np
+
+HIDDEN = 1024
+GRAPH_HIDDEN = 256 # Ancho del modelo de muchos nodos
+VOCAB_SIZE = 256 # Mayor que el id más alto del vocabulario de kokoro-onnx (177)
+STYLE_DIM = 256
+SAMPLES_PER_TOKEN = 1800 # 75 ms a 24 kHz, del orden de un fonema
+VOICE_NAMES = ("em_alex", "ef_dora", "af_bella", "am_adam") # Las que usan los benchmarks
+
+def make_model(path, megabytes=160, hidden=HIDDEN, layer_norm=False):
+    """
+    Guarda en `path` un modelo con la interfaz de Kokoro y unos `megabytes` de pesos
+    fp32 en capas de `hidden`. Con layer_norm cada capa lleva una LayerNorm descompuesta.
+    """
+    from onnx import helper, numpy_helper, TensorProto, save
+    layers = max(1, megabytes * 2**20 // (hidden * hidden * 4))
+    rng = np.random.default_rng(0)
+
+    def weight(name, shape):
+        scale = np.sqrt(shape[0]) if len(shape) > 1 else 1.0
+        weights.append(numpy_helper.from_array((rng.standard_normal(shape) / scale).astype(np.float32), name))
+
+    weights = [numpy_helper.from_array(np.array([-1], dtype=np.int64), "axes"),
+               numpy_helper.from_array(np.array([-1], dtype=np.int64), "flat"),
+               numpy_helper.from_array(np.array(2.0, dtype=np.float32), "two"),
+               numpy_helper.from_array(np.array(1e-5, dtype=np.float32), "eps")]
+    weight("embedding", (VOCAB_SIZE, hidden))
+    weight("w_style", (STYLE_DIM, hidden))
+    nodes = [
+        helper.make_node("Gather", ["embedding", "input_ids"], ["emb"]),
+        helper.make_node("MatMul", ["style", "w_style"], ["style_h"]),
+        helper.make_node("Add", ["emb", "style_h"], ["h"]),
+    ]
+    name = "h"
+    for i in range(layers):
+        weight(f"w{i}", (hidden, hidden))
+        nodes.append(helper.make_node("MatMul", [name, f"w{i}"], [f"m{i}"]))
+        name = f"m{i}"
+        if layer_norm:
+            weight(f"g{i}", (hidden,))
+            weight(f"b{i}", (hidden,))
+            nodes += [
+                helper.make_node("ReduceMean", [name, "axes"], [f"mu{i}"]),
+                helper.make_node("Sub", [name, f"mu{i}"], [f"d{i}"]),
+                helper.make_node("Pow", [f"d{i}", "two"], [f"p{i}"]),
+                helper.make_node("ReduceMean", [f"p{i}", "axes"], [f"v{i}"]),
+                helper.make_node("Add", [f"v{i}", "eps"], [f"ve{i}"]),
+                helper.make_node("Sqrt", [f"ve{i}"], [f"s{i}"]),
+                helper.make_node("Div", [f"d{i}", f"s{i}"], [f"n{i}"]),
+                helper.make_node("Mul", [f"n{i}", f"g{i}"], [f"ng{i}"]),
+                helper.make_node("Add", [f"ng{i}", f"b{i}"], [f"o{i}"]),
+            ]
+            name = f"o{i}"
+        nodes.append(helper.make_node("Tanh", [name], [f"t{i}"]))
+        name = f"t{i}"
+    weight("w_out", (hidden, SAMPLES_PER_TOKEN))
+    nodes += [
+        helper.make_node("MatMul", [name, "w_out"], ["frames"]),
+        helper.make_node("Reshape", ["frames", "flat"], ["samples"]),
+        helper.make_node("Mul", ["samples", "speed"], ["scaled"]),
+        helper.make_node("Tanh", ["scaled"], ["waveform"]),
+    ]
+    inputs = [helper.make_tensor_value_info("input_ids", TensorProto.INT64, [1, None]),
+              helper.make_tensor_value_info("style", TensorProto.FLOAT, [1, STYLE_DIM]),
+              helper.make_tensor_value_info("speed", TensorProto.FLOAT, [1])]
+    outputs = [helper.make_tensor_value_info("waveform", TensorProto.FLOAT, [None])]
+    graph = helper.make_graph(nodes, "bench", inputs, outputs, weights)
+    save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 18)], ir_version=8), path)
+
+def make_graph_model(path, megabytes=76):
+    """Modelo de muchos nodos pequeños (~300 capas y 3300 nodos con los 76 MB por defecto)."""
+    make_model(path, megabytes, hidden=GRAPH_HIDDEN, layer_norm=True)
+
+def make_voices(path, count=54):
+    """Voces sintéticas con la forma de voices-v1.0.bin: (510, 1, 256) por voz."""
+    rng = np.random.default_rng(1)
+    names = list(VOICE_NAMES) + [f"ev_{i:02d}" for i in range(count - len(VOICE_NAMES))]
+    with open(path, "wb") as f:
+        np.savez(f, **{name: rng.standard_normal((510, 1, STYLE_DIM)).astype(np.float32) for name in names})
+
+def make_fp16_model(source_path, path):
+    """
+    Variante fp16 de pesos: cada initializer float32 se guarda en float16 y un Cast lo
+    devuelve a float32 al ejecutar (la mitad de disco, el mismo cómputo).
+    """
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+    model = onnx.load(source_path)
+    graph = model.graph
+    casts = []
+    for tensor in list(graph.initializer):
+        array = numpy_helper.to_array(tensor)
+        if array.dtype != np.float32 or array.ndim == 0:
+            continue
+        half = numpy_helper.from_array(array.astype(np.float16), tensor.name + "_fp16")
+        graph.initializer.remove(tensor)
+        graph.initializer.append(half)
+        casts.append(helper.make_node("Cast", [half.name], [tensor.name], to=TensorProto.FLOAT))
+    nodes = casts + list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+    onnx.save(model, path)
+
+def make_int8_model(source_path, path):
+    """Variante int8 con cuantización dinámica de onnxruntime (pesos int8, activaciones al vuelo)."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(source_path, path, weight_type=QuantType.QInt8)
+
+def make_inputs(tokens=100, seed=2):
+    """Entradas de una inferencia directa sobre la sesión (sin Kokoro)."""
+    rng = np.random.default_rng(seed)
+    return {"input_ids": rng.integers(1, 178, size=(1, tokens), dtype=np.int64),
+            "style": rng.standard_normal((1, STYLE_DIM)).astype(np.float32),
+            "speed": np.array([1.0], dtype=np.float32)}
@@ -1,19 +1,28 @@
 import json
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from chunk_table import ChunkTable, COMPLETED
 
 project_id = "1766183229_Esta_edición_reúne_por_primera"
-path = rf"c:\proyectos_python\MisApps\Texto_a_voz\projects\{project_id}\status.json"
+project_path = rf"c:\proyectos_python\MisApps\Texto_a_voz\projects\{project_id}"
 
-with open(path, "r", encoding="utf-8") as f:
+with open(os.path.join(project_path, "status.json"), "r", encoding="utf-8") as f:
     status = json.load(f)
 
+# El estado de cada chunk vive en chunk_states.bin: en status.json puede ir por detrás
+table = ChunkTable.load(os.path.join(project_path, "chunk_states.bin"), len(status["chunks"]))
+if table is None:
+    table = ChunkTable.from_chunks(status["chunks"]) # Proyecto anterior a chunk_states.bin
+
 print(f"Total: {status['total_chunks']}")
-print(f"Completed: {status['completed_chunks']}")
+print(f"Completed: {table.completed}")
+print(f"Errors: {table.errors}")
 print(f"Is Finished: {status['is_finished']}")
 
-incomplete = [c["id"] for c in status["chunks"] if c["status"] != "completed"]
+incomplete = [i for i in range(len(table)) if table.get(i) != COMPLETED]
 print(f"Incomplete IDs: {incomplete}")
 
 for cid in incomplete:
-    found = any(c["id"] == cid for c in status["chunks"])
-    print(f"Chunk {cid} found in list: {found}")
+    print(f"Chunk {cid}: {table.status_name(cid)}")
@@ -0,0 +1,96 @@
+import os
+
+# Códigos de estado de un chunk, un byte por chunk en chunk_states.bin
+PENDING = 0
+COMPLETED = 1
+ERROR = 2
+
+STATUS_NAMES = {PENDING: "pending", COMPLETED: "completed", ERROR: "error"}
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+
+class ChunkTable:
+    """
+    Estado compacto de los chunks de un proyecto: un bytearray indexado por id,
+    contadores mantenidos de forma incremental y un cursor al primer pendiente.
+    Todas las operaciones sobre un chunk son O(1) (amortizado para el cursor).
+    """
+
+    def __init__(self, states):
+        self.states = bytearray(states)
+        self.completed = self.states.count(COMPLETED)
+        self.errors = self.states.count(ERROR)
+        self._cursor = 0
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Construye la tabla a partir de la lista "chunks" de status.json."""
+        states = bytearray(len(chunks))
+        for i, c in enumerate(chunks):
+            states[i] = STATUS_CODES.get(c.get("status"), PENDING)
+        return cls(states)
+
+    @classmethod
+    def load(cls, path, total):
+        """Carga la tabla desde disco. Devuelve None si falta o no cuadra con total."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != total:
+            return None
+        return cls(data)
+
+    def __len__(self):
+        return len(self.states)
+
+    def get(self, chunk_id):
+        return self.states[chunk_id]
+
+    def status_name(self, chunk_id):
+        return STATUS_NAMES.get(self.states[chunk_id], "pending")
+
+    def set(self, chunk_id, code):
+        """Cambia el estado de un chunk. Devuelve True si ha cambiado."""
+        old = self.states[chunk_id]
+        if old == code:
+            return False
+        if old == COMPLETED:
+            self.completed -= 1
+        elif old == ERROR:
+            self.errors -= 1
+        if code == COMPLETED:
+            self.completed += 1
+        elif code == ERROR:
+            self.errors += 1
+        self.states[chunk_id] = code
+        if code == PENDING and chunk_id < self._cursor:
+            self._cursor = chunk_id
+        return True
+
+    def next_pending(self):
+        """Id del primer chunk pendiente o None. El cursor solo avanza."""
+        idx = self.states.find(PENDING, self._cursor)
+        if idx == -1:
+            self._cursor = len(self.states)
+            return None
+        self._cursor = idx
+        return idx
+
+    def apply_to_chunks(self, chunks):
+        """Vuelca los estados sobre la lista "chunks" de status.json."""
+        for i, c in enumerate(chunks):
+            c["status"] = STATUS_NAMES.get(self.states[i], "pending")
+
+    def save(self, path):
+        """Escribe la tabla completa (creación o resincronización)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.states)
+        os.replace(tmp_path, path)
+
+    def save_one(self, path, chunk_id):
+        """Persiste un solo byte en su posición, sin reescribir el resto."""
+        with open(path, "r+b") as f:
+            f.seek(chunk_id)
+            f.write(bytes((self.states[chunk_id],)))
@@ -0,0 +1,115 @@
+"""
+Base común de las cachés LRU en disco (ExtractCache, PreviewCache).
+
+Un fichero por entrada en cache_dir, con un límite total de bytes. El orden LRU se
+mantiene en memoria (OrderedDict) y se persiste con la fecha de modificación de cada
+fichero: al arrancar se reconstruye ordenando por mtime, sin índice aparte. Las
+escrituras van a un temporal y se renombran, así que un fichero nunca está a medias.
+
+Un fichero puede desaparecer entre _lookup y su lectura si otro hilo lo expulsa: quien
+lo use debe tratar FileNotFoundError como un fallo de caché.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+class DiskLRU:
+    def __init__(self, cache_dir, max_bytes, extension):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # nombre de fichero -> tamaño, del menos al más reciente
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                os.remove(path) # Escritura interrumpida
+            elif name.endswith(self.extension):
+                st = os.stat(path)
+                files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def _contains(self, name):
+        with self.lock:
+            return name in self.entries
+
+    def _lookup(self, name):
+        """Ruta de `name` marcada como la más reciente, o None. No cuenta aciertos ni fallos."""
+        path = os.path.join(self.cache_dir, name)
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        try:
+            os.utime(path) # Persistir el orden LRU
+        except OSError:
+            with self.lock:
+                self._forget(name)
+            return None
+        return path
+
+    def _record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _store(self, name, data):
+        """Guarda `data` (bytes) como `name` y expulsa lo más antiguo. None si no cabe."""
+        if len(data) > self.max_bytes:
+            return None
+        path = os.path.join(self.cache_dir, name)
+        fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self.lock:
+            self._forget(name)
+            self.entries[name] = len(data)
+            self.total_bytes += len(data)
+            # La entrada recién guardada es la última: nunca se expulsa aquí (cabe sola)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.cache_dir, old))
+                except OSError:
+                    pass
+        return path
+
+    def _forget(self, name):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,75 @@
+"""
+Caché en disco de resultados de extracción (texto) y segmentación (chunks).
+
+Las claves son hashes de contenido: el SHA-256 del fichero subido para el texto y el del
+texto más los parámetros para los chunks. Cada entrada es un JSON en cache_dir; el orden
+LRU y la expulsión al superar max_bytes son los de DiskLRU (ver disk_lru.py).
+"""
+import json
+import time
+import hashlib
+from disk_lru import DiskLRU
+
+HASH_BLOCK = 1 << 20
+
+def hash_stream(stream):
+    """SHA-256 de un fichero abierto en binario, por bloques. Deja el cursor al inicio."""
+    h = hashlib.sha256()
+    for block in iter(lambda: stream.read(HASH_BLOCK), b""):
+        h.update(block)
+    stream.seek(0)
+    return h.hexdigest()
+
+def chunks_key(text, **params):
+    """Clave de una segmentación: hash del texto y de los parámetros de split_into_chunks."""
+    h = hashlib.sha256(text.encode("utf-8"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return "chunks:" + h.hexdigest()
+
+class ExtractCache(DiskLRU):
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.bytes_saved = 0 # Bytes de documento que no hubo que volver a procesar
+        self.seconds_saved = 0.0 # Tiempo de extracción original de las entradas servidas
+        super().__init__(cache_dir, max_bytes, ".json")
+
+    def _filename(self, key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+
+    def get(self, key):
+        """Devuelve el valor guardado para `key` o None. Cuenta aciertos y fallos."""
+        name = self._filename(key)
+        path = self._lookup(name)
+        if path is None:
+            self._record(hit=False)
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Fichero borrado o corrupto: se trata como fallo
+            with self.lock:
+                self._forget(name)
+            self._record(hit=False)
+            return None
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += entry.get("source_bytes", 0)
+            self.seconds_saved += entry.get("compute_seconds", 0.0)
+        return entry["value"]
+
+    def put(self, key, value, source_bytes=0, compute_seconds=0.0):
+        """
+        Guarda `value` (serializable a JSON). source_bytes y compute_seconds describen
+        el trabajo que evita cada acierto y alimentan las estadísticas.
+        """
+        data = json.dumps({"key": key, "value": value, "source_bytes": source_bytes,
+                           "compute_seconds": compute_seconds, "created": time.time()},
+                          ensure_ascii=False).encode("utf-8")
+        return self._store(self._filename(key), data) is not None # False si no cabe ni vaciando la caché
+
+    def stats(self):
+        stats = super().stats()
+        with self.lock:
+            stats["bytes_saved"] = self.bytes_saved
+            stats["seconds_saved"] = round(self.seconds_saved, 3)
+        return stats
@@ -1,7 +1,22 @@
 import os
+import sys
+import json
+import asyncio
+import urllib.error
+import urllib.parse
+import urllib.request
 from pathlib import Path
 from fastmcp import FastMCP
 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from search_index import SearchIndex, SEARCH_INDEX_FILE
+
+# Audiobook library: the app's projects folder and its URL (to enqueue synthesis)
+PROJECTS_DIR = os.environ.get("TTS_PROJECTS_DIR", str(ROOT / "projects"))
+APP_URL = os.environ.get("TTS_APP_URL", "http://127.0.0.1:5000")
+library_index = SearchIndex(os.path.join(PROJECTS_DIR, SEARCH_INDEX_FILE))
+
 # Create an MCP server
 mcp = FastMCP("Document Reader")
 
@@ -69,10 +84,58 @@ async def search_text_logic(directory: str, query: str) -> str:
     except Exception as e:
         return f"Error searching text: {str(e)}"
 
+async def search_library_logic(query: str, limit: int = 20, project_id: str = None) -> dict:
+    """
+    Searches the text of every audiobook project using the library's inverted index
+    (case and accent insensitive, all words must appear; exact phrases rank first).
+    Each match has project_id, name, chunk_id, offset (character inside the chunk) and
+    a snippet. Pass project_id and chunk_id to enqueue_synthesis to play from there.
+    """
+    try:
+        limit = max(1, min(int(limit), 100))
+        results = await asyncio.to_thread(library_index.search, query, limit, project_id)
+        return {"query": query, "matches": results}
+    except Exception as e:
+        return {"error": f"Error searching library: {str(e)}"}
+
+def _post_json(path, payload=None):
+    request = urllib.request.Request(APP_URL + path, data=json.dumps(payload or {}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+async def enqueue_synthesis_logic(project_id: str, chunk_id: int, jump: bool = True) -> dict:
+    """
+    Asks the running TTS app to synthesize a chunk (it answers "ready" if the audio
+    already exists, or returns the queued job). With jump=True the project's reading
+    position also moves to that chunk, so playback resumes there.
+    """
+    try:
+        chunk_id = int(chunk_id)
+        status, job = await asyncio.to_thread(_post_json, f"/api/projects/{urllib.parse.quote(project_id)}/chunk/{chunk_id}/prepare")
+        result = {"http_status": status, "job": job}
+        if jump and status in (200, 202):
+            position_status, _ = await asyncio.to_thread(_post_json, f"/api/projects/{urllib.parse.quote(project_id)}/position",
+                                                         {"chunk": chunk_id, "sub_part": 0, "offset": 0.0})
+            result["position_updated"] = position_status == 200
+        return result
+    except (urllib.error.URLError, OSError) as e:
+        return {"error": f"TTS app not reachable at {APP_URL}: {e}"}
+    except Exception as e:
+        return {"error": f"Error enqueuing synthesis: {str(e)}"}
+
 # Register tools
 mcp.tool(name="list_files")(list_files_logic)
 mcp.tool(name="read_file")(read_file_logic)
 mcp.tool(name="search_text")(search_text_logic)
+mcp.tool(name="search_library")(search_library_logic)
+mcp.tool(name="enqueue_synthesis")(enqueue_synthesis_logic)
 
 if __name__ == "__main__":
+    if os.path.isdir(PROJECTS_DIR):
+        # Index projects created before the index existed (the app keeps it up to date)
+        library_index.sync(PROJECTS_DIR)
     mcp.run()
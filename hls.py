@@ -0,0 +1,84 @@
+"""
+Lista de reproducción HLS en directo de un proyecto.
+
+Cada segmento es una sub-parte de un chunk (una entrada de su metadata de Karaoke, como
+mucho 250 caracteres), comprimida en MP3 como "packed audio" de HLS: el MP3 va precedido
+de la etiqueta ID3 con la marca de tiempo MPEG-TS que exige la especificación, para que
+el reproductor encadene los segmentos sin huecos. El MP3 lo codifica libsndfile (>= 1.1),
+no hace falta ffmpeg.
+
+La lista es de tipo EVENT: crece según se completan chunks (y sub-partes del chunk en
+curso, gracias a los checkpoints de BatchManager) y se cierra con EXT-X-ENDLIST cuando
+el proyecto está completo. Solo contiene el prefijo contiguo de audio ya generado, así
+que nunca tiene huecos.
+"""
+import io
+import math
+import struct
+import soundfile as sf
+
+SEGMENT_EXTENSION = ".mp3"
+SEGMENT_MIMETYPE = "audio/mpeg"
+PLAYLIST_MIMETYPE = "application/vnd.apple.mpegurl"
+# EXT-X-TARGETDURATION no puede cambiar en una lista en directo: cota de una sub-parte
+TARGET_DURATION = 30
+TIMESTAMP_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+def split_frames(total_frames, sub_parts, samplerate):
+    """Frames de cada sub-parte de un chunk según sus duraciones; la última absorbe el redondeo."""
+    if not sub_parts:
+        return [total_frames]
+    frames = []
+    used = 0
+    for i, part in enumerate(sub_parts):
+        if i == len(sub_parts) - 1:
+            n = total_frames - used
+        else:
+            n = min(round(part["duration"] * samplerate), total_frames - used)
+        frames.append(max(0, n))
+        used += max(0, n)
+    return frames
+
+def chunk_segments(chunk_id, total_frames, sub_parts, samplerate, offset):
+    """Segmentos de un chunk que empieza en el frame `offset` del audiolibro."""
+    segments = []
+    start = 0
+    for sub_part, frames in enumerate(split_frames(total_frames, sub_parts, samplerate)):
+        if frames > 0:
+            segments.append({"chunk_id": chunk_id, "sub_part": sub_part, "start": start,
+                             "frames": frames, "offset": offset + start})
+        start += frames
+    return segments
+
+def _syncsafe(n):
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+def id3_timestamp(offset_frames, samplerate):
+    """Etiqueta ID3v2.4 con la marca de tiempo (reloj de 90 kHz) de un segmento packed audio."""
+    timestamp = (offset_frames * 90000 // samplerate) & ((1 << 33) - 1)
+    body = TIMESTAMP_OWNER + struct.pack(">Q", timestamp)
+    frame = b"PRIV" + _syncsafe(len(body)) + b"\x00\x00" + body
+    return b"ID3\x04\x00\x00" + _syncsafe(len(frame)) + frame
+
+def encode_segment(samples, samplerate, offset_frames):
+    """Segmento HLS (bytes): etiqueta de marca de tiempo + MP3."""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, samplerate, format="MP3")
+    return id3_timestamp(offset_frames, samplerate) + buffer.getvalue()
+
+def media_playlist(segments, samplerate, finished, segment_uri):
+    """Texto m3u8 de la lista. segment_uri(índice) devuelve la URL de cada segmento."""
+    longest = max((s["frames"] / samplerate for s in segments), default=0)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{max(TARGET_DURATION, math.ceil(longest))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+    ]
+    for index, segment in enumerate(segments):
+        lines.append(f"#EXTINF:{segment['frames'] / samplerate:.3f},")
+        lines.append(segment_uri(index))
+    if finished:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
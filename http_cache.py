@@ -0,0 +1,115 @@
+"""
+Servido de ficheros de chunks con validadores de caché HTTP.
+
+Un chunk no cambia una vez escrito (el WAV se renombra de un temporal al terminar), así
+que su audio y su metadata se sirven con:
+- ETag fuerte derivado de la identidad del fichero (inodo, tamaño y mtime en ns): cambia
+  si el fichero se regenera, sin leer su contenido.
+- Cache-Control: public, max-age de un año, immutable, si el chunk está completo; el
+  navegador no vuelve a pedirlo al precargar, reanudar o buscar.
+- If-None-Match (304) y Range (206), para los reproductores que piden por rangos.
+
+HotFileCache guarda en memoria los últimos ficheros servidos (LRU acotado en bytes) para
+que las peticiones repetidas no toquen el disco más que para un stat.
+"""
+import os
+import threading
+from collections import OrderedDict
+from flask import Response, request, send_file
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def file_etag(st):
+    """ETag de un fichero a partir de su os.stat (sin comillas)."""
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+class HotFileCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_bytes=None):
+        self.max_bytes = max_bytes
+        # Ficheros más grandes no se cachean (no desplazan a todo lo demás)
+        self.max_file_bytes = max_file_bytes if max_file_bytes is not None else max_bytes // 4
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # ruta -> (etag, bytes), del menos al más reciente
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, etag):
+        """Contenido cacheado de path si sigue siendo el mismo fichero (mismo etag)."""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == etag:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def load(self, path, etag, size):
+        """Lee el fichero y lo guarda si cabe. Devuelve su contenido o None si es demasiado grande."""
+        if size > self.max_file_bytes:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            self.entries[path] = (etag, data)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+def send_cached(path, mimetype, immutable=True, cache=None):
+    """
+    Respuesta Flask para un fichero de chunk con ETag, Cache-Control, If-None-Match y
+    Range. Con `cache` (HotFileCache) el contenido sale de memoria si ya se sirvió.
+    Debe llamarse dentro de una petición; el fichero debe existir.
+    """
+    st = os.stat(path)
+    etag = file_etag(st)
+    if request.if_none_match.contains(etag):
+        # El cliente ya lo tiene (también si pide un rango): ni se lee ni se envía
+        response = Response(status=304)
+        response.set_etag(etag)
+    else:
+        data = None
+        if cache is not None:
+            data = cache.get(path, etag)
+            if data is None:
+                data = cache.load(path, etag, st.st_size)
+        if data is None:
+            # Sin caché en memoria (o fichero grande): Werkzeug sirve el fichero por rangos
+            response = send_file(path, mimetype=mimetype, etag=etag, last_modified=st.st_mtime, conditional=True)
+        else:
+            response = Response(data, mimetype=mimetype)
+            response.set_etag(etag)
+            response.last_modified = st.st_mtime
+            response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Puede cambiar todavía: revalidar siempre (barato gracias al ETag)
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import threading
+
+JOURNAL_FILENAME = "journal.log"
+
+class JobJournal:
+    """
+    Registro de escritura anticipada (write-ahead) de trabajos de síntesis por proyecto.
+
+    Antes de generar un chunk se anota "begin" y, una vez el WAV está renombrado a su
+    ruta final y el estado persistido, "commit". Tras una caída, cualquier "begin" sin
+    su "commit" señala un chunk cuyos ficheros hay que verificar.
+    Formato: una línea JSON por evento, solo se añade al final del fichero.
+    """
+
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self._lock = threading.Lock()
+
+    def _path(self, project_id):
+        return os.path.join(self.projects_dir, project_id, JOURNAL_FILENAME)
+
+    def _append(self, project_id, op, chunk_id):
+        line = json.dumps({"op": op, "chunk": chunk_id, "t": time.time()})
+        with self._lock:
+            with open(self._path(project_id), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+
+    def begin(self, project_id, chunk_id):
+        self._append(project_id, "begin", chunk_id)
+
+    def commit(self, project_id, chunk_id):
+        self._append(project_id, "commit", chunk_id)
+
+    def in_flight(self, project_id):
+        """Ids de chunk con "begin" sin "commit". Ignora una última línea truncada."""
+        path = self._path(project_id)
+        open_jobs = set()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("op") == "begin":
+                        open_jobs.add(entry["chunk"])
+                    elif entry.get("op") == "commit":
+                        open_jobs.discard(entry["chunk"])
+        except OSError:
+            pass
+        return open_jobs
+
+    def clear(self, project_id):
+        """Compacta el registro una vez reconciliado el proyecto."""
+        with self._lock:
+            try:
+                os.remove(self._path(project_id))
+            except OSError:
+                pass
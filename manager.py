@@ -4,57 +4,404 @@ import time
 import re
 import soundfile as sf
 import numpy as np
-from kokoro_onnx import Kokoro
+from kokoro_onnx import Kokoro, SAMPLE_RATE
 import io
 import threading
+import atexit
+import queue
+import struct
+import shutil
+import hashlib
+from chunk_table import ChunkTable, PENDING, COMPLETED, ERROR
+from journal import JobJournal
+from session_config import build_session
+from voice_pack import load_voice_pack
+from audiobook_export import EXPORT_FORMATS, chapter_marks, export_audiobook
+from metrics import METRICS, InstrumentedLock
+from profiling import PROFILE_MODES, profile_block
+from storage import CleanupQueue, TRASH_DIR, path_size, is_audio_entry, chunk_audio_paths
+from hls import SEGMENT_EXTENSION, TARGET_DURATION, chunk_segments, encode_segment
+from search_index import SearchIndex, SEARCH_INDEX_FILE
+from audio_format import OutputStage, convert, output_rate, parse_output_format, peak_gain
+
+try:
+    from onnxruntime.capi.onnxruntime_pybind11_state import InvalidArgument
+except ImportError: # Otras versiones de onnxruntime
+    InvalidArgument = ValueError
+
+# Intervalo de volcado a disco de las posiciones de lectura (segundos).
+# Un cierre inesperado pierde como mucho este tiempo de progreso.
+POSITION_FLUSH_INTERVAL = 2.0
+
+# Sub-partes con checkpoint: si una falla se reintenta entera SUB_PART_RETRIES veces con
+# espera exponencial acotada; si el fallo es del texto se divide por la mitad (hasta
+# MIN_BISECT_CHARS) para aislar la parte que no se puede sintetizar
+SUB_PART_RETRIES = 2
+SUB_PART_BACKOFF = 0.25
+SUB_PART_BACKOFF_MAX = 2.0
+MIN_BISECT_CHARS = 16
+
+# Textos de calentamiento: cubren las longitudes típicas de una sub-parte (hasta 250
+# caracteres) para que la primera petición real no pague la inicialización del grafo
+WARMUP_TEXTS = [
+    ("es", "Hola."),
+    ("es", "Esta es una frase de longitud media para preparar el modelo antes de la primera lectura."),
+    ("es", "Harry Haller llegó a la ciudad una tarde de invierno con una maleta y una caja de libros, "
+           "alquiló dos habitaciones en la buhardilla y vivió allí casi un año, leyendo, fumando y "
+           "paseando de noche por las calles vacías."),
+    ("en-us", "This is a short warm-up sentence for the English voices."),
+]
+
+# Fallos que dependen del texto: fonemas fuera del vocabulario (ValueError de kokoro-onnx),
+# caracteres raros o una entrada que el grafo rechaza (exceso de fonemas)
+INPUT_ERRORS = (ValueError, IndexError, KeyError, UnicodeError, InvalidArgument)
+
+class ModelUnavailable(RuntimeError):
+    """El modelo no está listo (cargando o con error): no es un fallo de un chunk concreto."""
+
+def _atomic_write_json(path, data):
+    """Escribe JSON en un temporal y lo renombra: el destino nunca queda a medias."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f) # Sin indentación para velocidad
+    os.replace(tmp_path, path)
+
+def _bisect_text(text, min_chars=MIN_BISECT_CHARS):
+    """Divide el texto en dos mitades por el espacio más cercano al centro, o None si es corto."""
+    text = text.strip()
+    if len(text) < 2 * min_chars:
+        return None
+    middle = len(text) // 2
+    left_space = text.rfind(" ", 0, middle + 1)
+    right_space = text.find(" ", middle)
+    candidates = [i for i in (left_space, right_space) if i > 0]
+    cut = min(candidates, key=lambda i: abs(i - middle)) if candidates else middle
+    left, right = text[:cut].strip(), text[cut:].strip()
+    if not left or not right:
+        return None
+    return left, right
 
 class BatchManager:
-    def __init__(self, projects_dir, model_path, voices_path):
+    def __init__(self, projects_dir, model_path, voices_path, background_load=True, warmup=True,
+                 session_config=None, model_variants=None, default_variant="fp32", load_model=True,
+                 render_only=False):
         self.projects_dir = projects_dir
+        self.model_path = model_path
+        self.voices_path = voices_path
+        # Opciones de onnxruntime (ver session_config.DEFAULT_SESSION_CONFIG)
+        self.session_config = session_config
+        # render_only: solo sintetiza chunks (procesos del modo batch), ver _init_state
+        self._init_state(render_only)
+        # Variantes del modelo (p.ej. {"fp32": ..., "fp16": ..., "int8": ...}). La variante
+        # por defecto es model_path y se carga al arrancar; el resto, bajo demanda.
+        self.default_variant = default_variant
+        self.model_variants = dict(model_variants or {})
+        self.model_variants[default_variant] = model_path
+        
+        # Inicializar Kokoro una sola vez. En segundo plano para que el servidor HTTP
+        # arranque sin esperar; las operaciones que lo necesitan esperan con get_kokoro()
+        if not load_model:
+            # Solo gestión de proyectos (p.ej. el proceso coordinador del modo batch)
+            self.model_error = "Modelo no cargado en este proceso"
+            self.model_state = "error"
+            self.model_ready.set()
+        elif background_load:
+            threading.Thread(target=self._load_model, args=(warmup,), daemon=True).start()
+        else:
+            self._load_model(warmup)
+
+    def _load_model(self, warmup=True):
+        try:
+            start = time.perf_counter()
+            print(f"Cargando modelo Kokoro desde {self.model_path}...")
+            kokoro = self._make_kokoro(self.model_path)
+            self.load_seconds = time.perf_counter() - start
+            print(f"Modelo cargado en {self.load_seconds:.2f}s.")
+            self.kokoro = kokoro
+
+            if warmup:
+                self.model_state = "warming"
+                start = time.perf_counter()
+                self._warm_up()
+                self.warmup_seconds = time.perf_counter() - start
+                print(f"Calentamiento completado en {self.warmup_seconds:.2f}s.")
+            self.model_state = "ready"
+        except Exception as e:
+            print(f"Error cargando el modelo Kokoro: {e}")
+            self.model_error = str(e)
+            self.model_state = "error"
+        finally:
+            self.model_ready.set()
+
+    def _make_kokoro(self, model_path):
+        """Kokoro sobre la sesión configurada, con las voces del paquete mapeado en memoria."""
+        kokoro = Kokoro.from_session(build_session(model_path, self.session_config), self.voices_path)
+        if os.path.exists(self.voices_path):
+            try:
+                # Mismo interfaz que el .npz de kokoro-onnx, pero sin copias por consulta
+                kokoro.voices = load_voice_pack(self.voices_path)
+            except Exception as e:
+                print(f"Aviso: no se pudo usar el paquete de voces mapeado ({e}), usando {self.voices_path}")
+        return kokoro
+
+    def _warm_up(self):
+        """Inferencias de calentamiento con longitudes representativas."""
+        voices = self.kokoro.get_voices()
+        for lang, text in WARMUP_TEXTS:
+            prefix = "e" if lang == "es" else "a"
+            voice = next((v for v in voices if v.startswith(prefix)), voices[0])
+            try:
+                self.kokoro.create(text, voice=voice, speed=1.0, lang=lang)
+            except Exception as e:
+                # Un fallo de calentamiento (p.ej. sin espeak para ese idioma) no es fatal
+                print(f"Aviso: calentamiento fallido para '{lang}': {e}")
+
+    def get_kokoro(self, timeout=None, variant=None):
+        """
+        Devuelve el modelo, esperando a que termine de cargarse y calentarse.
+        Las variantes distintas de la por defecto se cargan la primera vez que se piden.
+        """
+        if not self.model_ready.wait(timeout):
+            raise ModelUnavailable("El modelo aún se está cargando")
+        if self.kokoro is None:
+            raise ModelUnavailable(f"No se pudo cargar el modelo: {self.model_error}")
+        if variant is None or variant == self.default_variant:
+            return self.kokoro
+
+        if variant not in self.model_variants:
+            raise ValueError(f"Variante de modelo desconocida: {variant}")
+        with self._variant_lock:
+            if variant not in self.models:
+                path = self.model_variants[variant]
+                print(f"Cargando variante '{variant}' del modelo desde {path}...")
+                self.models[variant] = self._make_kokoro(path)
+            return self.models[variant]
+
+    def resolve_variant(self, variant):
+        """Variante efectiva para un proyecto (None o desconocida = por defecto)."""
+        return variant if variant in self.model_variants else self.default_variant
+
+    def variant_available(self, variant):
+        """True si la variante está configurada y su fichero .onnx existe."""
+        path = self.model_variants.get(variant)
+        return path is not None and os.path.exists(path)
+
+    def list_variants(self):
+        """Variantes configuradas, si su fichero existe y si ya están cargadas."""
+        return [{
+            "id": name,
+            "path": path,
+            "available": self.variant_available(name),
+            "loaded": (self.kokoro is not None) if name == self.default_variant else name in self.models,
+            "default": name == self.default_variant
+        } for name, path in self.model_variants.items()]
+
+    def readiness(self):
+        """Estado del modelo para /api/health: loading, warming, ready o error."""
+        return {
+            "state": self.model_state,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.model_error
+        }
+
+    def _init_state(self, render_only=False):
+        """
+        Estado interno independiente del modelo (locks, cachés e hilos auxiliares).
+        Con render_only no se crean el índice de búsqueda, la cola de borrados ni el hilo
+        de posiciones: un proceso que solo llama a render_chunk no los usa.
+        """
         os.makedirs(self.projects_dir, exist_ok=True)
-        self.lock = threading.Lock() # Lock para Kokoro (generación)
-        self.status_lock = threading.Lock() # Lock para archivos de estado (json)
+        self.kokoro = None
+        self.model_state = "loading"
+        self.model_error = None
+        self.model_ready = threading.Event()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.default_variant = "fp32"
+        self.model_variants = {}
+        self.models = {} # Variantes adicionales cargadas bajo demanda
+        self._variant_lock = threading.Lock()
+        self.lock = InstrumentedLock("synthesis") # Lock para Kokoro (generación)
+        self.checkpoint_sub_parts = True # Guardar cada sub-parte terminada (chunk_N.parts/); tiene prioridad
+        self.streaming_writes = True # Sin checkpoint: escribir cada sub-parte a disco según se genera
+        self.sub_part_retries = SUB_PART_RETRIES
+        self.sub_part_backoff = SUB_PART_BACKOFF
+        self.status_lock = InstrumentedLock("status") # Lock para archivos de estado (json)
+        self.trace_all = False # Traza de tiempos (trace.jsonl) para todos los proyectos
+        self.traced_projects = set() # Proyectos con "trace" activado en su status
+        self.profiled_projects = {} # project_id -> modo de perfilado ("profile" en su status)
         self.project_states = {} # Caché en memoria para evitar lecturas de disco constantes
-        
-        # Inicializar Kokoro una sola vez
-        print(f"Cargando modelo Kokoro desde {model_path}...")
-        self.kokoro = Kokoro(model_path, voices_path)
-        print("Modelo cargado.")
+        self.chunk_tables = {} # Estado compacto de chunks por proyecto (ver chunk_table.py)
+        self._status_stamps = {} # (mtime, tamaño) de cada status.json cacheado
+        self.hls_timelines = {} # project_id -> segmentos HLS ya recorridos (ver hls_segments)
+        self.hls_lock = threading.Lock()
+        self.journal = JobJournal(self.projects_dir) # Registro write-ahead de síntesis
+        self.cleanup = None if render_only else CleanupQueue(os.path.join(self.projects_dir, TRASH_DIR)) # Borrados en segundo plano
+        self.search_index = None if render_only else SearchIndex(os.path.join(self.projects_dir, SEARCH_INDEX_FILE)) # Búsqueda en la biblioteca
+
+        # Cola de proyectos a completar en segundo plano (reanudación tras reinicio)
+        self.resume_queue = queue.Queue()
+        self._resume_thread = None
+
+        # Posiciones de lectura: mapa en memoria con su propio lock para no competir
+        # nunca con las escrituras de status.json de la generación
+        self.position_lock = threading.Lock()
+        self.positions = {}
+        self.dirty_positions = set()
+        self._position_stop = threading.Event()
+        self._position_thread = None
+        if render_only:
+            return
+        self._position_thread = threading.Thread(target=self._position_flush_loop, daemon=True)
+        self._position_thread.start()
+        atexit.register(self.shutdown)
+
+    def _status_paths(self, project_id):
+        project_path = os.path.join(self.projects_dir, project_id)
+        return os.path.join(project_path, "status.json"), os.path.join(project_path, "chunk_states.bin")
+
+    def _cache_status(self, project_id, status, table):
+        status_path, _ = self._status_paths(project_id)
+        st = os.stat(status_path)
+        self.project_states[project_id] = status
+        self.chunk_tables[project_id] = table
+        self._status_stamps[project_id] = (st.st_mtime_ns, st.st_size)
+        if status.get("trace"):
+            self.traced_projects.add(project_id)
+        else:
+            self.traced_projects.discard(project_id)
+        if status.get("profile"):
+            self.profiled_projects[project_id] = status["profile"]
+        else:
+            self.profiled_projects.pop(project_id, None)
+
+    def _trace_path(self, project_id):
+        """Fichero de traza del proyecto si la traza está activada, si no None."""
+        if self.trace_all or project_id in self.traced_projects:
+            return os.path.join(self.projects_dir, project_id, "trace.jsonl")
+        return None
+
+    def set_profile(self, project_id, mode):
+        """Perfila cada chunk del proyecto con `mode` ("cprofile" o "sample"); None lo desactiva."""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfilado desconocido: {mode}")
+        def update(status):
+            status["profile"] = mode
+        return self._update_project_status(project_id, update)
+
+    def set_trace(self, project_id, enabled):
+        """Activa o desactiva la traza de tiempos por etapa de un proyecto."""
+        def update(status):
+            status["trace"] = bool(enabled)
+        return self._update_project_status(project_id, update)
+
+    def _drop_cache(self, project_id):
+        self.project_states.pop(project_id, None)
+        self.chunk_tables.pop(project_id, None)
+        self._status_stamps.pop(project_id, None)
+
+    def _load_status(self, project_id):
+        """
+        Devuelve (status, ChunkTable) desde la caché, validada con el mtime y tamaño de
+        status.json, o desde disco. Debe llamarse con status_lock adquirido y el dict
+        devuelto no debe modificarse fuera de él. El estado de cada chunk vive en la
+        tabla; los "status" de la lista de chunks en status.json pueden ir por detrás.
+        """
+        status_path, states_path = self._status_paths(project_id)
+        try:
+            st = os.stat(status_path)
+        except OSError:
+            self._drop_cache(project_id)
+            return None, None
+
+        cached = self.project_states.get(project_id)
+        if cached is not None and self._status_stamps.get(project_id) == (st.st_mtime_ns, st.st_size):
+            return cached, self.chunk_tables[project_id]
+
+        try:
+            with open(status_path, "r", encoding="utf-8") as f:
+                status = json.load(f)
+        except Exception as e:
+            print(f"Error leyendo status para {project_id}: {e}")
+            self._drop_cache(project_id)
+            return None, None
+
+        table = ChunkTable.load(states_path, len(status["chunks"]))
+        if table is None:
+            # Proyecto anterior a chunk_states.bin (o tabla dañada): reconstruir desde el JSON
+            table = ChunkTable.from_chunks(status["chunks"])
+            table.save(states_path)
+        self._cache_status(project_id, status, table)
+        return status, table
+
+    @staticmethod
+    def _chunk_at(status, chunk_id):
+        """Acceso O(1): los ids de chunk coinciden con su posición en la lista."""
+        chunks = status["chunks"]
+        if 0 <= chunk_id < len(chunks) and chunks[chunk_id]["id"] == chunk_id:
+            return chunks[chunk_id]
+        return None
+
+    def _snapshot(self, project_id, status, table):
+        """Copia del status para exponer fuera del lock, con los estados de la tabla."""
+        data = dict(status)
+        data["chunks"] = [dict(c, status=table.status_name(i)) for i, c in enumerate(status["chunks"])]
+        data["completed_chunks"] = table.completed
+        data["id"] = project_id
+        return data
+
+    def _set_chunk_state(self, project_id, chunk_id, code):
+        """
+        Cambia el estado de un chunk escribiendo un solo byte en chunk_states.bin.
+        Devuelve True si este cambio completa el proyecto.
+        """
+        _, states_path = self._status_paths(project_id)
+        with self.status_lock:
+            status, table = self._load_status(project_id)
+            if table is None or not 0 <= chunk_id < len(table):
+                return False
+            if not table.set(chunk_id, code):
+                return False
+            with METRICS.span("status_write"):
+                table.save_one(states_path, chunk_id)
+            return code == COMPLETED and table.completed >= status["total_chunks"]
 
     def _update_project_status(self, project_id, update_func):
         """
         Helper para actualizar el estado de un proyecto de forma atómica y segura para hilos.
-        Recarga el estado de disco si no está en caché o si se quiere forzar la frescura,
-        aplica la función de actualización, y persiste el resultado.
+        Carga el estado (caché validada contra disco), aplica la función de actualización,
+        y persiste el resultado. Reescribe status.json completo: reservado para cambios
+        poco frecuentes (nombre, fin de proyecto); los chunks usan _set_chunk_state.
         """
-        project_path = os.path.join(self.projects_dir, project_id)
-        status_path = os.path.join(project_path, "status.json")
+        status_path, states_path = self._status_paths(project_id)
         
         with self.status_lock:
-            # Siempre intentamos leer de disco para asegurar que tenemos los cambios de otros métodos
-            # (como update_last_chunk o rename_project) si no confiamos plenamente en la caché
-            try:
-                if not os.path.exists(status_path):
-                    return False
-                with open(status_path, "r", encoding="utf-8") as f:
-                    status = json.load(f)
-            except Exception as e:
-                print(f"Error leyendo status para {project_id}: {e}")
+            status, table = self._load_status(project_id)
+            if status is None:
                 return False
-            
-            # Aplicar la actualización
-            # update_func debe recibir el dict status y modificarlo in-place
+
+            # update_func debe recibir el dict status (con los estados de chunk al día)
+            # y modificarlo in-place
+            table.apply_to_chunks(status["chunks"])
+            status["completed_chunks"] = table.completed
             result = update_func(status)
+
+            # Las funciones de actualización pueden cambiar estados de chunks directamente
+            new_table = ChunkTable.from_chunks(status["chunks"])
+            status["completed_chunks"] = new_table.completed
             
             # Persistir
             try:
-                with open(status_path, "w", encoding="utf-8") as f:
-                    json.dump(status, f)
-                # Sincronizar caché si existe
-                self.project_states[project_id] = status
+                with METRICS.span("status_write"):
+                    _atomic_write_json(status_path, status)
+                    if new_table.states != table.states:
+                        new_table.save(states_path)
+                self._cache_status(project_id, status, new_table)
                 return result if result is not None else True
             except Exception as e:
                 print(f"Error guardando status para {project_id}: {e}")
+                self._drop_cache(project_id)
                 return False
 
     def _get_voice_style(self, voice_spec):
@@ -64,6 +411,7 @@ class BatchManager:
         2. Mezcla de voces: "ef_dora:0.7,em_alex:0.3"
         """
         if "," in voice_spec or ":" in voice_spec:
+            kokoro = self.get_kokoro()
             try:
                 # Caso de mezcla: "v1:w1,v2:w2"
                 parts = voice_spec.split(",")
@@ -78,7 +426,7 @@ class BatchManager:
                         v_name = part
                         weight = 1.0 # Default si no hay peso
                     
-                    style = self.kokoro.get_voice_style(v_name.strip())
+                    style = kokoro.get_voice_style(v_name.strip())
                     if total_style is None:
                         total_style = style * weight
                     else:
@@ -96,10 +444,10 @@ class BatchManager:
         # Caso normal: solo el nombre de la voz
         return voice_spec
 
-    def _generate_audio_safe(self, text, voice_spec, speed, lang, debug_id=""):
+    def _split_sub_chunks(self, text):
         """
-        Genera audio dividiendo el texto en sub-chunks si es necesario para evitar 
-        el límite de fonemas de Kokoro y limpia caracteres no soportados.
+        Limpia caracteres no soportados y divide el texto en sub-chunks seguros para
+        el límite de fonemas de Kokoro.
         """
         # 1. Pre-limpieza: Quitar caracteres no soportados (como script Tibetano)
         # Mantenemos caracteres latinos, puntuación común, CJK y símbolos básicos.
@@ -166,13 +514,16 @@ class BatchManager:
             # Hard cut
             return [t[i:i+limit] for i in range(0, len(t), limit)]
 
-        sub_chunks = split_text(clean_text, max_chars)
-        if debug_id:
+        return split_text(clean_text, max_chars)
+
+    def _synthesize_sub_chunks(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        """Genera el audio sub-chunk a sub-chunk. Produce (texto, muestras, sample_rate)."""
+        with METRICS.span("cleanup"):
+            sub_chunks = self._split_sub_chunks(text)
+        if debug_id and len(sub_chunks) > 1:
             print(f"Generando {len(sub_chunks)} sub-partes para ID {debug_id}...")
         
-        all_samples = []
-        metadata = []
-        sample_rate = 24000
+        kokoro = self.get_kokoro(variant=variant)
         voice_obj = self._get_voice_style(voice_spec)
 
         for i, sub_text in enumerate(sub_chunks):
@@ -182,8 +533,32 @@ class BatchManager:
             if len(sub_chunks) > 1:
                 print(f"  > Sub-parte {i+1}/{len(sub_chunks)}...")
             
-            samples, sr = self.kokoro.create(sub_text, voice=voice_obj, speed=speed, lang=lang)
-            
+            tokenizer = getattr(kokoro, "tokenizer", None)
+            if tokenizer is not None:
+                # Fonemas aparte para medir por separado eSpeak y la inferencia ONNX
+                # (create con is_phonemes=True hace exactamente el resto del trabajo)
+                with METRICS.span("phonemize", sub_part=i):
+                    phonemes = tokenizer.phonemize(sub_text, lang)
+                with METRICS.span("inference", sub_part=i):
+                    samples, sr = kokoro.create(phonemes, voice=voice_obj, speed=speed, lang=lang, is_phonemes=True)
+            else:
+                with METRICS.span("inference", sub_part=i):
+                    samples, sr = kokoro.create(sub_text, voice=voice_obj, speed=speed, lang=lang)
+            yield sub_text, samples, sr
+
+    def _generate_audio_safe(self, text, voice_spec, speed, lang, debug_id="", variant=None, output_format=None):
+        """
+        Genera audio dividiendo el texto en sub-chunks si es necesario para evitar 
+        el límite de fonemas de Kokoro y limpia caracteres no soportados.
+        Devuelve todo el audio concatenado en memoria; para escribir a disco con
+        memoria acotada usar _generate_audio_to_file.
+        """
+        all_samples = []
+        metadata = []
+        sample_rate = output_rate(output_format, SAMPLE_RATE)
+
+        for sub_text, samples, sr in self._synthesize_sub_chunks(text, voice_spec, speed, lang, debug_id, variant):
+            samples, sr = self._postprocess(samples, sr, output_format)
             duration = len(samples) / sr
             metadata.append({"text": sub_text, "duration": duration})
             all_samples.append(samples)
@@ -191,11 +566,166 @@ class BatchManager:
             
         if not all_samples:
             # Fallback si no hay texto procesable (no debería pasar)
-            return [], np.array([], dtype=np.float32), 24000
+            return [], np.array([], dtype=np.float32), sample_rate
             
         return metadata, np.concatenate(all_samples), sample_rate
 
-    def create_project(self, name, chunks, voice, speed, lang):
+    def _postprocess(self, samples, sr, output_format):
+        """
+        Formato de salida del proyecto (audio_format): remuestreo y int16 con dither.
+        Cada sub-parte se convierte entera; la duración de la metadata de Karaoke se
+        calcula después, sobre las muestras que se guardan.
+        """
+        if not output_format:
+            return samples, sr
+        with METRICS.span("postprocess"):
+            return convert(samples, sr, output_format)
+
+    def _generate_audio_to_file(self, text, voice_spec, speed, lang, out_path, debug_id="", variant=None, output_format=None):
+        """
+        Como _generate_audio_safe, pero cada sub-chunk se añade a un SoundFile abierto en
+        cuanto se genera: la memoria por chunk queda acotada a una sub-parte sea cual sea
+        la longitud del chunk. Devuelve (metadata, sample_rate).
+        """
+        metadata = []
+        outfile = None
+        try:
+            for sub_text, samples, sr in self._synthesize_sub_chunks(text, voice_spec, speed, lang, debug_id, variant):
+                samples, sr = self._postprocess(samples, sr, output_format)
+                with METRICS.span("wav_write"):
+                    if outfile is None:
+                        outfile = sf.SoundFile(out_path, mode="w", samplerate=sr, channels=1,
+                                               subtype="PCM_16", format="WAV")
+                    outfile.write(samples)
+                metadata.append({"text": sub_text, "duration": len(samples) / sr})
+            if outfile is None:
+                # Fallback si no hay texto procesable (no debería pasar): WAV vacío
+                outfile = sf.SoundFile(out_path, mode="w", samplerate=output_rate(output_format, SAMPLE_RATE),
+                                       channels=1, subtype="PCM_16", format="WAV")
+            return metadata, outfile.samplerate
+        finally:
+            if outfile is not None:
+                outfile.close()
+
+    def _parts_dir(self, project_id, chunk_id):
+        return os.path.join(self.projects_dir, project_id, "audio_chunks", f"chunk_{chunk_id}.parts")
+
+    def _generate_audio_checkpointed(self, text, voice_spec, speed, lang, out_path, parts_dir, debug_id="", variant=None,
+                                     output_format=None):
+        """
+        Como _generate_audio_to_file, pero cada sub-parte terminada se guarda en parts_dir
+        (part_N.wav + parts.json). Si el chunk falla, el siguiente intento reutiliza las
+        sub-partes ya hechas y solo sintetiza las que faltan. Al final las concatena en
+        out_path. Devuelve (metadata, sample_rate).
+        """
+        with METRICS.span("cleanup"):
+            sub_chunks = self._split_sub_chunks(text)
+        # El checkpoint solo vale para el mismo texto y los mismos parámetros
+        key = hashlib.sha1(json.dumps([text, voice_spec, speed, lang, variant, output_format]).encode("utf-8")).hexdigest()
+        manifest_path = os.path.join(parts_dir, "parts.json")
+        manifest = None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not manifest or manifest.get("key") != key or manifest.get("count") != len(sub_chunks):
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            manifest = {"key": key, "count": len(sub_chunks), "done": {}}
+        os.makedirs(parts_dir, exist_ok=True)
+
+        reused = 0
+        for i, sub_text in enumerate(sub_chunks):
+            part_path = os.path.join(parts_dir, f"part_{i}.wav")
+            if str(i) in manifest["done"] and os.path.exists(part_path):
+                reused += 1
+                continue
+            if len(sub_chunks) > 1:
+                print(f"  > Sub-parte {i+1}/{len(sub_chunks)}...")
+            samples, sr = self._synthesize_resilient(sub_text, voice_spec, speed, lang, debug_id, variant)
+            samples, sr = self._postprocess(samples, sr, output_format)
+            with METRICS.span("wav_write"):
+                sf.write(part_path + ".tmp", samples, sr, subtype="PCM_16", format="WAV")
+                os.replace(part_path + ".tmp", part_path)
+                manifest["done"][str(i)] = {"text": sub_text, "duration": len(samples) / sr}
+                _atomic_write_json(manifest_path, manifest)
+        if reused:
+            print(f"Reutilizadas {reused}/{len(sub_chunks)} sub-partes ya generadas del chunk {debug_id}")
+
+        # Concatenar las sub-partes en el WAV del chunk (por bloques, sin cargarlas enteras)
+        metadata = []
+        outfile = None
+        try:
+            with METRICS.span("wav_write"):
+                for i in range(len(sub_chunks)):
+                    with sf.SoundFile(os.path.join(parts_dir, f"part_{i}.wav")) as part:
+                        if outfile is None:
+                            outfile = sf.SoundFile(out_path, mode="w", samplerate=part.samplerate, channels=1,
+                                                   subtype="PCM_16", format="WAV")
+                        for block in part.blocks(blocksize=65536, dtype="int16"):
+                            outfile.write(block)
+                    done = manifest["done"][str(i)]
+                    metadata.append({"text": done["text"], "duration": done["duration"]})
+                if outfile is None:
+                    outfile = sf.SoundFile(out_path, mode="w", samplerate=output_rate(output_format, SAMPLE_RATE),
+                                           channels=1, subtype="PCM_16", format="WAV")
+            return metadata, outfile.samplerate
+        finally:
+            if outfile is not None:
+                outfile.close()
+
+    def _synthesize_piece(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        """Sintetiza un texto corto entero. Devuelve (muestras, sample_rate)."""
+        pieces = []
+        sample_rate = SAMPLE_RATE
+        for _, samples, sr in self._synthesize_sub_chunks(text, voice_spec, speed, lang, debug_id, variant):
+            pieces.append(samples)
+            sample_rate = sr
+        if not pieces:
+            return np.array([], dtype=np.float32), sample_rate
+        return np.concatenate(pieces), sample_rate
+
+    def _synthesize_resilient(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        """
+        Sintetiza una sub-parte. Si falla, primero la reintenta entera con espera
+        exponencial acotada (un fallo transitorio no cambia la prosodia). Solo si el fallo
+        es del texto (INPUT_ERRORS: caracteres raros, exceso de fonemas...) la divide por
+        la mitad en un límite de palabra y sintetiza cada mitad por separado. Sin modelo
+        falla al momento. Un fallo que persiste se propaga: el chunk queda en error, con
+        las sub-partes anteriores ya guardadas.
+        """
+        error = None
+        for attempt in range(1 + self.sub_part_retries):
+            if attempt:
+                time.sleep(min(SUB_PART_BACKOFF_MAX, self.sub_part_backoff * 2 ** (attempt - 1)))
+            try:
+                return self._synthesize_piece(text, voice_spec, speed, lang, debug_id, variant)
+            except ModelUnavailable:
+                raise # Sin modelo no hay nada que reintentar ni dividir
+            except INPUT_ERRORS as e:
+                error = e
+                break # Repetir el mismo texto daría el mismo error
+            except Exception as e:
+                error = e
+        if not isinstance(error, INPUT_ERRORS):
+            raise error
+
+        halves = _bisect_text(text)
+        if halves is not None:
+            print(f"  ! Sub-parte fallida ({error}); se divide en {len(halves[0])} + {len(halves[1])} caracteres")
+            left, sr = self._synthesize_resilient(halves[0], voice_spec, speed, lang, debug_id, variant)
+            right, sr = self._synthesize_resilient(halves[1], voice_spec, speed, lang, debug_id, variant)
+            return np.concatenate([left, right]), sr
+
+        if not re.search(r"\w", text):
+            # Nada pronunciable (solo signos): un silencio breve en vez de perder el chunk
+            print(f"  ! Se omite un fragmento sin texto pronunciable: {text!r}")
+            return np.zeros(SAMPLE_RATE // 10, dtype=np.float32), SAMPLE_RATE
+        raise error
+
+    def create_project(self, name, chunks, voice, speed, lang, model_variant=None, source=None, chapters=None,
+                       output_format=None):
+        output_format = parse_output_format(output_format) # ValueError antes de crear nada en disco
         # Sanitizar nombre para evitar errores en Windows
         # 1. Eliminar caracteres de control (como \n, \r, \t)
         clean_name = "".join(c for c in name if c.isprintable())
@@ -216,6 +746,7 @@ class BatchManager:
             "voice": voice,
             "speed": speed,
             "lang": lang,
+            "model_variant": self.resolve_variant(model_variant),
             "total_chunks": len(chunks),
             "completed_chunks": 0,
             "last_chunk": 0,
@@ -223,44 +754,64 @@ class BatchManager:
             "chunks": [{"id": i, "text": text, "status": "pending"} for i, text in enumerate(chunks)]
         }
 
+        if source:
+            status["source"] = source # Documento de origen (modo batch), para reanudar
+        if chapters:
+            status["chapters"] = chapters # Encabezados detectados (TextProcessor.detect_chapters)
+        if output_format:
+            status["output_format"] = output_format # Remuestreo, dither y normalización (audio_format)
+
         with self.status_lock:
-            with open(os.path.join(project_path, "status.json"), "w", encoding="utf-8") as f:
-                json.dump(status, f) # Sin indentación para velocidad
-        
+            status_path, states_path = self._status_paths(project_id)
+            _atomic_write_json(status_path, status)
+            table = ChunkTable.from_chunks(status["chunks"])
+            table.save(states_path)
+            self._cache_status(project_id, status, table)
+
+        self._update_search_index(self.search_index.index_project, project_id, name, chunks)
         return project_id
 
+    def _update_search_index(self, func, *args):
+        # El índice de búsqueda es secundario: un fallo no debe impedir crear, renombrar o borrar
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"Aviso: no se pudo actualizar el índice de búsqueda ({args[0]}): {e}")
+
+    def sync_search_index(self):
+        """Indexa los proyectos que aún no están en el índice (p. ej. creados antes de él)."""
+        try:
+            added, removed = self.search_index.sync(self.projects_dir)
+        except Exception as e:
+            print(f"Aviso: no se pudo sincronizar el índice de búsqueda: {e}")
+            return
+        if added or removed:
+            print(f"Índice de búsqueda: {added} proyecto(s) añadidos, {removed} quitados.")
+
     def get_projects(self):
         projects = []
         for pid in os.listdir(self.projects_dir):
             status_path = os.path.join(self.projects_dir, pid, "status.json")
             if os.path.exists(status_path):
-                with self.status_lock:
-                    try:
-                        with open(status_path, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                            data["id"] = pid
-                            projects.append(data)
-                    except Exception as e:
-                        print(f"Error leyendo proyecto {pid}: {e}")
+                data = self.get_project(pid)
+                if data is not None:
+                    projects.append(data)
         return projects
 
     def get_project(self, project_id):
-        status_path = os.path.join(self.projects_dir, project_id, "status.json")
-        if os.path.exists(status_path):
-            with self.status_lock:
-                try:
-                    with open(status_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        data["id"] = project_id
-                        return data
-                except Exception as e:
-                    print(f"Error leyendo proyecto {project_id}: {e}")
-        return None
+        with self.status_lock:
+            status, table = self._load_status(project_id)
+            if status is None:
+                return None
+            data = self._snapshot(project_id, status, table)
+        return self._merge_position(project_id, data)
 
-    def process_chunk(self, project_id, chunk_id):
-        project_path = os.path.join(self.projects_dir, project_id)
-        chunk_filename = f"chunk_{chunk_id}.wav"
-        chunk_path = os.path.join(project_path, "audio_chunks", chunk_filename)
+    def process_chunk(self, project_id, chunk_id, profile=None):
+        """
+        Sintetiza un chunk si no está en disco. `profile` ("cprofile" o "sample") perfila
+        solo esta síntesis; sin él se usa el modo del proyecto (set_profile), si lo hay.
+        """
+        chunk_path = self._chunk_path(project_id, chunk_id)
 
         # FAST-PATH: Si el archivo ya existe en disco, no hacer nada más
         if os.path.exists(chunk_path):
@@ -272,135 +823,327 @@ class BatchManager:
             if os.path.exists(chunk_path):
                 return chunk_id
 
-            # Obtener datos del proyecto
-            project = self.get_project(project_id)
+            job = self.get_chunk_job(project_id, chunk_id)
+            if job is None:
+                return chunk_id
+
+            self.journal.begin(project_id, chunk_id)
+            try:
+                mode = profile or self.profiled_projects.get(project_id)
+                if mode:
+                    out_base = os.path.join(self.projects_dir, project_id, "profiles",
+                                            f"chunk_{chunk_id}_{int(time.time())}_{mode}")
+                    with profile_block(mode, out_base):
+                        self.render_chunk(**job)
+                else:
+                    self.render_chunk(**job)
+            except ModelUnavailable:
+                # No es culpa del chunk: sigue pendiente para cuando haya modelo
+                self.journal.commit(project_id, chunk_id)
+                raise
+            except Exception as e:
+                print(f"Error procesando chunk {chunk_id}: {e}")
+                self.mark_chunk_result(project_id, chunk_id, ok=False)
+                raise e
+
+            # 2. Actualizar estado: un byte en chunk_states.bin, contadores incrementales
+            self.mark_chunk_result(project_id, chunk_id, ok=True)
+            return chunk_id
+
+    def _chunk_path(self, project_id, chunk_id):
+        return os.path.join(self.projects_dir, project_id, "audio_chunks", f"chunk_{chunk_id}.wav")
+
+    def get_chunk_job(self, project_id, chunk_id):
+        """
+        Parámetros para sintetizar un chunk (argumentos de render_chunk), o None si ya
+        no hay nada que hacer (completado o proyecto optimizado).
+        """
+        # Obtener datos del proyecto (acceso O(1) al chunk, sin copiar el status)
+        with self.status_lock:
+            project, table = self._load_status(project_id)
             if not project:
                 raise ValueError(f"Project {project_id} not found")
-            
+
             if project.get("is_optimized"):
-                return chunk_id
+                return None
 
-            chunk = next((c for c in project["chunks"] if c["id"] == chunk_id), None)
+            chunk = self._chunk_at(project, chunk_id)
             if not chunk:
                 raise ValueError(f"Chunk {chunk_id} not found in project {project_id}")
 
-            if chunk["status"] == "completed":
-                return chunk_id
+            if table.get(chunk_id) == COMPLETED:
+                return None
 
-            try:
+            return {
+                "project_id": project_id,
+                "chunk_id": chunk_id,
+                "text": chunk["text"],
+                "voice": project["voice"],
+                "speed": project["speed"],
+                "lang": project["lang"],
+                "variant": self.resolve_variant(project.get("model_variant")),
+                "output_format": project.get("output_format")
+            }
+
+    def render_chunk(self, project_id, chunk_id, text, voice, speed, lang, variant=None, output_format=None):
+        """
+        Sintetiza un chunk y deja en audio_chunks su WAV y su metadata de Karaoke.
+        No toca el estado del proyecto, así que puede ejecutarse en otro proceso
+        (ver Texto_a_voz_batch); el estado lo actualiza mark_chunk_result.
+        Devuelve (metadata, sample_rate).
+        """
+        chunk_path = self._chunk_path(project_id, chunk_id)
+        # El audio se escribe en un temporal y se renombra al final: nunca hay WAVs a medias
+        tmp_path = chunk_path + ".tmp"
+        start = time.perf_counter()
+        METRICS.add("tts_chunks_in_flight", 1)
+        try:
+            with METRICS.trace_context(self._trace_path(project_id), project_id=project_id, chunk_id=chunk_id), \
+                    METRICS.span("chunk", characters=len(text)):
                 # Generar audio
-                metadata, combined_samples, sample_rate = self._generate_audio_safe(
-                    chunk["text"], 
-                    project["voice"], 
-                    project["speed"], 
-                    project["lang"],
-                    chunk_id
-                )
-                
-                # Guardar el audio
-                sf.write(chunk_path, combined_samples, sample_rate)
+                if self.checkpoint_sub_parts:
+                    # Cada sub-parte terminada queda en disco: un reintento solo rehace las que faltan
+                    metadata, sample_rate = self._generate_audio_checkpointed(
+                        text, voice, speed, lang, tmp_path, self._parts_dir(project_id, chunk_id),
+                        chunk_id, variant=variant, output_format=output_format
+                    )
+                elif self.streaming_writes:
+                    # Cada sub-parte va a disco según se genera (memoria acotada)
+                    metadata, sample_rate = self._generate_audio_to_file(
+                        text, voice, speed, lang, tmp_path, chunk_id, variant=variant, output_format=output_format
+                    )
+                else:
+                    metadata, combined_samples, sample_rate = self._generate_audio_safe(
+                        text, 
+                        voice, 
+                        speed, 
+                        lang,
+                        chunk_id,
+                        variant=variant,
+                        output_format=output_format
+                    )
+                    with METRICS.span("wav_write"):
+                        sf.write(tmp_path, combined_samples, sample_rate, format="WAV")
                 
-                # Guardar metadata para Karaoke
+                # Guardar metadata para Karaoke (antes que el WAV: el WAV marca el chunk como listo)
                 meta_path = chunk_path.replace(".wav", ".json")
-                with open(meta_path, "w", encoding="utf-8") as f:
-                    json.dump(metadata, f)
-                
-                # 2. Actualizar estado de forma atómica usando el helper
-                def update_chunk_status(status):
-                    # Encontrar el chunk en el nuevo status (que viene de disco)
-                    c = next((ch for ch in status["chunks"] if ch["id"] == chunk_id), None)
-                    if c:
-                        c["status"] = "completed"
-                    
-                    status["completed_chunks"] = sum(1 for ch in status["chunks"] if ch["status"] == "completed")
-                    
-                    if status["completed_chunks"] == status["total_chunks"]:
-                        # No llamamos a assemble_audio dentro del lock de status para evitar interbloqueos
-                        # Lo haremos después de liberar el lock si es necesario
-                        status["_needs_assembly"] = True
-                    return True
+                _atomic_write_json(meta_path, metadata)
 
-                self._update_project_status(project_id, update_chunk_status)
-                
-                # Verificar si hace falta ensamblar (fuera del _update_project_status pero aún bajo self.lock)
-                p_updated = self.get_project(project_id)
-                if p_updated and p_updated.get("_needs_assembly"):
-                    def clear_assembly_flag(status):
-                        status.pop("_needs_assembly", None)
-                        status["is_finished"] = True
-                    self._update_project_status(project_id, clear_assembly_flag)
-                    self.assemble_audio(project_id)
+                os.replace(tmp_path, chunk_path)
+                shutil.rmtree(self._parts_dir(project_id, chunk_id), ignore_errors=True)
+            METRICS.inc("tts_chunks_total", result="ok")
+            METRICS.inc("tts_audio_seconds_total", sum(m["duration"] for m in metadata))
+            METRICS.inc("tts_synthesis_seconds_total", time.perf_counter() - start)
+            return metadata, sample_rate
+        except Exception:
+            METRICS.inc("tts_chunks_total", result="error")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            METRICS.add("tts_chunks_in_flight", -1)
 
-                return chunk_id
-            except Exception as e:
-                print(f"Error procesando chunk {chunk_id}: {e}")
-                def mark_error(status):
-                    c = next((ch for ch in status["chunks"] if ch["id"] == chunk_id), None)
-                    if c: c["status"] = "error"
-                self._update_project_status(project_id, mark_error)
-                raise e
+    def mark_chunk_result(self, project_id, chunk_id, ok=True, finish=True):
+        """
+        Registra el resultado de un chunk (completado o error) y cierra su entrada del
+        journal. Si completa el proyecto, lo ensambla (salvo con finish=False, para que
+        quien llama lo haga con _finish_project). Devuelve True si lo completó.
+        """
+        all_done = self._set_chunk_state(project_id, chunk_id, COMPLETED if ok else ERROR)
+        self.journal.commit(project_id, chunk_id)
+        if all_done and finish:
+            # Solo la llamada que completa el último chunk ensambla
+            self._finish_project(project_id)
+        return all_done
 
     def process_next_chunk(self, project_id):
-        project = self.get_project(project_id)
-        if not project or project["is_finished"]:
-            return None
-
-        # Buscar el primer chunk pendiente
-        next_chunk = next((c for c in project["chunks"] if c["status"] == "pending"), None)
+        with self.status_lock:
+            project, table = self._load_status(project_id)
+            if not project or project["is_finished"]:
+                return None
+            # Buscar el primer chunk pendiente (cursor, sin recorrer la lista)
+            next_id = table.next_pending()
         
-        if not next_chunk:
-            def mark_finished(status):
-                status["is_finished"] = True
-            self._update_project_status(project_id, mark_finished)
-            self.assemble_audio(project_id)
+        if next_id is None:
+            self._finish_project(project_id)
             return None
 
+        return self.process_chunk(project_id, next_id)
+
+    def _finish_project(self, project_id):
+        """
+        Cierra y ensambla el proyecto solo si todos sus chunks están completados: con
+        chunks en error o pendientes no se ensambla un libro con huecos.
+        """
+        with self.status_lock:
+            status, table = self._load_status(project_id)
+            if table is None or table.completed < status["total_chunks"]:
+                if table is not None and table.errors:
+                    print(f"Proyecto {project_id} sin cerrar: {table.errors} chunk(s) con error.")
+                return False
+
+        def mark_finished(status):
+            status["is_finished"] = True
+            status.pop("audio_evicted", None) # Audio regenerado tras liberarlo (ver evict_audio)
+        self._update_project_status(project_id, mark_finished)
+        self.assemble_audio(project_id)
+        self.journal.clear(project_id)
+        return True
+
+    @staticmethod
+    def _wav_is_complete(path):
+        """
+        Comprueba que la cabecera RIFF de un WAV declara como mucho los bytes que hay
+        en disco. Solo lee la cabecera, no las muestras.
+        """
         try:
-            # Generar audio de forma segura
-            metadata, combined_samples, sample_rate = self._generate_audio_safe(
-                next_chunk["text"], 
-                project["voice"], 
-                project["speed"], 
-                project["lang"],
-                next_chunk["id"]
-            )
-            
-            project_path = os.path.join(self.projects_dir, project_id)
-            chunk_filename = f"chunk_{next_chunk['id']}.wav"
-            chunk_path = os.path.join(project_path, "audio_chunks", chunk_filename)
-            sf.write(chunk_path, combined_samples, sample_rate)
-            
-            # También guardar metadatos si es posible
-            meta_path = chunk_path.replace(".wav", ".json")
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f)
-            
-            # Actualizar estado
-            def update_status(status):
-                c = next((ch for ch in status["chunks"] if ch["id"] == next_chunk["id"]), None)
-                if c: c["status"] = "completed"
-                status["completed_chunks"] = sum(1 for ch in status["chunks"] if ch["status"] == "completed")
-                if status["completed_chunks"] == status["total_chunks"]:
-                    status["_needs_assembly"] = True
-            
-            self._update_project_status(project_id, update_status)
-            
-            p_updated = self.get_project(project_id)
-            if p_updated and p_updated.get("_needs_assembly"):
-                def clear_flag(status):
-                    status.pop("_needs_assembly", None)
-                    status["is_finished"] = True
-                self._update_project_status(project_id, clear_flag)
-                self.assemble_audio(project_id)
-                
-            return next_chunk["id"]
-        except Exception as e:
-            print(f"Error procesando chunk {next_chunk['id']}: {e}")
-            def mark_err(status):
-                c = next((ch for ch in status["chunks"] if ch["id"] == next_chunk["id"]), None)
-                if c: c["status"] = "error"
-            self._update_project_status(project_id, mark_err)
-            raise e
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                header = f.read(4096)
+        except OSError:
+            return False
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return False
+        pos = 12
+        while pos + 8 <= len(header):
+            chunk_id, chunk_size = struct.unpack("<4sI", header[pos:pos + 8])
+            if chunk_id == b"data":
+                return chunk_size > 0 and pos + 8 + chunk_size <= size
+            pos += 8 + chunk_size + (chunk_size & 1)
+        return False
+
+    def reconcile_project(self, project_id):
+        """
+        Reconciliación tras un reinicio: contrasta chunk_states.bin con los ficheros de
+        audio_chunks y con el journal. Borra temporales y WAVs truncados, marca como
+        completados los chunks cuyo audio llegó a disco y como pendientes los que lo
+        perdieron. Los chunks en error vuelven a pendiente para reintentarse; sus
+        sub-partes ya guardadas (chunk_N.parts/) se conservan para el reintento.
+        No debe coincidir con una síntesis del mismo manager: recover_projects la llama
+        con self.lock. Devuelve True si al proyecto le queda trabajo.
+        """
+        project_path = os.path.join(self.projects_dir, project_id)
+        chunks_dir = os.path.join(project_path, "audio_chunks")
+
+        # Proyectos optimizados (audio final y sin chunks): nada que revisar, sin leer el status
+        if not os.path.isdir(chunks_dir):
+            if self.final_audio_path(project_id):
+                return False
+            os.makedirs(chunks_dir, exist_ok=True)
+
+        in_flight = self.journal.in_flight(project_id)
+        sizes = {}
+        with os.scandir(chunks_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".tmp"):
+                    # Escritura interrumpida antes del rename
+                    os.remove(entry.path)
+                    continue
+                sizes[entry.name] = entry.stat().st_size
+
+        with self.status_lock:
+            status, table = self._load_status(project_id)
+            if status is None or status.get("is_optimized"):
+                return False
+
+            changed = False
+            for chunk_id in range(len(table)):
+                wav_name = f"chunk_{chunk_id}.wav"
+                meta_name = f"chunk_{chunk_id}.json"
+                state = table.get(chunk_id)
+                wav_size = sizes.get(wav_name)
+
+                has_audio = wav_size is not None and wav_size > 44 and meta_name in sizes
+                # Solo se abre la cabecera de los chunks dudosos (en vuelo o sin confirmar)
+                if has_audio and (state != COMPLETED or chunk_id in in_flight):
+                    has_audio = self._wav_is_complete(os.path.join(chunks_dir, wav_name))
+
+                if has_audio:
+                    changed |= table.set(chunk_id, COMPLETED)
+                    if f"chunk_{chunk_id}.parts" in sizes:
+                        # Caída entre el rename del WAV y el borrado de sus sub-partes
+                        shutil.rmtree(os.path.join(chunks_dir, f"chunk_{chunk_id}.parts"), ignore_errors=True)
+                    continue
+
+                # Sin audio válido: limpiar restos para que el fast-path no los dé por buenos.
+                # Con el audio liberado, los tiempos se conservan (ver evict_audio)
+                leftovers = (wav_name,) if status.get("audio_evicted") else (wav_name, meta_name)
+                for name in leftovers:
+                    if name in sizes:
+                        os.remove(os.path.join(chunks_dir, name))
+                changed |= table.set(chunk_id, PENDING)
+
+            if changed:
+                _, states_path = self._status_paths(project_id)
+                table.save(states_path)
+            # Todo completado pero sin cerrar (caída durante el ensamblado) también cuenta.
+            # Un proyecto con el audio liberado no se reanuda: se regenera al escucharlo
+            pending = (table.completed < status["total_chunks"] or not status.get("is_finished")) \
+                and not status.get("audio_evicted")
+
+        self.journal.clear(project_id)
+        with self.hls_lock:
+            self.hls_timelines.pop(project_id, None)
+        return pending
+
+    def recover_projects(self, resume=True):
+        """
+        Revisa todos los proyectos al arrancar y encola los que no terminaron.
+        Devuelve la lista de proyectos reanudados.
+        """
+        start = time.perf_counter()
+        unfinished = []
+        for pid in sorted(os.listdir(self.projects_dir)):
+            if not os.path.exists(os.path.join(self.projects_dir, pid, "status.json")):
+                continue
+            try:
+                # Con el lock de síntesis: la app ya acepta peticiones mientras se reconcilia
+                # y un chunk en curso tiene su .tmp, su json sin WAV y su entrada en el journal
+                with self.lock:
+                    if self.reconcile_project(pid):
+                        unfinished.append(pid)
+            except Exception as e:
+                print(f"Error reconciliando {pid}: {e}")
+        print(f"Reconciliación completada en {time.perf_counter() - start:.2f}s: {len(unfinished)} proyecto(s) sin terminar.")
+
+        if resume:
+            for pid in unfinished:
+                self.enqueue_project(pid)
+        return unfinished
+
+    def enqueue_project(self, project_id):
+        """Encola un proyecto para completarlo en segundo plano."""
+        if self._resume_thread is None:
+            self._resume_thread = threading.Thread(target=self._resume_loop, daemon=True)
+            self._resume_thread.start()
+        self.resume_queue.put(project_id)
+
+    def _resume_loop(self):
+        while True:
+            project_id = self.resume_queue.get()
+            if project_id is None:
+                break
+            print(f"Reanudando proyecto {project_id} en segundo plano...")
+            last_id = None
+            while True:
+                try:
+                    chunk_id = self.process_next_chunk(project_id)
+                except ModelUnavailable as e:
+                    # Sin modelo fallarían todos los chunks de todos los proyectos: parar y
+                    # dejarlos pendientes para la próxima reconciliación
+                    print(f"Reanudación detenida: {e}")
+                    self._resume_thread = None
+                    return
+                except Exception as e:
+                    # El chunk queda en error y deja de estar pendiente: seguir con el siguiente
+                    print(f"Error reanudando {project_id}: {e}")
+                    if self.get_project(project_id) is None:
+                        break
+                    continue
+                # Sin progreso (p.ej. el WAV apareció por otra vía): no insistir
+                if chunk_id is None or chunk_id == last_id:
+                    break
+                last_id = chunk_id
 
     def assemble_audio(self, project_id):
         project_path = os.path.join(self.projects_dir, project_id)
@@ -415,6 +1158,10 @@ class BatchManager:
 
         print(f"Ensamblando audio para {project_id} ({status['total_chunks']} chunks)...")
         
+        with METRICS.trace_context(self._trace_path(project_id), project_id=project_id), METRICS.span("assemble"):
+            self._assemble_chunks(project_id, status, project_path, audio_chunks_dir, output_path)
+
+    def _assemble_chunks(self, project_id, status, project_path, audio_chunks_dir, output_path):
         try:
             # Obtener propiedades del primer chunk para configurar el archivo de salida
             first_chunk_path = os.path.join(audio_chunks_dir, "chunk_0.wav")
@@ -428,9 +1175,21 @@ class BatchManager:
 
             # Leer info del primer chunk
             info = sf.info(first_chunk_path)
-            samplerate = info.samplerate
+            output_format = status.get("output_format")
+            samplerate = output_rate(output_format, info.samplerate)
             channels = info.channels
-            subtype = info.subtype
+            subtype = "PCM_16" if output_format else info.subtype
+            gain = 1.0
+            if output_format and output_format.get("normalize_db") is not None:
+                # Un solo factor para todo el libro: primera pasada para encontrar el pico
+                with METRICS.span("normalize_scan"):
+                    gain = peak_gain(self._chunks_peak(audio_chunks_dir, status), output_format["normalize_db"])
+
+            # Posición de cada chunk en el audio final y su metadata de Karaoke, para
+            # situar los capítulos (la carpeta de chunks se borra al optimizar)
+            timeline = {}
+            segments = [] # Segmentos HLS sobre el audio final (hls_segments.json)
+            frame = 0
 
             # Abrir el archivo de salida para escritura incremental
             with sf.SoundFile(output_path, mode='w', samplerate=samplerate, channels=channels, subtype=subtype) as outfile:
@@ -439,11 +1198,23 @@ class BatchManager:
                     chunk_path = os.path.join(audio_chunks_dir, f"chunk_{chunk_id}.wav")
                     
                     if os.path.exists(chunk_path):
-                        data, sr = sf.read(chunk_path)
-                        outfile.write(data)
+                        frames = self._append_chunk(outfile, chunk_path, gain, (output_format or {}).get("dither", True))
+                        sub_parts = []
+                        meta_path = chunk_path.replace(".wav", ".json")
+                        if os.path.exists(meta_path):
+                            with open(meta_path, "r", encoding="utf-8") as f:
+                                sub_parts = json.load(f)
+                        timeline[chunk_id] = (frame, sub_parts, chunk["text"])
+                        segments.extend(chunk_segments(chunk_id, frames, sub_parts, samplerate, frame))
+                        frame += frames
                     else:
                         print(f"Advertencia: Chunk {chunk_id} no encontrado durante el ensamblado.")
 
+            marks = chapter_marks(status.get("chapters"), timeline, samplerate, default_title=status["name"])
+            _atomic_write_json(os.path.join(project_path, "chapters.json"), marks)
+            _atomic_write_json(os.path.join(project_path, "hls_segments.json"),
+                               [[s["chunk_id"], s["sub_part"], s["offset"], s["frames"]] for s in segments])
+
             print(f"Audio final ensamblado exitosamente en: {output_path}")
             
             # Actualizar estado final de forma atómica
@@ -465,19 +1236,410 @@ class BatchManager:
             print(f"Error crítico durante el ensamblado de audio: {e}")
             raise e
 
+    @staticmethod
+    def _chunks_peak(audio_chunks_dir, status):
+        """Pico absoluto (0-1) de todos los chunks del proyecto, leídos por bloques."""
+        peak = 0.0
+        for chunk in status["chunks"]:
+            chunk_path = os.path.join(audio_chunks_dir, f"chunk_{chunk['id']}.wav")
+            if os.path.exists(chunk_path):
+                for block in sf.blocks(chunk_path, blocksize=65536, dtype="float32"):
+                    if len(block):
+                        peak = max(peak, float(np.abs(block).max()))
+        return peak
+
+    @staticmethod
+    def _append_chunk(outfile, chunk_path, gain=1.0, dither=True):
+        """
+        Añade un chunk al audio final por bloques y devuelve sus frames en la salida. Si
+        coincide el formato se copia tal cual; si no (normalización, o chunks de antes de
+        cambiar la frecuencia) pasa por OutputStage.
+        """
+        frames = 0
+        with sf.SoundFile(chunk_path) as chunk:
+            if chunk.samplerate == outfile.samplerate and gain == 1.0:
+                dtype = "int16" if chunk.subtype == outfile.subtype == "PCM_16" else "float64"
+                for block in chunk.blocks(blocksize=65536, dtype=dtype):
+                    outfile.write(block)
+                    frames += len(block)
+                return frames
+            stage = OutputStage(chunk.samplerate, outfile.samplerate, dither, gain)
+            for block in chunk.blocks(blocksize=65536, dtype="float32"):
+                block = stage.process(block)
+                outfile.write(block)
+                frames += len(block)
+            tail = stage.flush()
+            outfile.write(tail)
+            return frames + len(tail)
+
+    def export_path(self, project_id, fmt):
+        """Ruta del audiolibro exportado en `fmt` (exista o no)."""
+        return os.path.join(self.projects_dir, project_id, "audiobook" + EXPORT_FORMATS[fmt]["extension"])
+
+    def export_project(self, project_id, fmt="m4b", bitrate=None):
+        """
+        Exporta el audiolibro terminado a M4B u Ogg con capítulos y devuelve la ruta.
+        No toma self.lock: solo lee el audio final y chapters.json, así que puede
+        correr mientras se sintetizan otros proyectos. Reutiliza la exportación previa
+        si es más reciente que el audio final.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación desconocido: {fmt}")
+        project = self.get_project(project_id)
+        if not project:
+            return None
+        project_path = os.path.join(self.projects_dir, project_id)
+        final_path = self.final_audio_path(project_id)
+        chapters_path = os.path.join(project_path, "chapters.json")
+        if final_path is None:
+            if project.get("completed_chunks", 0) < project.get("total_chunks", 0):
+                return None
+            self.assemble_audio(project_id)
+            final_path = os.path.join(project_path, "final_output.wav")
+
+        out_path = self.export_path(project_id, fmt)
+        if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(final_path):
+            return out_path
+
+        if os.path.exists(chapters_path):
+            with open(chapters_path, "r", encoding="utf-8") as f:
+                marks = json.load(f)
+        else:
+            # Proyecto ensamblado antes de existir chapters.json: un único capítulo
+            marks = chapter_marks(None, {}, sf.info(final_path).samplerate, default_title=project["name"])
+        print(f"Exportando {project_id} a {fmt} ({len(marks)} capítulos)...")
+        with METRICS.trace_context(self._trace_path(project_id), project_id=project_id), METRICS.span("export", format=fmt):
+            return export_audiobook(final_path, out_path, marks, project["name"], fmt=fmt, bitrate=bitrate)
+
+    # --- Lista HLS en directo (ver hls.py) ---
+
+    def hls_segments(self, project_id):
+        """
+        Segmentos HLS disponibles del proyecto, o None si no existe. Devuelve un dict con
+        "segments" (cada uno con su fichero "source", su rango de frames "start"/"frames"
+        y su posición "offset" en el audiolibro), "samplerate", "finished", "total_chunks"
+        y "next_chunk" (primer chunk aún sin audio). Los chunks ya recorridos se cachean:
+        cada consulta solo lee los que se han completado desde la anterior.
+        """
+        with self.status_lock:
+            status, table = self._load_status(project_id)
+            if status is None:
+                return None
+            optimized = status.get("is_optimized")
+        if optimized:
+            return self._hls_final_segments(project_id)
+
+        chunks_dir = os.path.join(self.projects_dir, project_id, "audio_chunks")
+        with self.hls_lock:
+            timeline = self.hls_timelines.get(project_id)
+            if timeline is None or timeline["optimized"]:
+                timeline = {"optimized": False, "segments": [], "next_chunk": 0, "frames": 0, "samplerate": SAMPLE_RATE}
+                self.hls_timelines[project_id] = timeline
+            while timeline["next_chunk"] < len(table) and table.get(timeline["next_chunk"]) == COMPLETED:
+                chunk_id = timeline["next_chunk"]
+                wav_path = os.path.join(chunks_dir, f"chunk_{chunk_id}.wav")
+                try:
+                    info = sf.info(wav_path)
+                    with open(wav_path[:-len(".wav")] + ".json", "r", encoding="utf-8") as f:
+                        sub_parts = json.load(f)
+                except (OSError, ValueError, RuntimeError):
+                    break # Se está optimizando: la próxima consulta usa el audio final
+                for segment in chunk_segments(chunk_id, info.frames, sub_parts, info.samplerate, timeline["frames"]):
+                    segment["source"] = wav_path
+                    timeline["segments"].append(segment)
+                timeline["frames"] += info.frames
+                timeline["samplerate"] = info.samplerate
+                timeline["next_chunk"] += 1
+            segments = list(timeline["segments"])
+            next_chunk = timeline["next_chunk"]
+            offset = timeline["frames"]
+            samplerate = timeline["samplerate"]
+
+        if next_chunk < len(table):
+            # Sub-partes ya terminadas del chunk en curso: se oyen antes de que acabe el chunk
+            segments.extend(self._hls_partial_segments(project_id, next_chunk, offset))
+        return {"segments": segments, "samplerate": samplerate, "finished": next_chunk >= len(table),
+                "next_chunk": next_chunk, "total_chunks": len(table)}
+
+    def _hls_partial_segments(self, project_id, chunk_id, offset):
+        """Segmentos de las sub-partes consecutivas ya guardadas (checkpoint) de un chunk."""
+        parts_dir = self._parts_dir(project_id, chunk_id)
+        try:
+            with open(os.path.join(parts_dir, "parts.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return []
+        segments = []
+        start = 0
+        for i in range(manifest["count"]):
+            if str(i) not in manifest["done"]:
+                break
+            part_path = os.path.join(parts_dir, f"part_{i}.wav")
+            try:
+                frames = sf.info(part_path).frames
+            except (OSError, RuntimeError):
+                break
+            if frames > 0:
+                segments.append({"chunk_id": chunk_id, "sub_part": i, "source": part_path, "start": 0,
+                                 "frames": frames, "offset": offset + start})
+            start += frames
+        return segments
+
+    def _hls_final_segments(self, project_id):
+        """Segmentos sobre el audio final de un proyecto optimizado (hls_segments.json)."""
+        project_path = os.path.join(self.projects_dir, project_id)
+        final_path = self.final_audio_path(project_id)
+        with self.hls_lock:
+            timeline = self.hls_timelines.get(project_id)
+            if timeline is None or not timeline["optimized"]:
+                info = sf.info(final_path)
+                try:
+                    with open(os.path.join(project_path, "hls_segments.json"), "r", encoding="utf-8") as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    # Proyectos optimizados antes de existir hls_segments.json: tramos fijos
+                    window = info.samplerate * TARGET_DURATION // 3
+                    entries = [[None, i, offset, min(window, info.frames - offset)]
+                               for i, offset in enumerate(range(0, info.frames, window))]
+                segments = [{"chunk_id": chunk_id, "sub_part": sub_part, "source": final_path, "start": offset,
+                             "frames": frames, "offset": offset} for chunk_id, sub_part, offset, frames in entries]
+                timeline = {"optimized": True, "segments": segments, "samplerate": info.samplerate}
+                self.hls_timelines[project_id] = timeline
+            segments = list(timeline["segments"])
+            samplerate = timeline["samplerate"]
+        return {"segments": segments, "samplerate": samplerate, "finished": True, "next_chunk": None,
+                "total_chunks": None}
+
+    def hls_segment_file(self, project_id, index):
+        """
+        Ruta del segmento HLS `index` ya codificado (<proyecto>/hls/), codificándolo la
+        primera vez que se pide. None si ese segmento todavía no existe.
+        """
+        seg_path = os.path.join(self.projects_dir, project_id, "hls", f"seg_{index}{SEGMENT_EXTENSION}")
+        if os.path.exists(seg_path):
+            return seg_path
+        for _ in range(2):
+            playlist = self.hls_segments(project_id)
+            if playlist is None or index >= len(playlist["segments"]):
+                return None
+            segment = playlist["segments"][index]
+            try:
+                with sf.SoundFile(segment["source"]) as f:
+                    f.seek(segment["start"])
+                    samples = f.read(segment["frames"], dtype="float32")
+                    samplerate = f.samplerate
+                break
+            except (OSError, RuntimeError):
+                # El origen desapareció (el chunk terminó o el proyecto se optimizó): recalcular
+                with self.hls_lock:
+                    self.hls_timelines.pop(project_id, None)
+        else:
+            return None
+        with METRICS.span("hls_encode"):
+            data = encode_segment(samples, samplerate, segment["offset"])
+        os.makedirs(os.path.dirname(seg_path), exist_ok=True)
+        tmp_path = f"{seg_path}.{threading.get_ident()}.tmp" # Dos peticiones pueden codificarlo a la vez
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, seg_path)
+        return seg_path
+
+    # --- Almacenamiento (ver storage.py) ---
+
+    def final_audio_path(self, project_id):
+        """Audio final del proyecto: final_output.wav, o final_output.flac si se compactó. None si no hay."""
+        project_path = os.path.join(self.projects_dir, project_id)
+        for name in ("final_output.wav", "final_output.flac"):
+            path = os.path.join(project_path, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def last_used(self, project_id):
+        """Última vez que se escuchó (posición de lectura) o se generó audio (estado en disco) del proyecto."""
+        position = self.get_position(project_id) or {}
+        last = position.get("updated_at", 0.0)
+        for path in self._status_paths(project_id):
+            try:
+                last = max(last, os.path.getmtime(path))
+            except OSError:
+                pass
+        return last
+
+    def evict_audio(self, project_id):
+        """
+        Libera el audio regenerable de un proyecto (chunks, audio final, exportaciones y
+        segmentos HLS) y deja todos sus chunks pendientes. Se conservan el texto, los
+        capítulos y los tiempos; el audio se regenera bajo demanda al volver a escucharlo
+        (no se reanuda al arrancar). Devuelve los bytes liberados.
+        """
+        project_path = os.path.join(self.projects_dir, project_id)
+        # Con el lock de síntesis: ningún chunk de este proyecto se está escribiendo
+        with self.lock:
+            def mark_evicted(status):
+                for chunk in status["chunks"]:
+                    chunk["status"] = "pending"
+                status["is_finished"] = False
+                status["is_optimized"] = False
+                status["audio_evicted"] = True
+            # Primero el estado: si se cae a medias, la reconciliación ve chunks pendientes
+            if not self._update_project_status(project_id, mark_evicted):
+                return 0
+            freed = 0
+            chunks_dir = os.path.join(project_path, "audio_chunks")
+            # En audio_chunks solo el audio: los chunk_N.json (tiempos del karaoke) se quedan
+            paths = chunk_audio_paths(chunks_dir)
+            for name in os.listdir(project_path):
+                if is_audio_entry(name) and name != "audio_chunks":
+                    paths.append(os.path.join(project_path, name))
+            for path in paths:
+                freed += path_size(path)
+                self.cleanup.discard(path)
+            os.makedirs(chunks_dir, exist_ok=True)
+        with self.hls_lock:
+            self.hls_timelines.pop(project_id, None)
+        print(f"Audio de {project_id} liberado ({freed / 2**20:.1f} MB); se regenerará al escucharlo.")
+        return freed
+
+    def compact_project(self, project_id):
+        """
+        Recodifica final_output.wav a FLAC (sin pérdidas) y borra el WAV. El FLAC conserva
+        la fecha del WAV para que las exportaciones previas sigan valiendo. Devuelve los
+        bytes ahorrados (0 si no había nada que compactar).
+        """
+        project_path = os.path.join(self.projects_dir, project_id)
+        wav_path = os.path.join(project_path, "final_output.wav")
+        flac_path = os.path.join(project_path, "final_output.flac")
+        if not os.path.exists(wav_path):
+            return 0
+        st = os.stat(wav_path)
+        if not os.path.exists(flac_path):
+            info = sf.info(wav_path)
+            subtype = "PCM_16" if info.subtype in ("PCM_16", "PCM_U8", "PCM_S8") else "PCM_24"
+            tmp_path = flac_path + ".tmp"
+            with sf.SoundFile(tmp_path, mode="w", samplerate=info.samplerate, channels=info.channels,
+                              subtype=subtype, format="FLAC") as out:
+                for block in sf.blocks(wav_path, blocksize=65536, dtype="int16" if subtype == "PCM_16" else "int32"):
+                    out.write(block)
+            os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp_path, flac_path)
+        try:
+            self.cleanup.discard(wav_path)
+        except OSError as e:
+            # En Windows falla si alguien está descargando el WAV: se reintenta en el próximo ciclo
+            print(f"No se pudo retirar el WAV de {project_id}: {e}")
+            return 0
+        saved = st.st_size - os.path.getsize(flac_path)
+        print(f"Proyecto {project_id} compactado a FLAC ({saved / 2**20:.1f} MB menos).")
+        return saved
+
     def delete_project(self, project_id):
-        import shutil
+        """Borra el proyecto: la carpeta desaparece al momento y se elimina en segundo plano."""
         project_path = os.path.join(self.projects_dir, project_id)
-        if os.path.exists(project_path):
-            shutil.rmtree(project_path)
+        with self.position_lock:
+            self.positions.pop(project_id, None)
+            self.dirty_positions.discard(project_id)
+        with self.hls_lock:
+            self.hls_timelines.pop(project_id, None)
+        with self.status_lock:
+            self._drop_cache(project_id)
+        self._update_search_index(self.search_index.remove_project, project_id)
+        if self.cleanup.discard(project_path):
             print(f"Proyecto {project_id} eliminado.")
             return True
+
     def rename_project(self, project_id, new_name):
+        clean_name = "".join(c for c in new_name if c.isprintable())
         def update_name(status):
-            status["name"] = "".join(c for c in new_name if c.isprintable())
-        return self._update_project_status(project_id, update_name)
+            status["name"] = clean_name
+        if not self._update_project_status(project_id, update_name):
+            return False
+        self._update_search_index(self.search_index.rename_project, project_id, clean_name)
+        return True
+
+    def update_last_chunk(self, project_id, last_chunk, sub_part=0, offset=0.0):
+        """
+        Registra la posición de lectura en memoria. El hilo de volcado la escribe en el
+        position.json del proyecto cada POSITION_FLUSH_INTERVAL segundos (y al cerrar);
+        status.json solo se consulta para comprobar que el proyecto existe.
+        """
+        status_path = os.path.join(self.projects_dir, project_id, "status.json")
+        if not os.path.exists(status_path):
+            return False
+        with self.position_lock:
+            self.positions[project_id] = {
+                "last_chunk": int(last_chunk),
+                "last_sub_part": int(sub_part),
+                "last_offset": float(offset),
+                "updated_at": time.time()
+            }
+            self.dirty_positions.add(project_id)
+        return True
+
+    def get_position(self, project_id):
+        """
+        Devuelve la posición de lectura: la registrada en memoria o, si no hay, la de
+        position.json. None si el proyecto no tiene ninguna (los proyectos anteriores a
+        position.json solo tienen last_chunk en status.json; ver _merge_position).
+        """
+        with self.position_lock:
+            if project_id in self.positions:
+                return dict(self.positions[project_id])
+
+        position_path = os.path.join(self.projects_dir, project_id, "position.json")
+        position = None
+        if os.path.exists(position_path):
+            try:
+                with open(position_path, "r", encoding="utf-8") as f:
+                    position = json.load(f)
+            except Exception as e:
+                print(f"Error leyendo posición de {project_id}: {e}")
+
+        if position is not None:
+            with self.position_lock:
+                # Si entretanto llegó una actualización, esa manda
+                position = self.positions.setdefault(project_id, position)
+                return dict(position)
+        return None
+
+    def _merge_position(self, project_id, data):
+        """Superpone la posición de lectura más reciente sobre los datos de status.json."""
+        position = self.get_position(project_id)
+        data.setdefault("last_sub_part", 0)
+        data.setdefault("last_offset", 0.0)
+        if position:
+            data["last_chunk"] = position.get("last_chunk", data.get("last_chunk", 0))
+            data["last_sub_part"] = position.get("last_sub_part", 0)
+            data["last_offset"] = position.get("last_offset", 0.0)
+        return data
+
+    def flush_positions(self):
+        """Persiste las posiciones modificadas desde el último volcado."""
+        with self.position_lock:
+            pending = {pid: dict(self.positions[pid]) for pid in self.dirty_positions if pid in self.positions}
+            self.dirty_positions.clear()
+
+        for pid, position in pending.items():
+            project_path = os.path.join(self.projects_dir, pid)
+            if not os.path.isdir(project_path):
+                continue
+            position_path = os.path.join(project_path, "position.json")
+            try:
+                _atomic_write_json(position_path, position)
+            except Exception as e:
+                print(f"Error guardando posición de {pid}: {e}")
+                with self.position_lock:
+                    self.dirty_positions.add(pid) # Reintentar en el siguiente ciclo
+
+    def _position_flush_loop(self):
+        while not self._position_stop.wait(POSITION_FLUSH_INTERVAL):
+            self.flush_positions()
 
-    def update_last_chunk(self, project_id, last_chunk):
-        def update_lc(status):
-            status["last_chunk"] = last_chunk
-        return self._update_project_status(project_id, update_lc)
+    def shutdown(self):
+        """Detiene el hilo de volcado y persiste las posiciones pendientes."""
+        self._position_stop.set()
+        self.flush_positions()
+        if self._resume_thread is not None:
+            self.resume_queue.put(None)
+        if self.search_index is not None:
+            self.search_index.close()
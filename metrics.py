@@ -0,0 +1,210 @@
+"""
+Métricas de rendimiento en formato de texto de Prometheus, sin dependencias externas.
+
+- span("etapa"): cronometra un bloque y lo acumula en el histograma tts_stage_seconds.
+  Dentro de trace_context(ruta, ...), cada span además se añade como una línea JSON al
+  fichero de traza (por proyecto, opcional).
+- InstrumentedLock: threading.Lock que mide la espera de cada adquisición.
+- Contadores, gauges e histogramas con etiquetas; los gauges pueden calcularse al
+  exportar (register_gauge), p. ej. la profundidad de la cola de síntesis.
+
+METRICS es el registro del proceso; /metrics devuelve METRICS.render().
+"""
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Cubre desde la limpieza de una sub-parte (ms) hasta la síntesis de un chunk (minutos)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {} # nombre -> (tipo, descripción)
+        self.counters = {} # (nombre, etiquetas) -> valor
+        self.gauges = {}
+        self.histograms = {} # (nombre, etiquetas) -> [cuentas por bucket, suma, n]
+        self.buckets = {}
+        self.callbacks = {} # nombre -> función que devuelve valor o {etiquetas: valor}
+        self._local = threading.local()
+
+    def describe(self, name, kind, text, buckets=None):
+        self.help[name] = (kind, text)
+        if buckets is not None:
+            self.buckets[name] = tuple(buckets)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels_key(labels))] = value
+
+    def add(self, name, value, **labels):
+        """Suma (o resta) a un gauge, p. ej. trabajos en curso."""
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        buckets = self.buckets.get(name, DEFAULT_BUCKETS)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += value
+            hist[2] += 1
+
+    def register_gauge(self, name, func, text=""):
+        """Gauge calculado al exportar. func() devuelve un número o {(("etiqueta", "valor"),): número}."""
+        self.callbacks[name] = func
+        self.help.setdefault(name, ("gauge", text))
+
+    def get(self, name, **labels):
+        """Valor actual de un contador o gauge (0 si no existe). Útil en tests y benchmarks."""
+        key = (name, _labels_key(labels))
+        with self.lock:
+            return self.counters.get(key, self.gauges.get(key, 0))
+
+    def histogram(self, name, **labels):
+        """(suma, n) de un histograma."""
+        with self.lock:
+            hist = self.histograms.get((name, _labels_key(labels)))
+            return (hist[1], hist[2]) if hist else (0.0, 0)
+
+    # --- Spans y trazas ---
+
+    @contextmanager
+    def trace_context(self, path, **fields):
+        """Los spans de este hilo dentro del bloque se escriben en `path` (si no es None)."""
+        previous = getattr(self._local, "trace", None)
+        self._local.trace = (path, fields) if path else previous
+        try:
+            yield
+        finally:
+            self._local.trace = previous
+
+    @contextmanager
+    def span(self, stage, **fields):
+        start = time.perf_counter()
+        wall = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("tts_stage_seconds", elapsed, stage=stage)
+            trace = getattr(self._local, "trace", None)
+            if trace is not None:
+                path, context = trace
+                record = dict(context, stage=stage, start=wall, seconds=elapsed, **fields)
+                try:
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass # La traza es opcional: nunca interrumpe la síntesis
+
+    # --- Exportación ---
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self.histograms.items()}
+        for name, func in list(self.callbacks.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            if isinstance(value, dict):
+                for key, v in value.items():
+                    gauges[(name, tuple(key))] = v
+            elif value is not None:
+                gauges[(name, ())] = value
+
+        def header(name, default_kind):
+            kind, text = self.help.get(name, (default_kind, ""))
+            if text:
+                lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for series, kind in ((counters, "counter"), (gauges, "gauge")):
+            for name in sorted({n for n, _ in series}):
+                header(name, kind)
+                for (n, key), value in sorted(series.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name in sorted({n for n, _ in histograms}):
+            header(name, "histogram")
+            buckets = self.buckets.get(name, DEFAULT_BUCKETS)
+            for (n, key), (counts, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(buckets, counts):
+                    cumulative += c
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(float(total))}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+class InstrumentedLock:
+    """threading.Lock que registra la espera de cada adquisición en tts_lock_wait_seconds."""
+    def __init__(self, name, registry=None):
+        self._lock = threading.Lock()
+        self.name = name
+        self.registry = registry or METRICS
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self.registry.observe("tts_lock_wait_seconds", time.perf_counter() - start, lock=self.name)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+METRICS = Metrics()
+METRICS.describe("tts_stage_seconds", "histogram", "Duración de cada etapa (extracción, segmentación, limpieza, fonemas, inferencia, escritura, estado, ensamblado)")
+METRICS.describe("tts_lock_wait_seconds", "histogram", "Espera para adquirir los locks del manager",
+                 buckets=(0.0001, 0.001, 0.01, 0.1, 1, 10, 60, 300))
+METRICS.describe("tts_chunks_total", "counter", "Chunks sintetizados por resultado")
+METRICS.describe("tts_chunks_in_flight", "gauge", "Chunks sintetizándose ahora mismo")
+METRICS.describe("tts_audio_seconds_total", "counter", "Segundos de audio generados")
+METRICS.describe("tts_synthesis_seconds_total", "counter", "Segundos de cómputo dedicados a sintetizar chunks")
@@ -0,0 +1,86 @@
+"""
+Caché LRU en disco de las previsualizaciones de /api/speak y de las muestras de voz.
+
+Las previsualizaciones repiten las mismas frases cortas con las mismas voces y mezclas.
+Cada WAV generado se guarda en cache_dir con una clave derivada de (texto, voz o
+mezcla, velocidad, idioma, variante del modelo). Las peticiones repetidas lo sirven sin
+inferencia, con ETag y caché en memoria (ver http_cache.send_cached). Al superar
+max_bytes se borran los usados hace más tiempo (DiskLRU, como ExtractCache).
+
+precompute_voice_samples genera en segundo plano una muestra por voz del catálogo, solo
+mientras la conversión de libros está ociosa.
+"""
+import json
+import hashlib
+import threading
+from disk_lru import DiskLRU
+
+# Frase de muestra por idioma. La de "es" es la misma que usa la interfaz al escuchar una
+# mezcla, así que también queda cacheada tras el primer uso.
+SAMPLE_TEXTS = {
+    "es": "Hola, esta es una prueba de mi voz personalizada.",
+    "en-us": "Hello, this is a short sample of my voice.",
+    "en-gb": "Hello, this is a short sample of my voice.",
+    "fr": "Bonjour, ceci est un court extrait de ma voix.",
+    "it": "Ciao, questo è un breve esempio della mia voce.",
+    "pt-br": "Olá, este é um pequeno exemplo da minha voz.",
+    "ja": "こんにちは、これは私の声のサンプルです。",
+    "zh": "你好，这是我的声音示例。",
+}
+IDLE_POLL_SECONDS = 1.0
+
+def preview_key(text, voice, speed, lang, variant=None):
+    payload = json.dumps([text, voice, round(float(speed), 3), lang, variant], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class PreviewCache(DiskLRU):
+    def __init__(self, cache_dir, max_bytes=64 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes, ".wav")
+
+    def contains(self, key):
+        """Si la clave está cacheada, sin contar acierto ni fallo ni cambiar el orden."""
+        return self._contains(key + ".wav")
+
+    def get(self, key):
+        """
+        Ruta del WAV cacheado para `key`, o None. Otra petición puede expulsarlo antes de
+        servirlo: quien lo envía trata FileNotFoundError como un fallo.
+        """
+        path = self._lookup(key + ".wav")
+        self._record(hit=path is not None)
+        return path
+
+    def put(self, key, data):
+        """Guarda el WAV (bytes) y devuelve su ruta, o None si no cabe en la caché."""
+        return self._store(key + ".wav", data)
+
+def precompute_voice_samples(cache, samples, render, is_idle, lock=None, stop=None, poll=IDLE_POLL_SECONDS):
+    """
+    Genera las muestras que falten. `samples` es una lista de (clave, argumentos de
+    render); render(*args) devuelve el WAV en bytes. Antes de cada muestra espera a que
+    is_idle() sea cierto y la sintetiza con `lock` tomado (el lock de síntesis del
+    manager), así un chunk de un libro espera como mucho una frase corta.
+    Devuelve cuántas muestras generó.
+    """
+    stop = stop or threading.Event()
+    generated = 0
+    for key, args in samples:
+        if cache.contains(key):
+            continue
+        while not is_idle():
+            if stop.wait(poll):
+                return generated
+        if stop.is_set():
+            return generated
+        try:
+            if lock is not None:
+                with lock:
+                    data = render(*args)
+            else:
+                data = render(*args)
+        except Exception as e:
+            print(f"Aviso: no se pudo generar la muestra {args}: {e}")
+            continue
+        cache.put(key, data)
+        generated += 1
+    return generated
@@ -3,6 +3,58 @@ import re
 import fitz
 from docx import Document
 
+# Palabras que abren un encabezado de capítulo
+HEADING_KEYWORDS = (r'(cap[ií]tulo|chapter|parte|part|libro|book|pr[oó]logo|prologue|ep[ií]logo|epilogue|'
+                    r'introducci[oó]n|introduction|pre[aá]mbulo|nota preliminar)')
+# Las que son un título por sí solas. "Parte", "Libro"... necesitan número: "Parte de mí
+# quería irse" es una frase
+TITLE_KEYWORDS = (r'(pr[oó]logo|prologue|ep[ií]logo|epilogue|introducci[oó]n|introduction|pre[aá]mbulo|'
+                  r'nota preliminar)')
+# "Capítulo 3", "CAPÍTULO II. El teatro mágico", "Parte primera" (romanos solo en mayúsculas:
+# "parte mi..." no es un encabezado)
+NUMBERED_HEADING = re.compile(
+    HEADING_KEYWORDS + r'\s+(\d+|(?-i:[IVXLCDM]+)|primer[oa]?|segund[oa]|tercer[oa]?|cuart[oa]|quint[oa]|'
+    r'[uú]ltim[oa]|first|second|third|one|two|three)\b',
+    re.IGNORECASE
+)
+# "Prólogo", "Introducción", "Epílogo del traductor": mayúscula y sin puntuación de frase
+TITLED_HEADING = re.compile(TITLE_KEYWORDS + r'\b[^.,;:!?]*$', re.IGNORECASE)
+MAX_HEADING_LEN = 80
+ANCHOR_WORDS = 5 # Palabras del inicio de página con que se sitúa una entrada del índice sin título en el texto
+# Final de línea que cierra un párrafo (lo siguiente puede ser un encabezado)
+PARAGRAPH_END = tuple('.!?:…»”"\')')
+
+def _normalize_heading(text):
+    return re.sub(r'\W+', ' ', text).strip().lower()
+
+def _looks_like_heading(title, titles=None):
+    """
+    Encabezado por su forma: palabra clave y número, o título ("Prólogo"). Con `titles`
+    (títulos normalizados del índice del documento) solo cuentan los del índice.
+    """
+    if not title or len(title) > MAX_HEADING_LEN:
+        return False
+    if titles:
+        return _normalize_heading(title) in titles
+    if NUMBERED_HEADING.match(title):
+        return True
+    return title[0].isupper() and bool(TITLED_HEADING.match(title))
+
+def _is_standalone(lines, i):
+    """La línea i es un párrafo propio: cierra el anterior y no continúa en la siguiente."""
+    prev = lines[i - 1].strip() if i > 0 else ""
+    following = lines[i + 1].strip() if i + 1 < len(lines) else ""
+    if prev and not prev.endswith(PARAGRAPH_END):
+        return False # Línea partida a mitad de frase (texto de PDF)
+    return not following or not following[0].islower()
+
+def _heading_regex(heading, whole_line=True):
+    # El título entero, al principio de una línea o tras un punto (split_into_chunks une
+    # con espacios las frases de un párrafo largo) y terminando su línea
+    words = r'\s+'.join(re.escape(w) for w in heading.split())
+    end = r'(?=[ \t\xa0]*(?:\n|$))' if whole_line else ''
+    return re.compile(r'(?:^|(?<=\n)|(?<=[.!?»”] ))' + words + end, re.IGNORECASE)
+
 class TextProcessor:
     @staticmethod
     def extract_text(filepath):
@@ -21,7 +73,10 @@ class TextProcessor:
         return text.strip()
 
     @staticmethod
-    def split_into_chunks(text, target_len=2500, first_chunk_len=None):
+    def split_into_chunks(text, target_len=2500, first_chunk_len=None, chapter_breaks=False, headings=None):
+        # chapter_breaks: empezar un chunk nuevo en cada encabezado de capítulo, para que
+        # el capítulo no arranque al final de un chunk (ver detect_chapters). Con `headings`
+        # (el índice del documento, ver extract_headings) los encabezados son sus títulos
         # Limpieza básica
         if first_chunk_len is None:
             first_chunk_len = target_len
@@ -32,11 +87,16 @@ class TextProcessor:
         paragraphs = text.split('\n\n')
         chunks = []
         current_chunk = ""
+        titles = {_normalize_heading(h if isinstance(h, str) else h["title"]) for h in headings or []} - {""}
 
         for para in paragraphs:
             para = para.strip()
             if not para:
                 continue
+
+            if chapter_breaks and current_chunk and _looks_like_heading(para, titles):
+                chunks.append(current_chunk.strip())
+                current_chunk = ""
             
             # Determinar el target para el chunk actual
             current_target = first_chunk_len if len(chunks) == 0 else target_len
@@ -67,3 +127,91 @@ class TextProcessor:
             chunks.append(current_chunk.strip())
             
         return chunks
+
+    @staticmethod
+    def extract_headings(filepath):
+        """
+        Títulos de capítulo declarados por el propio documento: el índice (TOC) de un PDF
+        o los párrafos con estilo "Heading"/"Título" de un DOCX. Lista vacía si no hay.
+        Si el título de una entrada del índice no está escrito en su página (portadillas
+        en imagen, "Sobre el autor"...), la entrada es {"title", "anchor"} con la primera
+        palabras de la página, para situar el capítulo donde empieza su texto.
+        """
+        ext = filepath.split('.')[-1].lower()
+        headings = []
+        if ext == 'pdf':
+            with fitz.open(filepath) as doc:
+                # Solo los dos primeros niveles: partes y capítulos
+                for level, title, page in doc.get_toc():
+                    title = title.strip()
+                    if level > 2 or not title:
+                        continue
+                    page_text = doc[page - 1].get_text() if 1 <= page <= len(doc) else ""
+                    lines = [line for line in page_text.split('\n') if len(line.strip()) > 2]
+                    if lines and _normalize_heading(title) not in _normalize_heading(page_text):
+                        # Pocas palabras: el chunk puede cortar la línea tras una frase
+                        headings.append({"title": title, "anchor": " ".join(lines[0].split()[:ANCHOR_WORDS])})
+                    else:
+                        headings.append(title)
+        elif ext == 'docx':
+            doc = Document(filepath)
+            for para in doc.paragraphs:
+                style = (para.style.name or "").lower() if para.style is not None else ""
+                if (style.startswith("heading") or style.startswith("título")) and para.text.strip():
+                    headings.append(para.text.strip())
+        return headings
+
+    @staticmethod
+    def detect_chapters(chunks, headings=None):
+        """
+        Localiza los encabezados de capítulo en los chunks ya segmentados.
+        Con `headings` (el índice del documento, ver extract_headings) se buscan esos
+        títulos, en orden, como línea propia. Sin ellos, un párrafo propio es encabezado si
+        empieza por "Capítulo", "Parte", "Libro"... seguido de un número ("Capítulo 3",
+        "PARTE II") o si es "Prólogo", "Introducción"... sin puntuación de frase. Los encabezados
+        repetidos seguidos (cabeceras de página de los PDF) se cuentan una sola vez.
+        Devuelve [{"title", "chunk_id", "offset"}], con offset en caracteres dentro del chunk.
+        """
+        headings = [h for h in headings or [] if _normalize_heading(h if isinstance(h, str) else h["title"])]
+        if headings:
+            return TextProcessor._locate_headings(chunks, headings)
+        chapters = []
+        last = None
+        for chunk_id, chunk in enumerate(chunks):
+            lines = chunk.split('\n')
+            offset = 0
+            for i, line in enumerate(lines):
+                title = line.strip()
+                start = offset + len(line) - len(line.lstrip())
+                offset += len(line) + 1
+                if not _looks_like_heading(title) or not _is_standalone(lines, i):
+                    continue
+                norm = _normalize_heading(title)
+                if norm == last:
+                    continue
+                chapters.append({"title": title, "chunk_id": chunk_id, "offset": start})
+                last = norm
+        return chapters
+
+    @staticmethod
+    def _locate_headings(chunks, headings):
+        # Cada título se busca a partir del anterior: el índice está en orden de lectura.
+        # Sin el título en el texto se busca su ancla (primera línea de su página); las
+        # entradas que no aparecen de ninguna forma (p.ej. "Cubierta") se saltan
+        chapters = []
+        chunk_id, pos = 0, 0
+        for heading in headings:
+            if isinstance(heading, str):
+                heading = {"title": heading}
+            patterns = [_heading_regex(heading["title"])]
+            if heading.get("anchor"):
+                patterns.append(_heading_regex(heading["anchor"], whole_line=False))
+            for pattern in patterns:
+                found = next(((cid, m) for cid in range(chunk_id, len(chunks))
+                              for m in [pattern.search(chunks[cid], pos if cid == chunk_id else 0)] if m), None)
+                if found:
+                    cid, match = found
+                    chapters.append({"title": heading["title"], "chunk_id": cid, "offset": match.start()})
+                    chunk_id, pos = cid, match.end()
+                    break
+        return chapters
@@ -0,0 +1,122 @@
+"""
+Perfilado opcional de la síntesis de un chunk, guardado en la carpeta del proyecto.
+
+Dos modos:
+- "cprofile": cProfile del hilo que sintetiza. Exacto pero con sobrecoste apreciable en
+  código Python; guarda <base>.prof (abrir con pstats o snakeviz) y <base>.txt.
+- "sample": un hilo muestrea la pila del hilo que sintetiza cada `interval` segundos
+  con sys._current_frames(). Sobrecoste muy bajo; guarda <base>.folded (pilas
+  colapsadas, formato de flamegraph.pl / speedscope) y <base>.txt con las funciones
+  más vistas.
+
+Con el perfilado desactivado el único coste es comprobar el modo del proyecto.
+"""
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 40
+
+class StackSampler:
+    """Muestreo periódico de la pila de un hilo."""
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        """Funciones por muestras propias (en la cima de la pila) y totales."""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        n = max(1, self.samples)
+        lines = [f"{self.samples} muestras cada {self.interval * 1000:.1f} ms", "",
+                 f"{'propio %':>9} {'total %':>8}  función"]
+        for name, count in own.most_common(TOP_FUNCTIONS):
+            lines.append(f"{count / n * 100:>9.1f} {total[name] / n * 100:>8.1f}  {name}")
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def profile_block(mode, out_base):
+    """
+    Perfila el bloque en el hilo actual y escribe los resultados con prefijo out_base.
+    Los errores al guardar el perfil no afectan al bloque perfilado.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado desconocido: {mode}")
+    os.makedirs(os.path.dirname(out_base), exist_ok=True)
+    start = time.perf_counter()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            try:
+                profiler.dump_stats(out_base + ".prof")
+                with open(out_base + ".txt", "w", encoding="utf-8") as f:
+                    f.write(f"Duración: {time.perf_counter() - start:.2f}s\n\n")
+                    pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            except OSError as e:
+                print(f"No se pudo guardar el perfil {out_base}: {e}")
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            try:
+                with open(out_base + ".folded", "w", encoding="utf-8") as f:
+                    f.write(sampler.folded())
+                with open(out_base + ".txt", "w", encoding="utf-8") as f:
+                    f.write(f"Duración: {time.perf_counter() - start:.2f}s\n")
+                    f.write(sampler.summary())
+            except OSError as e:
+                print(f"No se pudo guardar el perfil {out_base}: {e}")
+
+def list_profiles(profiles_dir):
+    if not os.path.isdir(profiles_dir):
+        return []
+    entries = []
+    for name in sorted(os.listdir(profiles_dir)):
+        path = os.path.join(profiles_dir, name)
+        entries.append({"name": name, "size": os.path.getsize(path), "created": os.path.getmtime(path)})
+    return entries
@@ -0,0 +1,243 @@
+"""
+Índice invertido de los textos de los proyectos, para buscar en toda la biblioteca.
+
+Recorrer projects/ y leer cada status.json (varios MB por libro) en cada búsqueda
+cuesta más cuanto mayor es la biblioteca. El índice se guarda en un SQLite dentro de
+la carpeta de proyectos (SEARCH_INDEX_FILE) y se actualiza de forma incremental:
+BatchManager indexa cada proyecto al crearlo, actualiza el nombre al renombrarlo y lo
+quita al borrarlo; sync() solo añade los proyectos que aún no están (los creados antes
+del índice) y quita los que ya no existen.
+
+Tablas:
+- terms: término normalizado -> id y nº de chunks que lo contienen (df).
+- postings: (término, proyecto, chunk) con el nº de apariciones. Clave primaria por
+  término, así que una búsqueda solo lee las entradas de sus términos.
+- chunks: el texto de cada chunk, para localizar la frase y devolver su offset.
+
+search() cruza las listas empezando por el término más raro y localiza la frase en el
+texto de cada chunk candidato hasta reunir los resultados con la frase exacta; el coste
+depende de cuántos chunks contienen los términos buscados, no del tamaño de la
+biblioteca. Los términos se comparan sin mayúsculas ni tildes ("camion" encuentra
+"Camión"). Varios procesos (la app, el conversor por lotes y el servidor MCP) pueden
+usarlo a la vez: SQLite en modo WAL.
+"""
+import os
+import re
+import json
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+SEARCH_INDEX_FILE = "search_index.sqlite"
+SNIPPET_CHARS = 80
+WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY, project_id TEXT UNIQUE NOT NULL, name TEXT);
+CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL, df INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS chunks (project INTEGER, chunk_id INTEGER, text TEXT,
+                                   PRIMARY KEY (project, chunk_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (term INTEGER, project INTEGER, chunk_id INTEGER, count INTEGER,
+                                     PRIMARY KEY (term, project, chunk_id)) WITHOUT ROWID;
+"""
+
+class _FoldTable(dict):
+    # Tabla para str.translate que se rellena según aparecen caracteres. Un carácter de
+    # entrada -> un carácter de salida: los offsets del texto plegado son los del original
+    def __missing__(self, code):
+        folded = unicodedata.normalize("NFD", chr(code))[0].lower()[0]
+        self[code] = folded
+        return folded
+
+_FOLD = _FoldTable()
+
+def fold(text):
+    """Texto en minúsculas y sin tildes, con la misma longitud que el original."""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_FOLD)
+
+def tokenize(text):
+    return WORD_RE.findall(fold(text))
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Conexión perezosa: no se crea el fichero hasta el primer uso
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _remove(self, conn, project):
+        # postings no tiene índice por proyecto: sus términos se sacan de los textos del
+        # proyecto (coste proporcional al proyecto, no a la biblioteca) y se borra por
+        # la clave primaria (término, proyecto)
+        texts = conn.execute("SELECT text FROM chunks WHERE project = ?", (project,)).fetchall()
+        df = Counter(t for (text,) in texts for t in set(tokenize(text)))
+        for term, n in df.items():
+            row = conn.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+            if row:
+                conn.execute("UPDATE terms SET df = df - ? WHERE id = ?", (n, row[0]))
+                conn.execute("DELETE FROM postings WHERE term = ? AND project = ?", (row[0], project))
+        conn.execute("DELETE FROM chunks WHERE project = ?", (project,))
+
+    def index_project(self, project_id, name, chunks):
+        """(Re)indexa un proyecto. `chunks` es la lista de textos, en orden."""
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                # Primero la escritura: abre la transacción antes de mirar si ya estaba, así
+                # otro proceso que indexe el mismo proyecto a la vez no provoca un duplicado
+                conn.execute("INSERT OR IGNORE INTO projects (project_id, name) VALUES (?, ?)", (project_id, name))
+                project = conn.execute("SELECT id FROM projects WHERE project_id = ?", (project_id,)).fetchone()[0]
+                self._remove(conn, project) # Nada que quitar si es nuevo
+                conn.execute("UPDATE projects SET name = ? WHERE id = ?", (name, project))
+                counts = [Counter(tokenize(text)) for text in chunks]
+                vocabulary = set().union(*counts) if counts else set()
+                conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(t,) for t in vocabulary])
+                term_ids = {}
+                for term in vocabulary:
+                    term_ids[term] = conn.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()[0]
+                conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)",
+                                 [(project, i, text) for i, text in enumerate(chunks)])
+                conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)",
+                                 [(term_ids[t], project, i, n) for i, c in enumerate(counts) for t, n in c.items()])
+                df = Counter(t for c in counts for t in c)
+                conn.executemany("UPDATE terms SET df = df + ? WHERE id = ?", [(n, term_ids[t]) for t, n in df.items()])
+
+    def rename_project(self, project_id, name):
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE projects SET name = ? WHERE project_id = ?", (name, project_id))
+
+    def remove_project(self, project_id):
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT id FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+                if row:
+                    self._remove(conn, row[0])
+                    conn.execute("DELETE FROM projects WHERE id = ?", row)
+
+    def project_ids(self):
+        with self.lock:
+            return {r[0] for r in self._connect().execute("SELECT project_id FROM projects")}
+
+    def sync(self, projects_dir):
+        """
+        Añade los proyectos de projects_dir que no están en el índice y quita los que ya
+        no existen. Solo lee el status.json de los que faltan. Devuelve (añadidos, quitados).
+        """
+        indexed = self.project_ids()
+        present = {pid for pid in os.listdir(projects_dir)
+                   if os.path.exists(os.path.join(projects_dir, pid, "status.json"))}
+        added = 0
+        for project_id in sorted(present - indexed):
+            try:
+                with open(os.path.join(projects_dir, project_id, "status.json"), "r", encoding="utf-8") as f:
+                    status = json.load(f)
+                self.index_project(project_id, status.get("name", project_id),
+                                   [c.get("text", "") for c in status.get("chunks", [])])
+                added += 1
+            except (OSError, ValueError, sqlite3.Error) as e:
+                # Un proyecto que falla (p. ej. base de datos bloqueada) no corta el resto
+                print(f"Aviso: no se pudo indexar {project_id}: {e}")
+        for project_id in indexed - present:
+            self.remove_project(project_id)
+        return added, len(indexed - present)
+
+    def search(self, query, limit=20, project_id=None):
+        """
+        Chunks que contienen todas las palabras de `query`. Primero los que contienen la
+        frase exacta. Cada resultado: project_id, name, chunk_id, offset (carácter del
+        chunk donde empieza la frase, o la primera palabra), exact y snippet.
+        Se revisan los candidatos hasta encontrar `limit` con la frase exacta, aunque
+        sean muchos: una frase común sin apenas coincidencias exactas lee todos los
+        chunks que contienen sus palabras.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self.lock:
+            conn = self._connect()
+            placeholders = ",".join("?" * len(set(words)))
+            terms = conn.execute(f"SELECT id, term, df FROM terms WHERE term IN ({placeholders})",
+                                 list(set(words))).fetchall()
+            if len(terms) < len(set(words)) or any(df <= 0 for _, _, df in terms):
+                return [] # Alguna palabra no aparece en ningún chunk
+            terms.sort(key=lambda t: t[2]) # Del más raro al más común
+            sql = "SELECT p0.project, p0.chunk_id, c.text FROM postings p0"
+            args = []
+            for i, (term, _, _) in enumerate(terms[1:], 1):
+                sql += (f" JOIN postings p{i} ON p{i}.term = ? AND p{i}.project = p0.project"
+                        f" AND p{i}.chunk_id = p0.chunk_id")
+                args.append(term)
+            sql += " JOIN chunks c ON c.project = p0.project AND c.chunk_id = p0.chunk_id WHERE p0.term = ?"
+            args.append(terms[0][0])
+            if project_id is not None:
+                row = conn.execute("SELECT id FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+                if row is None:
+                    return []
+                sql += " AND p0.project = ?"
+                args.append(row[0])
+            # Orden de la clave primaria de postings: no hay que ordenar y el resultado es estable
+            sql += " ORDER BY p0.project, p0.chunk_id"
+            projects = {}
+            exact_results, other_results = [], []
+            # Sin LIMIT: un corte previo dejaba fuera las frases exactas de los últimos chunks
+            for project, chunk_id, text in conn.execute(sql, args):
+                offset, exact = locate(text, words)
+                if not exact and len(other_results) >= limit:
+                    continue # Ya hay bastantes sin la frase: solo se buscan exactas
+                if project not in projects:
+                    projects[project] = conn.execute("SELECT project_id, name FROM projects WHERE id = ?",
+                                                     (project,)).fetchone()
+                pid, name = projects[project]
+                (exact_results if exact else other_results).append({
+                    "project_id": pid, "name": name, "chunk_id": chunk_id, "offset": offset,
+                    "exact": exact, "snippet": snippet(text, offset)})
+                if len(exact_results) >= limit:
+                    break # Ya hay bastantes con la frase exacta
+        results = exact_results + other_results
+        results.sort(key=lambda r: (not r["exact"], r["project_id"], r["chunk_id"]))
+        return results[:limit]
+
+    def stats(self):
+        with self.lock:
+            conn = self._connect()
+            return {
+                "projects": conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0],
+                "chunks": conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+                "terms": conn.execute("SELECT COUNT(*) FROM terms WHERE df > 0").fetchone()[0],
+                "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            }
+
+def locate(text, words):
+    """Offset de la frase `words` (ya plegadas) en `text`, o de su primera palabra. (offset, exacta)."""
+    folded = fold(text)
+    phrase = re.search(r"\b" + r"\W+".join(map(re.escape, words)) + r"\b", folded)
+    if phrase:
+        return phrase.start(), True
+    first = re.search(r"\b" + re.escape(words[0]) + r"\b", folded)
+    return (first.start() if first else 0), False
+
+def snippet(text, offset, chars=SNIPPET_CHARS):
+    start = max(0, offset - chars // 2)
+    end = min(len(text), offset + chars)
+    return ("…" if start else "") + " ".join(text[start:end].split()) + ("…" if end < len(text) else "")
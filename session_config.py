@@ -0,0 +1,137 @@
+import os
+import hashlib
+import onnxruntime as rt
+import shared_weights
+
+try:
+    from kokoro_onnx.session import resolve_providers
+except ImportError: # Versiones antiguas de kokoro-onnx
+    def resolve_providers():
+        return ["CPUExecutionProvider"]
+
+# Configuración por defecto de la sesión de onnxruntime. None = valor por defecto de ORT.
+# Hilos y modo sin medir con kokoro-v1.0.onnx (ver benchmarks/README.md): no cambiarlos
+# sin el barrido de bench_onnx_threads.py con el modelo real.
+DEFAULT_SESSION_CONFIG = {
+    "graph_optimization_level": "all",  # disabled, basic, extended, all
+    "intra_op_num_threads": None,       # Hilos dentro de cada operador
+    "inter_op_num_threads": None,       # Hilos entre operadores (solo modo parallel)
+    "execution_mode": "sequential",     # sequential o parallel
+    "enable_cpu_mem_arena": True,       # Arena de memoria de CPU (más RSS, menos mallocs)
+    "enable_mem_pattern": True,         # Preplanificación de memoria por forma de entrada
+    "cache_optimized_model": True,      # Guardar el grafo optimizado junto al modelo
+    "shared_weights": False,            # Pesos mapeados y compartidos entre procesos (shared_weights.py)
+    "prepack_weights": True,            # Pre-empaquetado de pesos (copia privada por sesión)
+}
+
+OPTIMIZATION_LEVELS = {
+    "disabled": rt.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": rt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": rt.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": rt.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": rt.ExecutionMode.ORT_PARALLEL,
+}
+
+def resolve_config(config=None):
+    """Completa una configuración parcial con los valores por defecto."""
+    resolved = dict(DEFAULT_SESSION_CONFIG)
+    if config:
+        unknown = set(config) - set(DEFAULT_SESSION_CONFIG)
+        if unknown:
+            raise ValueError(f"Opciones de sesión desconocidas: {sorted(unknown)}")
+        resolved.update(config)
+    if resolved["graph_optimization_level"] not in OPTIMIZATION_LEVELS:
+        raise ValueError(f"Nivel de optimización no válido: {resolved['graph_optimization_level']}")
+    if resolved["execution_mode"] not in EXECUTION_MODES:
+        raise ValueError(f"Modo de ejecución no válido: {resolved['execution_mode']}")
+    return resolved
+
+def make_session_options(config):
+    """Traduce la configuración a un rt.SessionOptions."""
+    so = rt.SessionOptions()
+    so.graph_optimization_level = OPTIMIZATION_LEVELS[config["graph_optimization_level"]]
+    so.execution_mode = EXECUTION_MODES[config["execution_mode"]]
+    if config["intra_op_num_threads"]:
+        so.intra_op_num_threads = int(config["intra_op_num_threads"])
+    if config["inter_op_num_threads"]:
+        so.inter_op_num_threads = int(config["inter_op_num_threads"])
+    so.enable_cpu_mem_arena = bool(config["enable_cpu_mem_arena"])
+    so.enable_mem_pattern = bool(config["enable_mem_pattern"])
+    if not config["prepack_weights"]:
+        so.add_session_config_entry("session.disable_prepacking", "1")
+    return so
+
+def optimized_model_path(model_path, config, providers):
+    """
+    Ruta del grafo optimizado en caché, junto al modelo original. El nombre incluye
+    una huella del modelo (tamaño y mtime), del nivel de optimización, de los
+    proveedores y de la versión de onnxruntime: el grafo optimizado con "all" es
+    específico del hardware y de la versión, y cualquier cambio genera otro fichero.
+    """
+    st = os.stat(model_path)
+    key = "|".join([
+        str(st.st_size), str(st.st_mtime_ns),
+        config["graph_optimization_level"], ",".join(providers), rt.__version__
+    ])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    base, ext = os.path.splitext(model_path)
+    return f"{base}.opt-{digest}{ext}"
+
+def build_session(model_path, config=None):
+    """
+    Crea la rt.InferenceSession del modelo con la configuración indicada.
+    Si cache_optimized_model está activo, la primera carga serializa el grafo optimizado
+    junto al modelo y las siguientes lo cargan directamente sin volver a optimizar.
+    Con shared_weights los pesos se leen del fichero mapeado compartido entre procesos.
+    """
+    config = resolve_config(config)
+    providers = resolve_providers()
+    so = make_session_options(config)
+
+    use_cache = config["cache_optimized_model"] and config["graph_optimization_level"] != "disabled"
+    if config["shared_weights"]:
+        session = _build_shared_session(model_path, config, providers, use_cache)
+        if session is not None:
+            return session
+    if use_cache:
+        cache_path = optimized_model_path(model_path, config, providers)
+        if os.path.exists(cache_path):
+            try:
+                # El grafo ya está optimizado: no repetir el trabajo
+                so.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+                print(f"Usando grafo optimizado en caché: {cache_path}")
+                return rt.InferenceSession(cache_path, sess_options=so, providers=providers)
+            except Exception as e:
+                print(f"Grafo optimizado en caché inválido ({e}), regenerando...")
+                os.remove(cache_path)
+                so = make_session_options(config)
+        so.optimized_model_filepath = cache_path
+
+    return rt.InferenceSession(model_path, sess_options=so, providers=providers)
+
+def _build_shared_session(model_path, config, providers, use_cache):
+    """
+    Sesión con los pesos de shared_weights. Se parte del grafo ya optimizado (creándolo si
+    hace falta) y se carga sin optimizar: así ORT no genera a partir de los pesos
+    compartidos otros tensores transformados en memoria privada. None si no es posible.
+    """
+    source_path = model_path
+    so = make_session_options(config)
+    try:
+        if use_cache:
+            source_path = optimized_model_path(model_path, config, providers)
+            if not os.path.exists(source_path):
+                so.optimized_model_filepath = source_path
+                rt.InferenceSession(model_path, sess_options=so, providers=providers)
+                so = make_session_options(config)
+            so.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+        graph_path = shared_weights.add_shared_initializers(so, source_path)
+        print(f"Usando pesos compartidos: {graph_path}")
+        return rt.InferenceSession(graph_path, sess_options=so, providers=providers)
+    except Exception as e:
+        print(f"Aviso: no se pueden compartir los pesos ({e}), cargando el modelo normal")
+        return None
@@ -0,0 +1,106 @@
+"""
+Pesos del modelo compartidos entre sesiones y procesos.
+
+Cada rt.InferenceSession copia los pesos del .onnx (~310 MB en kokoro-v1.0) a memoria
+privada: con N workers del modo batch son N copias idénticas. Aquí los initializers
+grandes se vuelcan una vez a un fichero plano (<modelo>.shared-<huella>.weights, con
+offsets alineados a página) y un .onnx que los referencia como datos externos. Al crear
+la sesión el fichero se mapea con np.memmap y cada peso se entrega a ORT con
+SessionOptions.add_initializer como un OrtValue sin copia sobre esas páginas: todas las
+sesiones del proceso usan los mismos OrtValue y todos los procesos las mismas páginas
+de la caché del sistema operativo.
+
+La API de Python no expone el contenedor de pesos pre-empaquetados de ORT, así que el
+pre-empaquetado (prepack_weights) debe desactivarse para que el ahorro sea real: si no,
+cada sesión crea su propia copia reordenada de los pesos de MatMul/Conv. Eso cuesta
+algo de velocidad en esos operadores; bench_shared_memory.py mide las dos cosas.
+
+Necesita el paquete `onnx` para reescribir el grafo (opcional: sin él se avisa y la
+sesión se crea de la forma normal).
+"""
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import onnxruntime as rt
+
+try:
+    import onnx
+    from onnx import numpy_helper, external_data_helper
+except ImportError: # onnx es opcional
+    onnx = None
+
+MIN_SHARED_BYTES = 4096 # Menos de una página: se quedan dentro del grafo
+ALIGNMENT = 4096
+
+_SHARED = {} # Ruta de .weights -> (memmap, {nombre: OrtValue}); vivos mientras viva el proceso
+_SHARED_LOCK = threading.Lock()
+
+def available():
+    return onnx is not None
+
+def shared_model_paths(source_path):
+    """(grafo, pesos, índice) junto a `source_path`, con una huella de su tamaño y mtime."""
+    st = os.stat(source_path)
+    digest = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+    base, _ = os.path.splitext(source_path)
+    base = f"{base}.shared-{digest}"
+    return base + ".onnx", base + ".weights", base + ".json"
+
+def build_shared_model(source_path):
+    """Vuelca los initializers de `source_path` al fichero de pesos compartido. Devuelve las rutas."""
+    graph_path, weights_path, index_path = paths = shared_model_paths(source_path)
+    if all(os.path.exists(p) for p in paths):
+        return paths
+    if onnx is None:
+        raise RuntimeError("El paquete onnx no está instalado: no se pueden compartir los pesos")
+    print(f"Creando pesos compartidos: {weights_path}")
+    model = onnx.load(source_path)
+    index = {}
+    suffix = f".{os.getpid()}.tmp"
+    with open(weights_path + suffix, "wb") as f:
+        for tensor in model.graph.initializer:
+            array = numpy_helper.to_array(tensor)
+            if array.nbytes < MIN_SHARED_BYTES or array.dtype == object:
+                continue
+            offset = (f.tell() + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+            f.seek(offset)
+            f.write(np.ascontiguousarray(array).tobytes())
+            index[tensor.name] = [array.dtype.str, list(array.shape), offset]
+            # El grafo referencia el fichero de pesos: sigue siendo un .onnx válido por sí solo
+            tensor.CopyFrom(numpy_helper.from_array(array, tensor.name))
+            external_data_helper.set_external_data(tensor, os.path.basename(weights_path),
+                                                   offset=offset, length=array.nbytes)
+            tensor.ClearField("raw_data")
+            tensor.data_location = onnx.TensorProto.EXTERNAL
+    onnx.save(model, graph_path + suffix)
+    with open(index_path + suffix, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    # El índice el último: su presencia indica que los tres ficheros están completos
+    os.replace(weights_path + suffix, weights_path)
+    os.replace(graph_path + suffix, graph_path)
+    os.replace(index_path + suffix, index_path)
+    return paths
+
+def shared_initializers(weights_path, index_path):
+    """{nombre: OrtValue} sobre el fichero de pesos mapeado. Uno por proceso."""
+    with _SHARED_LOCK:
+        entry = _SHARED.get(weights_path)
+        if entry is None:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            buffer = np.memmap(weights_path, dtype=np.uint8, mode="r") if index else None
+            values = {}
+            for name, (dtype, shape, offset) in index.items():
+                array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+                values[name] = rt.OrtValue.ortvalue_from_numpy(array) # Sin copia
+            entry = _SHARED[weights_path] = (buffer, values)
+        return entry[1]
+
+def add_shared_initializers(so, source_path):
+    """Prepara `so` para usar los pesos compartidos de `source_path`. Devuelve la ruta del grafo a cargar."""
+    graph_path, weights_path, index_path = build_shared_model(source_path)
+    for name, value in shared_initializers(weights_path, index_path).items():
+        so.add_initializer(name, value)
+    return graph_path
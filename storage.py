@@ -0,0 +1,252 @@
+"""
+Gestión del espacio en disco de los proyectos.
+
+- CleanupQueue: borrados en segundo plano. La ruta se renombra a projects/.trash (un
+  rename, instantáneo) y un hilo la elimina después; la petición HTTP no espera al rmtree.
+  Lo que quede en .trash tras un cierre se borra al arrancar.
+- StorageManager: uso de disco por proyecto y cuota global. Al superarla se libera el
+  audio de los proyectos escuchados hace más tiempo (BatchManager.evict_audio): se borran
+  WAVs, exportaciones y segmentos, pero se conservan el texto, los capítulos y los
+  tiempos (chunk_N.json de audio_chunks), y los chunks quedan pendientes para regenerarse al volver a escucharlos.
+  Además compacta en segundo plano los proyectos terminados que llevan COMPACT_AFTER sin
+  escucharse: el audio final pasa de WAV a FLAC (sin pérdidas, en torno a la mitad).
+"""
+import os
+import time
+import queue
+import shutil
+import threading
+
+TRASH_DIR = ".trash"
+COMPACT_AFTER = 7 * 24 * 3600 # Segundos sin escuchar un proyecto terminado antes de compactarlo
+MIN_IDLE_TO_EVICT = 3600 # Nunca se libera el audio de un proyecto usado en la última hora
+MAINTENANCE_INTERVAL = 600
+# Ficheros y carpetas de audio regenerable dentro de un proyecto
+AUDIO_ENTRIES = ("audio_chunks", "final_output.wav", "final_output.flac", "hls")
+AUDIO_PREFIXES = ("audiobook.",)
+# Dentro de audio_chunks, los chunk_N.json son los tiempos del karaoke: no son audio
+TIMING_SUFFIX = ".json"
+
+def path_size(path):
+    """Bytes de un fichero o de una carpeta (recursivo). 0 si no existe."""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+    except OSError:
+        return 0
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+def is_audio_entry(name):
+    return name in AUDIO_ENTRIES or name.startswith(AUDIO_PREFIXES)
+
+def chunk_audio_paths(chunks_dir):
+    """Rutas de audio regenerable de audio_chunks (WAVs, sub-partes, temporales), sin los tiempos."""
+    try:
+        with os.scandir(chunks_dir) as entries:
+            return [entry.path for entry in entries if not entry.name.endswith(TIMING_SUFFIX)]
+    except OSError:
+        return []
+
+class CleanupQueue:
+    def __init__(self, trash_dir):
+        self.trash_dir = trash_dir
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self._thread = None
+        self.deleted = 0
+        self.deleted_bytes = 0
+        self.failed = 0
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def discard(self, path):
+        """
+        Saca `path` (fichero o carpeta) de su sitio al momento y lo encola para borrarlo.
+        Devuelve True si existía.
+        """
+        if not os.path.exists(path):
+            return False
+        os.makedirs(self.trash_dir, exist_ok=True)
+        target = os.path.join(self.trash_dir, f"{time.time_ns()}_{os.path.basename(path)}")
+        os.replace(path, target)
+        self.queue.put(target)
+        self._ensure_thread()
+        return True
+
+    def purge_leftovers(self):
+        """Encola lo que quedó en la papelera de una ejecución anterior."""
+        if not os.path.isdir(self.trash_dir):
+            return 0
+        names = os.listdir(self.trash_dir)
+        for name in names:
+            self.queue.put(os.path.join(self.trash_dir, name))
+        if names:
+            self._ensure_thread()
+        return len(names)
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                size = path_size(path)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                self.deleted += 1
+                self.deleted_bytes += size
+            except OSError as e:
+                print(f"Error borrando {path}: {e}")
+                self.failed += 1
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """Bloquea hasta vaciar la cola (para tests y para el cierre ordenado)."""
+        self.queue.join()
+
+    def stats(self):
+        return {"pending": self.queue.qsize(), "deleted": self.deleted,
+                "deleted_bytes": self.deleted_bytes, "failed": self.failed}
+
+class StorageManager:
+    def __init__(self, manager, quota_bytes=None, compact_after=COMPACT_AFTER,
+                 min_idle=MIN_IDLE_TO_EVICT, is_busy=None):
+        # quota_bytes=None: sin cuota (solo compactación). is_busy(project_id) indica si
+        # el proyecto tiene síntesis en curso o en cola (no se toca)
+        self.manager = manager
+        self.quota_bytes = quota_bytes
+        self.compact_after = compact_after
+        self.min_idle = min_idle
+        self.is_busy = is_busy or (lambda project_id: False)
+        self.evictions = 0
+        self.compactions = 0
+        self.bytes_freed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def project_usage(self, project_id):
+        project_path = os.path.join(self.manager.projects_dir, project_id)
+        audio = other = 0
+        try:
+            with os.scandir(project_path) as entries:
+                for entry in entries:
+                    size = path_size(entry.path)
+                    if entry.name == "audio_chunks":
+                        chunk_audio = sum(path_size(p) for p in chunk_audio_paths(entry.path))
+                        audio += chunk_audio
+                        other += size - chunk_audio
+                    elif is_audio_entry(entry.name):
+                        audio += size
+                    else:
+                        other += size
+        except OSError:
+            return None
+        final_path = self.manager.final_audio_path(project_id)
+        return {"project_id": project_id, "audio_bytes": audio, "total_bytes": audio + other,
+                "last_used": self.manager.last_used(project_id),
+                "final_format": os.path.splitext(final_path)[1][1:] if final_path else None}
+
+    def usage(self):
+        """Uso por proyecto (del más al menos reciente) y totales."""
+        projects = []
+        for project_id in os.listdir(self.manager.projects_dir):
+            if project_id == TRASH_DIR:
+                continue
+            if not os.path.exists(os.path.join(self.manager.projects_dir, project_id, "status.json")):
+                continue
+            usage = self.project_usage(project_id)
+            if usage is not None:
+                projects.append(usage)
+        projects.sort(key=lambda p: p["last_used"], reverse=True)
+        return {
+            "total_bytes": sum(p["total_bytes"] for p in projects),
+            "audio_bytes": sum(p["audio_bytes"] for p in projects),
+            "quota_bytes": self.quota_bytes,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+            "bytes_freed": self.bytes_freed,
+            "cleanup": self.manager.cleanup.stats(),
+            "projects": projects,
+        }
+
+    def _idle(self, project, now, min_idle):
+        return now - project["last_used"] >= min_idle and not self.is_busy(project["project_id"])
+
+    def compact_idle(self, now=None):
+        """Compacta el audio final de los proyectos terminados sin escuchar desde hace compact_after."""
+        now = now if now is not None else time.time()
+        compacted = []
+        for project in self.usage()["projects"]:
+            if project["final_format"] != "wav" or not self._idle(project, now, self.compact_after):
+                continue
+            saved = self.manager.compact_project(project["project_id"])
+            if saved:
+                self.compactions += 1
+                self.bytes_freed += saved
+                compacted.append(project["project_id"])
+        return compacted
+
+    def enforce_quota(self, now=None):
+        """Libera audio, del proyecto escuchado hace más tiempo al más reciente, hasta cumplir la cuota."""
+        if self.quota_bytes is None:
+            return []
+        now = now if now is not None else time.time()
+        usage = self.usage()
+        excess = usage["total_bytes"] - self.quota_bytes
+        evicted = []
+        for project in reversed(usage["projects"]): # Del menos reciente al más reciente
+            if excess <= 0:
+                break
+            if project["audio_bytes"] == 0 or not self._idle(project, now, self.min_idle):
+                continue
+            freed = self.manager.evict_audio(project["project_id"])
+            if freed:
+                excess -= freed
+                self.evictions += 1
+                self.bytes_freed += freed
+                evicted.append(project["project_id"])
+        if excess > 0:
+            print(f"Aviso: cuota de disco superada en {excess / 2**20:.0f} MB y no queda audio inactivo que liberar")
+        return evicted
+
+    def run_once(self, now=None):
+        # Primero compactar: puede bastar para cumplir la cuota sin perder audio
+        compacted = self.compact_idle(now)
+        evicted = self.enforce_quota(now)
+        return {"compacted": compacted, "evicted": evicted}
+
+    def start(self, interval=MAINTENANCE_INTERVAL):
+        """Mantenimiento periódico en segundo plano."""
+        self.manager.cleanup.purge_leftovers()
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Error en el mantenimiento de almacenamiento: {e}")
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,46 @@
+"""
+BatchManager sin Kokoro para los tests.
+
+Uso:
+    manager = StubBatchManager(TEMP_DIR, samples=lambda sub_text: np.zeros(240, dtype=np.float32))
+    try:
+        ...
+    finally:
+        manager.shutdown()
+"""
+import atexit
+import numpy as np
+
+from manager import BatchManager
+
+def silence(sub_text):
+    """240 muestras de silencio por sub-parte."""
+    return np.zeros(240, dtype=np.float32)
+
+class StubBatchManager(BatchManager):
+    """
+    Manager sin modelo: cada sub-parte produce samples(sub_text) a 24 kHz. Con
+    split=False el chunk entero es una sola sub-parte. Las sub-partes que contienen una
+    marca de `poison` fallan con `error`; check_sub_part es el punto de enganche para
+    otros fallos. El cierre no se registra en atexit: cada test llama a shutdown().
+    """
+    def __init__(self, projects_dir, samples=silence, split=True):
+        self.projects_dir = projects_dir
+        self._init_state()
+        atexit.unregister(self.shutdown)
+        self.samples = samples
+        self.split = split
+        self.poison = set()
+        self.error = RuntimeError
+        self.calls = [] # Sub-partes pedidas, en orden
+
+    def check_sub_part(self, sub_text):
+        """Lanza si la sub-parte debe fallar."""
+        if any(mark in sub_text for mark in self.poison):
+            raise self.error("fallo simulado")
+
+    def _synthesize_sub_chunks(self, text, voice_spec, speed, lang, debug_id="", variant=None):
+        for sub_text in self._split_sub_chunks(text) if self.split else [text]:
+            self.calls.append(sub_text)
+            self.check_sub_part(sub_text)
+            yield sub_text, self.samples(sub_text), 24000
@@ -0,0 +1,129 @@
+"""
+Ejecución asíncrona de la síntesis de chunks para el servidor web.
+
+Los endpoints no llaman a process_chunk en el hilo de la petición: encolan un trabajo en
+un ejecutor dedicado y devuelven su id al momento; el cliente consulta /api/jobs/<id>.
+Así un chunk largo no retiene un hilo del servidor y /api/projects responde siempre.
+La cola es acotada (max_queue): si se llena, submit lanza QueueFull y el endpoint
+responde 503 para que el cliente reintente más tarde.
+"""
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED_JOBS_KEPT = 1000 # Trabajos terminados que se pueden seguir consultando
+
+class QueueFull(Exception):
+    pass
+
+class SynthesisJobs:
+    def __init__(self, manager, max_workers=1, max_queue=64):
+        # Un único worker por defecto: BatchManager serializa la inferencia con su lock,
+        # más workers solo esperarían en él (sirven si la síntesis deja de estar serializada)
+        self.manager = manager
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="synthesis")
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict() # job_id -> trabajo
+        self.active = {} # (project_id, chunk_id) -> job_id de trabajos en cola o en curso
+        self.futures = {}
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, project_id, chunk_id, profile=None):
+        """
+        Encola la síntesis de un chunk. Si ya está en cola o en curso devuelve ese trabajo.
+        `profile` perfila solo este trabajo (ver BatchManager.process_chunk).
+        """
+        key = (project_id, chunk_id)
+        with self.lock:
+            job_id = self.active.get(key)
+            if job_id is not None:
+                return dict(self.jobs[job_id])
+            if self._queued() >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"Cola de síntesis llena ({self.max_queue} trabajos en espera)")
+            job_id = uuid.uuid4().hex[:12]
+            job = {"id": job_id, "project_id": project_id, "chunk_id": chunk_id, "status": "queued",
+                   "submitted_at": time.time(), "started_at": None, "finished_at": None, "error": None,
+                   "profile": profile}
+            self.jobs[job_id] = job
+            self.active[key] = job_id
+            self.futures[job_id] = self.executor.submit(self._run, job_id)
+            return dict(job)
+
+    def _run(self, job_id):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+        try:
+            if job["profile"]:
+                self.manager.process_chunk(job["project_id"], job["chunk_id"], profile=job["profile"])
+            else:
+                self.manager.process_chunk(job["project_id"], job["chunk_id"])
+            status, error = "done", None
+        except Exception as e:
+            status, error = "error", str(e)
+        with self.lock:
+            job.update(status=status, error=error, finished_at=time.time())
+            self.active.pop((job["project_id"], job["chunk_id"]), None)
+            self.futures.pop(job_id, None)
+            if status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._prune()
+
+    def _queued(self):
+        return sum(1 for job_id in self.active.values() if self.jobs[job_id]["status"] == "queued")
+
+    def _prune(self):
+        finished = [jid for jid, j in self.jobs.items() if j["status"] in ("done", "error")]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if job["status"] == "queued":
+                # Posición en la cola (0 = el siguiente en ejecutarse)
+                queued = [jid for jid in self.active.values() if self.jobs[jid]["status"] == "queued"]
+                job["queue_position"] = sorted(queued, key=lambda jid: self.jobs[jid]["submitted_at"]).index(job_id)
+            return job
+
+    def has_project(self, project_id):
+        """Si el proyecto tiene algún trabajo en cola o en curso."""
+        with self.lock:
+            return any(pid == project_id for pid, _ in self.active)
+
+    def wait(self, job_id, timeout=None):
+        """Bloquea hasta que el trabajo termine (para scripts y tests). Devuelve el trabajo."""
+        with self.lock:
+            future = self.futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            running = sum(1 for jid in self.active.values() if self.jobs[jid]["status"] == "running")
+            return {
+                "max_workers": self.max_workers,
+                "running": running,
+                "queued": self._queued(),
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
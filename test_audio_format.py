@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from audio_format import Resampler, convert, output_frames, parse_output_format, to_int16
+
+TEMP_DIR = "test_audio_format_temp"
+
+def tone(sub_text):
+    """Tono de 1 kHz a 24 kHz, 100 muestras por carácter, con pico 0.25."""
+    t = np.arange(len(sub_text) * 100) / 24000
+    return (0.25 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+
+def test_resampler_is_streaming_and_accurate():
+    t = np.arange(24000 * 2) / 24000
+    tone = (0.5 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+    resampler = Resampler(24000, 16000)
+    whole = np.concatenate([resampler.process(tone), resampler.flush()])
+    assert len(whole) == output_frames(len(tone), 24000, 16000) == 32000
+    expected = 0.5 * np.sin(2 * np.pi * 1000 * np.arange(len(whole)) / 16000)
+    assert np.abs(whole[500:-500] - expected[500:-500]).max() < 1e-3 # Sin desfase ni distorsión
+
+    # Por bloques de cualquier tamaño: mismo resultado
+    resampler = Resampler(24000, 16000)
+    blocks = [resampler.process(b) for b in np.array_split(tone, 17)] + [resampler.flush()]
+    assert np.array_equal(np.concatenate(blocks), whole)
+
+    # Un tono por encima de la nueva Nyquist no se pliega sobre la banda audible
+    alias = (0.5 * np.sin(2 * np.pi * 10000 * t)).astype(np.float32)
+    folded, _ = convert(alias, 24000, {"samplerate": 16000, "dither": False})
+    assert np.abs(folded[500:-500]).max() < 100
+
+    # El dither deja el silencio en ±1 LSB, sin sesgo
+    quiet = to_int16(np.zeros(100000, dtype=np.float32))
+    assert set(np.unique(quiet)) <= {-1, 0, 1} and abs(quiet.mean()) < 0.01
+    assert not to_int16(np.zeros(10, dtype=np.float32), dither=False).any()
+
+def test_project_output_format():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    manager = StubBatchManager(TEMP_DIR, samples=tone)
+    try:
+        assert parse_output_format("original") is None
+        for bad in ("mp3", {"samplerate": 12345}, {"normalize_db": 3}, {"bits": 8}):
+            try:
+                manager.create_project("Malo", ["Hola."], "em_alex", 1.0, "es", output_format=bad)
+                assert False, bad
+            except ValueError:
+                pass
+        assert not os.path.exists(TEMP_DIR) or os.listdir(TEMP_DIR) == []
+
+        chunks = ["Primera frase del libro. " * 12, "Segunda parte, algo más larga. " * 15]
+        project_id = manager.create_project("Voz", chunks, "em_alex", 1.0, "es", output_format="voz")
+        manager.process_chunk(project_id, 0)
+
+        # El chunk ya se guarda a 16 kHz int16 y el Karaoke cuenta en segundos de la salida
+        chunk_path = os.path.join(TEMP_DIR, project_id, "audio_chunks", "chunk_0.wav")
+        info = sf.info(chunk_path)
+        assert info.samplerate == 16000 and info.subtype == "PCM_16"
+        with open(chunk_path.replace(".wav", ".json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        assert abs(sum(m["duration"] for m in metadata) - info.frames / 16000) < 1e-9
+        expected_seconds = sum(len(m["text"]) * 100 for m in metadata) / 24000
+        assert abs(info.duration - expected_seconds) < 0.01
+
+        manager.process_chunk(project_id, 1)
+        final_path = os.path.join(TEMP_DIR, project_id, "final_output.wav")
+        final, sr = sf.read(final_path)
+        assert sr == 16000
+        # Normalización a -1 dBFS con un único factor para todo el libro
+        assert abs(20 * np.log10(np.abs(final).max()) + 1.0) < 0.05
+        with open(os.path.join(TEMP_DIR, project_id, "hls_segments.json"), "r", encoding="utf-8") as f:
+            assert sum(s[3] for s in json.load(f)) == len(final)
+
+        # Sin formato: igual que siempre (24 kHz, sin normalizar)
+        plain_id = manager.create_project("Original", chunks[:1] + ["Fin."], "em_alex", 1.0, "es")
+        manager.process_chunk(plain_id, 0)
+        manager.process_chunk(plain_id, 1)
+        plain, sr = sf.read(os.path.join(TEMP_DIR, plain_id, "final_output.wav"))
+        assert sr == 24000 and abs(np.abs(plain).max() - 0.25) < 1e-3
+        print("\n✅ EXITO: Remuestreo, dither y normalización por proyecto.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_resampler_is_streaming_and_accurate()
+    test_project_output_format()
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import shutil
+import threading
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from processor import TextProcessor
+
+TEMP_DIR = "test_export_temp"
+
+def constant(sub_text):
+    """Cada sub-parte dura 100 muestras por carácter."""
+    return np.full(len(sub_text) * 100, 0.1, dtype=np.float32)
+
+def test_chapters_at_sub_part_boundaries():
+    intro = "Harry Haller paseaba de noche por la ciudad dormida, pensando en Hermine. " * 6
+    text = (intro + "\n\nCapítulo 1\n\n" + intro + "\n\nCapítulo 1\n\n" + intro +
+            "\n\nCAPÍTULO II. El teatro mágico\n\n" + intro)
+    manager = StubBatchManager(TEMP_DIR, samples=constant)
+    try:
+        chunks = TextProcessor.split_into_chunks(text, target_len=1500, chapter_breaks=True)
+        chapters = TextProcessor.detect_chapters(chunks)
+        # La cabecera repetida cuenta una vez y cada capítulo abre un chunk
+        assert [c["title"] for c in chapters] == ["Capítulo 1", "CAPÍTULO II. El teatro mágico"]
+        assert all(c["offset"] == 0 for c in chapters)
+
+        project_id = manager.create_project("Lobo", chunks, "em_alex", 1.0, "es", chapters=chapters)
+        for i in range(len(chunks)):
+            manager.process_chunk(project_id, i)
+        project_path = os.path.join(TEMP_DIR, project_id)
+        with open(os.path.join(project_path, "chapters.json"), encoding="utf-8") as f:
+            marks = json.load(f)
+
+        # Inicio implícito + dos capítulos, situados en el primer frame de su chunk
+        assert [m["title"] for m in marks] == ["Lobo", "Capítulo 1", "CAPÍTULO II. El teatro mágico"]
+        expected = []
+        frame = 0
+        for i, chunk in enumerate(chunks):
+            if i in (chapters[0]["chunk_id"], chapters[1]["chunk_id"]):
+                expected.append(frame)
+            frame += sum(len(s) * 100 for s in manager._split_sub_chunks(chunk))
+        assert [m["start"] for m in marks[1:]] == expected
+        assert sf.info(os.path.join(project_path, "final_output.wav")).frames == frame
+
+        # Ogg/Opus sin ffmpeg: audio por bloques y capítulos en el fichero OGM adjunto
+        out_path = manager.export_project(project_id, "ogg") if shutil.which("ffmpeg") else None
+        if out_path is None:
+            from audiobook_export import export_audiobook
+            out_path = export_audiobook(os.path.join(project_path, "final_output.wav"),
+                                        os.path.join(project_path, "audiobook.ogg"), marks, "Lobo",
+                                        fmt="ogg", ffmpeg=None)
+            with open(os.path.join(project_path, "audiobook.ogg.chapters.txt"), encoding="utf-8") as f:
+                assert "CHAPTER03NAME=CAPÍTULO II. El teatro mágico" in f.read()
+
+            # Dos exportaciones a la vez en el mismo proceso (hilos de Flask): ninguna pisa a la otra
+            errors = []
+            def export():
+                try:
+                    export_audiobook(os.path.join(project_path, "final_output.wav"), out_path, marks, "Lobo",
+                                     fmt="ogg", ffmpeg=None)
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=export) for _ in range(2)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert not errors and not [n for n in os.listdir(project_path) if n.endswith(".tmp")]
+        info = sf.info(out_path)
+        assert info.format == "OGG" and abs(info.frames - frame) < 24000
+        print("\n✅ EXITO: Capítulos detectados y exportados en los límites de sub-parte.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_chapter_detection():
+    # Sin índice: solo párrafos propios con número o con forma de título
+    chunks = ["Prólogo\n\nEra una tarde de invierno.\nLa mayor\nparte.\nDe la ciudad dormía.",
+              "Así terminó.\nCAPÍTULO II\nÉrase una vez.\nprólogo introductor; a mí me es en todo\ncaso una necesidad.",
+              "Fin del segundo.\n\nParte tercera\n\nOtra historia.\nEl libro de Hesse traducido\nal español."]
+    chapters = TextProcessor.detect_chapters(chunks)
+    assert [(c["title"], c["chunk_id"]) for c in chapters] == [("Prólogo", 0), ("CAPÍTULO II", 1), ("Parte tercera", 2)]
+
+    # "Parte", "Libro"... sin número son frases, no capítulos; con el índice, sus títulos sí
+    text = ("Harry volvió tarde.\n\nParte de mí quería irse\n\nLa ciudad dormía.\n\n"
+            "Libro del desierto\n\nArena y más arena.")
+    chunks = TextProcessor.split_into_chunks(text, target_len=1000, chapter_breaks=True)
+    assert len(chunks) == 1 and TextProcessor.detect_chapters(chunks) == []
+    headings = ["Libro del desierto"]
+    chunks = TextProcessor.split_into_chunks(text, target_len=1000, chapter_breaks=True, headings=headings)
+    assert chunks[1].startswith("Libro del desierto")
+    assert [(c["title"], c["chunk_id"]) for c in TextProcessor.detect_chapters(chunks, headings)] == [
+        ("Libro del desierto", 1)]
+
+    # Con el índice del documento: sus títulos en orden, aunque no empiecen por "Capítulo",
+    # también tras un punto (frases unidas por split_into_chunks) y por su ancla si no están
+    chunks = ["Cubierta rota. Introducción\nContiene este libro. Anotaciones de Harry\nHaller\nSOLO PARA LOCOS",
+              "Y así acabó. FIN\nHERMANN HESSE, novelista y poeta alemán."]
+    headings = ["Cubierta", "Introducción", "Anotaciones de Harry Haller",
+                {"title": "Sobre el autor", "anchor": "HERMANN HESSE, novelista y"}]
+    chapters = TextProcessor.detect_chapters(chunks, headings)
+    assert [(c["title"], c["chunk_id"], c["offset"]) for c in chapters] == [
+        ("Introducción", 0, chunks[0].index("Introducción")),
+        ("Anotaciones de Harry Haller", 0, chunks[0].index("Anotaciones")),
+        ("Sobre el autor", 1, chunks[1].index("HERMANN"))]
+
+    pdf = "Hesse_Hermann - El lobo estepario.pdf"
+    if os.path.exists(pdf):
+        text = TextProcessor.extract_text(pdf)
+        chunks = TextProcessor.split_into_chunks(text, target_len=2500, first_chunk_len=4000, chapter_breaks=True)
+        titles = [c["title"] for c in TextProcessor.detect_chapters(chunks, TextProcessor.extract_headings(pdf))]
+        assert titles == ["El lobo estepario", "Introducción", "Anotaciones de Harry Haller",
+                          "Tractat del Lobo Estepario", "Siguen las anotaciones de Harry Haller", "Sobre el autor"]
+    print("\n✅ EXITO: Capítulos por índice del documento y por forma del encabezado.")
+
+if __name__ == "__main__":
+    test_chapters_at_sub_part_boundaries()
+    test_chapter_detection()
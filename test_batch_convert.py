@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import shutil
+import threading
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "Texto_a_voz_batch"))
+import batch_convert
+from manager import BatchManager
+from stub_manager import StubBatchManager
+
+TEMP_DIR = "test_batch_temp"
+
+def short_tone(sub_text):
+    return np.full(2400, 0.1, dtype=np.float32)
+
+def stub_init_worker(projects_dir):
+    """Sin modelo: cada sub-parte produce un tono corto. Falla si el texto contiene FALLO."""
+    batch_convert._worker = StubBatchManager(projects_dir, samples=short_tone)
+    batch_convert._worker.poison = {"FALLO"}
+
+def run(inputs, projects_dir, output_dir, summary_path):
+    argv = inputs + ["--projects-dir", projects_dir, "--output", output_dir, "--workers", "2",
+                     "--chunk-len", "200", "--summary", summary_path]
+    return batch_convert.main(argv, init_worker=stub_init_worker, init_args=(projects_dir,))
+
+def test_batch_convert_and_resume():
+    books_dir = os.path.join(TEMP_DIR, "libros")
+    projects_dir = os.path.join(TEMP_DIR, "projects")
+    output_dir = os.path.join(TEMP_DIR, "salida")
+    summary_path = os.path.join(TEMP_DIR, "resumen.json")
+    os.makedirs(books_dir, exist_ok=True)
+    sentence = "Harry Haller paseaba de noche por la ciudad dormida. "
+    try:
+        with open(os.path.join(books_dir, "uno.txt"), "w", encoding="utf-8") as f:
+            f.write(sentence * 30)
+        with open(os.path.join(books_dir, "dos.txt"), "w", encoding="utf-8") as f:
+            f.write(sentence * 10 + "FALLO. " + sentence * 10)
+
+        # Primera ejecución: un libro termina y el otro queda con un chunk fallido
+        assert run([books_dir], projects_dir, output_dir, summary_path) == 1
+        with open(summary_path, encoding="utf-8") as f:
+            summary = json.load(f)
+        assert summary["chunks_failed"] == 1
+        assert os.path.exists(os.path.join(output_dir, "uno.wav"))
+        assert not os.path.exists(os.path.join(output_dir, "dos.wav"))
+        data, sr = sf.read(os.path.join(output_dir, "uno.wav"))
+        assert sr == 24000 and len(data) > 0
+
+        # Segunda ejecución: el libro se reconoce por hash y solo se reintenta el chunk fallido
+        assert run([books_dir], projects_dir, output_dir, summary_path) == 1
+        with open(summary_path, encoding="utf-8") as f:
+            summary = json.load(f)
+        assert summary["chunks_done"] == 0 and summary["chunks_failed"] == 1
+        projects = [p for p in os.listdir(projects_dir) if os.path.isdir(os.path.join(projects_dir, p))]
+        assert len(projects) == 2, "No debe crearse un proyecto nuevo al reanudar"
+        print("\n✅ EXITO: El lote convierte, informa de fallos y reanuda por hash.")
+    finally:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_resume_assembles_crashed_project():
+    books_dir = os.path.join(TEMP_DIR, "libros")
+    projects_dir = os.path.join(TEMP_DIR, "projects")
+    output_dir = os.path.join(TEMP_DIR, "salida")
+    summary_path = os.path.join(TEMP_DIR, "resumen.json")
+    os.makedirs(books_dir, exist_ok=True)
+    original = BatchManager._finish_project
+    try:
+        with open(os.path.join(books_dir, "tres.txt"), "w", encoding="utf-8") as f:
+            f.write("Hermine bailaba en el teatro mágico. " * 20)
+
+        # Primera ejecución: todos los chunks terminan pero el proceso muere antes de ensamblar
+        BatchManager._finish_project = lambda self, project_id: None
+        run([books_dir], projects_dir, output_dir, summary_path)
+        BatchManager._finish_project = original
+        reader = BatchManager(projects_dir, None, None, load_model=False)
+        project = reader.get_projects()[0]
+        reader.shutdown()
+        assert not project["is_finished"] and project["completed_chunks"] == project["total_chunks"]
+        assert not os.path.exists(os.path.join(output_dir, "tres.wav"))
+
+        # Al reanudar no hay nada pendiente, pero el libro se ensambla y se exporta
+        assert run([books_dir], projects_dir, output_dir, summary_path) == 0
+        with open(summary_path, encoding="utf-8") as f:
+            book = json.load(f)["books"][0]
+        assert book["finished"] and book["done"] == 0
+        data, sr = sf.read(os.path.join(output_dir, "tres.wav"))
+        assert sr == 24000 and len(data) == 2400 * project["total_chunks"]
+        print("\n✅ EXITO: Un libro caído durante el ensamblado se ensambla al reanudar.")
+    finally:
+        BatchManager._finish_project = original
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_variant_and_background_assembly():
+    books_dir = os.path.join(TEMP_DIR, "libros")
+    projects_dir = os.path.join(TEMP_DIR, "projects")
+    output_dir = os.path.join(TEMP_DIR, "salida")
+    summary_path = os.path.join(TEMP_DIR, "resumen.json")
+    os.makedirs(books_dir, exist_ok=True)
+    original = BatchManager._finish_project
+    assembled_in = []
+    def finish_project(self, project_id):
+        assembled_in.append(threading.current_thread())
+        return original(self, project_id)
+    try:
+        # Cada proceso carga solo la variante pedida, como la por defecto
+        options = batch_convert.parse_args(["x", "--variant", "int8", "--model", os.path.join("m", "kokoro.onnx")])
+        args = batch_convert.worker_args(options, {})
+        assert args[1] == os.path.join("m", "kokoro.int8.onnx") and args[5] == "int8"
+
+        # Y sin los servicios de la app
+        lean = BatchManager(projects_dir, None, None, load_model=False, render_only=True)
+        assert lean.search_index is None and lean.cleanup is None and lean._position_thread is None
+        lean.shutdown()
+
+        with open(os.path.join(books_dir, "cuatro.txt"), "w", encoding="utf-8") as f:
+            f.write("Pablo tocaba el saxofón hasta el amanecer. " * 20)
+        BatchManager._finish_project = finish_project
+        assert run([books_dir, "--variant", "int8"], projects_dir, output_dir, summary_path) == 0
+        reader = BatchManager(projects_dir, None, None, load_model=False)
+        project = reader.get_projects()[0]
+        reader.shutdown()
+        assert project["model_variant"] == "int8" and project["is_finished"]
+        # El ensamblado no bloquea el hilo que reparte los chunks
+        assert assembled_in and threading.main_thread() not in assembled_in
+        assert os.path.exists(os.path.join(output_dir, "cuatro.wav"))
+        print("\n✅ EXITO: Los procesos cargan solo la variante del lote y el ensamblado va aparte.")
+    finally:
+        BatchManager._finish_project = original
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_batch_convert_and_resume()
+    test_resume_assembles_crashed_project()
+    test_variant_and_background_assembly()
@@ -0,0 +1,71 @@
+import os
+import json
+import sys
+import shutil
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from chunk_table import ChunkTable, PENDING, COMPLETED, ERROR
+
+PROJECTS_DIR = "test_chunk_table_temp"
+
+def test_chunk_table_counters():
+    table = ChunkTable(bytearray(5))
+    assert table.next_pending() == 0
+    table.set(0, COMPLETED)
+    table.set(1, ERROR)
+    table.set(2, COMPLETED)
+    assert (table.completed, table.errors) == (2, 1)
+    assert table.next_pending() == 3
+    # Volver a pendiente por detrás del cursor lo hace retroceder
+    table.set(1, PENDING)
+    assert table.errors == 0
+    assert table.next_pending() == 1
+    assert not table.set(0, COMPLETED)  # Sin cambio, sin doble conteo
+    assert table.completed == 2
+
+def test_process_chunks_with_table():
+    if os.path.exists(PROJECTS_DIR):
+        shutil.rmtree(PROJECTS_DIR)
+    manager = StubBatchManager(PROJECTS_DIR)
+    try:
+        project_id = manager.create_project("Libro", [f"Texto {i}" for i in range(6)], "af_nicole", 1.0, "en-us")
+        manager.poison = {"Texto 3"}
+
+        assert manager.process_next_chunk(project_id) == 0
+        manager.process_chunk(project_id, 4)
+        try:
+            manager.process_chunk(project_id, 3)
+            assert False, "El chunk 3 debería fallar"
+        except RuntimeError:
+            pass
+
+        project = manager.get_project(project_id)
+        assert project["completed_chunks"] == 2
+        assert [c["status"] for c in project["chunks"]] == ["completed", "pending", "pending", "error", "completed", "pending"]
+
+        # La tabla sobrevive a un reinicio del manager
+        fresh = StubBatchManager(PROJECTS_DIR)
+        assert fresh.get_project(project_id)["completed_chunks"] == 2
+
+        # Completar el resto (reintentando el erróneo) ensambla el audio final
+        manager.poison = set()
+        for cid in (1, 2, 5, 3):
+            manager.process_chunk(project_id, cid)
+        project = manager.get_project(project_id)
+        assert project["is_finished"] and project["is_optimized"]
+        assert os.path.exists(os.path.join(PROJECTS_DIR, project_id, "final_output.wav"))
+
+        # status.json queda sincronizado con la tabla al cerrar el proyecto
+        with open(os.path.join(PROJECTS_DIR, project_id, "status.json"), "r", encoding="utf-8") as f:
+            on_disk = json.load(f)
+        assert on_disk["completed_chunks"] == 6
+        print("\n✅ EXITO: Estado de chunks indexado y contadores incrementales correctos.")
+    finally:
+        manager.shutdown()
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+if __name__ == "__main__":
+    test_chunk_table_counters()
+    test_process_chunks_with_table()
@@ -0,0 +1,45 @@
+import io
+import os
+import sys
+import shutil
+
+sys.path.append(os.getcwd())
+from extract_cache import ExtractCache, hash_stream, chunks_key
+
+TEMP_DIR = "test_extract_cache_temp"
+
+def test_lru_eviction_persistence_and_stats():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    try:
+        stream = io.BytesIO(b"%PDF-1.4 el lobo estepario" * 1000)
+        digest = hash_stream(stream)
+        assert stream.tell() == 0 and len(digest) == 64
+
+        cache = ExtractCache(TEMP_DIR, max_bytes=2500)
+        text = "Harry Haller " * 60 # ~800 bytes por entrada
+        assert cache.get(f"text:{digest}") is None
+        cache.put(f"text:{digest}", text, source_bytes=26000, compute_seconds=1.5)
+        cache.put("text:b", text)
+        assert cache.get(f"text:{digest}") == text # La entrada del PDF pasa a ser la más reciente
+        cache.put("text:c", text) # Supera el límite: sale "b", la usada hace más tiempo
+        assert cache.get("text:b") is None
+        assert cache.get("text:c") == text
+
+        stats = cache.stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+        assert stats["hits"] == 2 and stats["misses"] == 2 and stats["hit_rate"] == 0.5
+        assert stats["bytes_saved"] == 26000 and stats["size_bytes"] <= 2500
+
+        # Tras reiniciar se conservan las entradas y el orden de uso
+        reloaded = ExtractCache(TEMP_DIR, max_bytes=2500)
+        assert reloaded.get(f"text:{digest}") == text
+
+        # Las claves de segmentación dependen de los parámetros
+        assert chunks_key(text, target_len=2500) != chunks_key(text, target_len=4000)
+        assert chunks_key(text, a=1, b=2) == chunks_key(text, b=2, a=1)
+        print("\n✅ EXITO: Caché de extracción con LRU, persistencia y estadísticas.")
+    finally:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_lru_eviction_persistence_and_stats()
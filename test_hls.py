@@ -0,0 +1,91 @@
+import os
+import sys
+import shutil
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from hls import media_playlist, id3_timestamp, TIMESTAMP_OWNER
+
+TEMP_DIR = "test_hls_temp"
+
+def sentences(tag, n):
+    return " ".join(f"Frase {i} del bloque {tag}, con texto suficiente para ocupar buena parte de una sub-parte." for i in range(n))
+
+def wave(sub_text):
+    """Tono de 20 muestras por carácter."""
+    t = np.arange(len(sub_text) * 20)
+    return (0.2 * np.sin(t / 7)).astype(np.float32)
+
+def keys(segments):
+    return [(s["chunk_id"], s["sub_part"], s["offset"], s["frames"]) for s in segments]
+
+def test_live_playlist_grows_and_matches_final_audio():
+    manager = StubBatchManager(TEMP_DIR, samples=wave)
+    manager.sub_part_retries = 0
+    try:
+        chunks = [sentences("A", 5), sentences("B", 4) + " Cierre Xqzzy del bloque.", "Fin del libro."]
+        project_id = manager.create_project("HLS", chunks, "em_alex", 1.0, "es")
+
+        playlist = manager.hls_segments(project_id)
+        assert playlist["segments"] == [] and not playlist["finished"] and playlist["next_chunk"] == 0
+
+        manager.process_chunk(project_id, 0)
+        playlist = manager.hls_segments(project_id)
+        first = len(playlist["segments"])
+        assert first >= 2 and {s["chunk_id"] for s in playlist["segments"]} == {0}
+        assert playlist["next_chunk"] == 1
+
+        # El chunk 1 falla en su última sub-parte: las anteriores ya se pueden escuchar
+        manager.poison = {"Xqzzy"}
+        try:
+            manager.process_chunk(project_id, 1)
+        except RuntimeError:
+            pass
+        playlist = manager.hls_segments(project_id)
+        partial = [s for s in playlist["segments"] if s["chunk_id"] == 1]
+        assert partial and playlist["segments"][first]["offset"] == sum(s["frames"] for s in playlist["segments"][:first])
+
+        # Segmento de una sub-parte en curso: etiqueta ID3 con la marca de tiempo y MP3 decodificable
+        seg_path = manager.hls_segment_file(project_id, first)
+        with open(seg_path, "rb") as f:
+            data = f.read()
+        assert data.startswith(b"ID3") and TIMESTAMP_OWNER in data
+        assert data.startswith(id3_timestamp(partial[0]["offset"], 24000))
+        samples, sr = sf.read(seg_path)
+        assert sr == 24000 and abs(len(samples) - partial[0]["frames"]) < 2000
+        assert manager.hls_segment_file(project_id, 999) is None
+
+        text = media_playlist(playlist["segments"], 24000, playlist["finished"], lambda i: f"seg_{i}.mp3")
+        assert "#EXT-X-PLAYLIST-TYPE:EVENT" in text and "#EXT-X-ENDLIST" not in text
+        assert text.count("#EXTINF:") == len(playlist["segments"])
+
+        manager.poison = set()
+        manager.process_chunk(project_id, 1)
+        playlist = manager.hls_segments(project_id)
+        live = keys(playlist["segments"])
+        assert keys(partial) == live[first:first + len(partial)] # Los índices no cambian al terminar el chunk
+
+        # El último chunk completa y optimiza el proyecto: los segmentos pasan al audio final
+        manager.process_chunk(project_id, 2)
+        assert not os.path.exists(os.path.join(TEMP_DIR, project_id, "audio_chunks"))
+        manager.hls_timelines.clear()
+        playlist = manager.hls_segments(project_id)
+        assert playlist["finished"]
+        assert keys(playlist["segments"])[:len(live)] == live and len(playlist["segments"]) == len(live) + 1
+        final_frames = sf.info(os.path.join(TEMP_DIR, project_id, "final_output.wav")).frames
+        assert sum(s["frames"] for s in playlist["segments"]) == final_frames
+
+        # El segmento codificado durante la síntesis sigue valiendo; uno nuevo sale del audio final
+        assert manager.hls_segment_file(project_id, first) == seg_path
+        assert manager.hls_segment_file(project_id, len(live)) is not None
+        text = media_playlist(playlist["segments"], 24000, True, lambda i: f"seg_{i}.mp3")
+        assert text.rstrip().endswith("#EXT-X-ENDLIST")
+        print("\n✅ EXITO: Lista HLS en directo por sub-partes, coherente con el audio final.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_live_playlist_grows_and_matches_final_audio()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import shutil
+from flask import Flask
+
+sys.path.append(os.getcwd())
+from http_cache import HotFileCache, send_cached
+
+TEMP_DIR = "test_http_cache_temp"
+
+def make_app(cache):
+    app = Flask(__name__)
+
+    @app.route("/file/<name>")
+    def serve(name):
+        immutable = name.endswith(".wav")
+        return send_cached(os.path.join(TEMP_DIR, name), "application/octet-stream", immutable=immutable, cache=cache)
+    return app
+
+def test_etag_immutable_conditional_and_range():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    os.makedirs(TEMP_DIR)
+    try:
+        payload = bytes(range(256)) * 40
+        for name in ("a.wav", "b.wav", "a.json"):
+            with open(os.path.join(TEMP_DIR, name), "wb") as f:
+                f.write(payload)
+
+        for cache in (None, HotFileCache(max_bytes=25000, max_file_bytes=12000)):
+            client = make_app(cache).test_client()
+            res = client.get("/file/a.wav")
+            assert res.status_code == 200 and res.data == payload
+            etag = res.headers["ETag"]
+            assert etag.startswith('"') # ETag fuerte
+            assert res.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+            # Revalidación: 304 sin cuerpo, también si pide un rango
+            res = client.get("/file/a.wav", headers={"If-None-Match": etag})
+            assert res.status_code == 304 and res.data == b""
+            res = client.get("/file/a.wav", headers={"If-None-Match": etag, "Range": "bytes=0-9"})
+            assert res.status_code == 304
+
+            # Rangos
+            res = client.get("/file/a.wav", headers={"Range": "bytes=100-199"})
+            assert res.status_code == 206 and res.data == payload[100:200]
+            assert res.headers["Content-Range"] == f"bytes 100-199/{len(payload)}"
+
+            # Lo que aún puede cambiar se revalida siempre
+            res = client.get("/file/a.json")
+            assert "no-cache" in res.headers["Cache-Control"] and "immutable" not in res.headers["Cache-Control"]
+
+        # Caché en memoria: acierta mientras el fichero no cambie y expulsa por LRU
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2
+        client.get("/file/b.wav") # 3 ficheros de 10 KB en 25 KB: sale el menos reciente
+        assert cache.stats()["evictions"] == 1 and cache.stats()["size_bytes"] <= 25000
+
+        time.sleep(0.01)
+        with open(os.path.join(TEMP_DIR, "b.wav"), "wb") as f:
+            f.write(b"regenerado")
+        res = client.get("/file/b.wav", headers={"If-None-Match": etag})
+        assert res.status_code == 200 and res.data == b"regenerado" and res.headers["ETag"] != etag
+        print("\n✅ EXITO: ETag, caché inmutable, peticiones condicionales y por rangos.")
+    finally:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_etag_immutable_conditional_and_range()
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+
+sys.path.append(os.getcwd())
+from manager import BatchManager
+import stub_manager
+from metrics import METRICS
+
+TEMP_DIR = "test_metrics_temp"
+
+class FakeTokenizer:
+    def phonemize(self, text, lang):
+        return text.lower()
+
+class FakeKokoro:
+    """Expone tokenizer como Kokoro, para recorrer la ruta fonemas + inferencia."""
+    tokenizer = FakeTokenizer()
+
+    def create(self, text, voice=None, speed=1.0, lang="es", is_phonemes=False):
+        assert is_phonemes
+        return np.full(len(text) * 100, 0.1, dtype=np.float32), 24000
+
+class StubBatchManager(stub_manager.StubBatchManager):
+    """Recorre la síntesis real (fonemas + inferencia) sobre FakeKokoro."""
+    _synthesize_sub_chunks = BatchManager._synthesize_sub_chunks
+
+    def __init__(self, projects_dir):
+        super().__init__(projects_dir)
+        self.kokoro = FakeKokoro()
+        self.model_state = "ready"
+        self.model_ready.set()
+
+def test_stage_spans_trace_and_prometheus_output():
+    manager = StubBatchManager(TEMP_DIR)
+    try:
+        text = " ".join(f"Frase número {i} del capítulo, con algo de texto." for i in range(20))
+        chunks_before = METRICS.get("tts_chunks_total", result="ok")
+        _, inference_before = METRICS.histogram("tts_stage_seconds", stage="inference")
+
+        project_id = manager.create_project("Traza", [text, "Fin del libro."], "em_alex", 1.0, "es")
+        assert manager.set_trace(project_id, True)
+        manager.process_chunk(project_id, 0)
+        manager.process_chunk(project_id, 1) # Completa el proyecto: ensambla
+
+        with open(os.path.join(TEMP_DIR, project_id, "trace.jsonl"), encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f]
+        stages = {s["stage"] for s in spans}
+        assert {"cleanup", "phonemize", "inference", "wav_write", "chunk", "status_write", "assemble"} <= stages
+        assert all(s["project_id"] == project_id for s in spans)
+        assert {s["chunk_id"] for s in spans if s["stage"] == "inference"} == {0, 1}
+
+        assert METRICS.get("tts_chunks_total", result="ok") == chunks_before + 2
+        _, inference_after = METRICS.histogram("tts_stage_seconds", stage="inference")
+        assert inference_after - inference_before >= 3 # Varias sub-partes en el primer chunk
+        assert METRICS.get("tts_chunks_in_flight") == 0
+
+        body = METRICS.render()
+        assert '# TYPE tts_stage_seconds histogram' in body
+        assert 'tts_stage_seconds_bucket{stage="inference",le="+Inf"}' in body
+        assert 'tts_lock_wait_seconds_count{lock="synthesis"}' in body
+        assert 'tts_chunks_total{result="ok"}' in body
+        print("\n✅ EXITO: Spans por etapa, traza por proyecto y exportación Prometheus.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_stage_spans_trace_and_prometheus_output()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import numpy as np
+
+sys.path.append(os.getcwd())
+import manager as manager_module
+from manager import BatchManager
+
+PROJECTS_DIR = "test_model_loading_temp"
+
+class SlowFakeKokoro:
+    """Sustituto de Kokoro que tarda en cargar y registra las inferencias."""
+    release = threading.Event()
+
+    def __init__(self, model_path, voices_path):
+        SlowFakeKokoro.release.wait(5)
+        self.calls = []
+
+    @classmethod
+    def from_session(cls, session, voices_path):
+        return cls(session, voices_path)
+
+    def get_voices(self):
+        return ["af_bella", "em_alex"]
+
+    def create(self, text, voice, speed=1.0, lang="en-us"):
+        self.calls.append((lang, len(text)))
+        return np.zeros(240, dtype=np.float32), 24000
+
+def test_background_load_and_warmup():
+    original = manager_module.Kokoro, manager_module.build_session
+    manager_module.Kokoro = SlowFakeKokoro
+    manager_module.build_session = lambda model_path, config=None: None
+    try:
+        start = time.perf_counter()
+        manager = BatchManager(PROJECTS_DIR, "modelo.onnx", "voces.bin")
+        # El constructor vuelve sin esperar al modelo
+        assert time.perf_counter() - start < 1
+        assert manager.readiness()["state"] == "loading"
+        try:
+            manager.get_kokoro(timeout=0.05)
+            assert False, "No debería estar listo todavía"
+        except RuntimeError:
+            pass
+
+        SlowFakeKokoro.release.set()
+        kokoro = manager.get_kokoro(timeout=5)
+        readiness = manager.readiness()
+        assert readiness["state"] == "ready"
+        assert readiness["load_seconds"] is not None and readiness["warmup_seconds"] is not None
+        # El calentamiento recorre todas las longitudes representativas
+        assert len(kokoro.calls) == len(manager_module.WARMUP_TEXTS)
+        manager.shutdown()
+        print("\n✅ EXITO: El modelo se carga y calienta en segundo plano.")
+    finally:
+        manager_module.Kokoro, manager_module.build_session = original
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+def test_variant_availability():
+    os.makedirs(PROJECTS_DIR, exist_ok=True)
+    try:
+        fp32 = os.path.join(PROJECTS_DIR, "kokoro-v1.0.onnx")
+        with open(fp32, "wb") as f:
+            f.write(b"modelo")
+        variants = {"fp32": fp32, "int8": os.path.join(PROJECTS_DIR, "kokoro-v1.0.int8.onnx")}
+        manager = BatchManager(PROJECTS_DIR, fp32, "voces.bin", load_model=False, model_variants=variants)
+        # Configurada pero sin fichero: /api/models la da como no disponible y crear un proyecto con ella falla
+        assert manager.variant_available("fp32") and not manager.variant_available("int8")
+        assert not manager.variant_available("fp16")
+        assert {v["id"]: v["available"] for v in manager.list_variants()} == {"fp32": True, "int8": False}
+        manager.shutdown()
+        print("\n✅ EXITO: Disponibilidad de las variantes del modelo.")
+    finally:
+        shutil.rmtree(PROJECTS_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_background_load_and_warmup()
+    test_variant_availability()
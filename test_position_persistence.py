@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import sys
+import shutil
+
+sys.path.append(os.getcwd())
+import manager as manager_module
+from stub_manager import StubBatchManager
+
+PROJECTS_DIR = "test_positions_temp"
+
+def _create_project(project_id):
+    project_path = os.path.join(PROJECTS_DIR, project_id)
+    os.makedirs(project_path, exist_ok=True)
+    status = {
+        "name": "Libro de Prueba",
+        "voice": "af_nicole",
+        "speed": 1.0,
+        "lang": "en-us",
+        "total_chunks": 3,
+        "completed_chunks": 0,
+        "last_chunk": 0,
+        "is_finished": False,
+        "chunks": [{"id": i, "text": f"Text fragment {i}", "status": "pending"} for i in range(3)]
+    }
+    with open(os.path.join(project_path, "status.json"), "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    return os.path.join(project_path, "status.json")
+
+def test_positions():
+    if os.path.exists(PROJECTS_DIR):
+        shutil.rmtree(PROJECTS_DIR)
+
+    manager_module.POSITION_FLUSH_INTERVAL = 0.1
+    manager = StubBatchManager(PROJECTS_DIR)
+    project_id = "test_project_positions"
+    status_path = _create_project(project_id)
+    status_mtime = os.path.getmtime(status_path)
+
+    try:
+        # 1. Muchas actualizaciones seguidas no deben reescribir status.json
+        for i in range(50):
+            assert manager.update_last_chunk(project_id, 2, sub_part=i % 4, offset=i * 0.5)
+        assert os.path.getmtime(status_path) == status_mtime, "status.json no debería reescribirse"
+
+        # 2. La posición se ve inmediatamente a través de get_project
+        project = manager.get_project(project_id)
+        assert project["last_chunk"] == 2
+        assert project["last_sub_part"] == 49 % 4
+        assert project["last_offset"] == 49 * 0.5
+
+        # 3. El hilo de volcado la persiste en position.json en pocos ciclos
+        position_path = os.path.join(PROJECTS_DIR, project_id, "position.json")
+        deadline = time.time() + 2
+        while not os.path.exists(position_path) and time.time() < deadline:
+            time.sleep(0.05)
+        with open(position_path, "r", encoding="utf-8") as f:
+            assert json.load(f)["last_chunk"] == 2
+
+        # 4. Al cerrar se vuelca lo pendiente y un manager nuevo lo recupera
+        manager.update_last_chunk(project_id, 1, sub_part=3, offset=12.5)
+        manager.shutdown()
+        fresh = StubBatchManager(PROJECTS_DIR)
+        project = fresh.get_project(project_id)
+        fresh.shutdown()
+        assert project["last_chunk"] == 1
+        assert project["last_sub_part"] == 3
+        assert project["last_offset"] == 12.5
+
+        # 5. Proyectos inexistentes se rechazan
+        assert not manager.update_last_chunk("no_existe", 1)
+        print("\n✅ EXITO: Las posiciones de lectura se registran sin tocar status.json.")
+    finally:
+        manager.shutdown()
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+if __name__ == "__main__":
+    test_positions()
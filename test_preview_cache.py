@@ -0,0 +1,62 @@
+import os
+import sys
+import shutil
+import threading
+
+sys.path.append(os.getcwd())
+from preview_cache import PreviewCache, preview_key, precompute_voice_samples
+
+TEMP_DIR = "test_preview_cache_temp"
+
+def test_preview_lru_and_background_samples():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    try:
+        cache = PreviewCache(TEMP_DIR, max_bytes=2500)
+        key = preview_key("Hola, esta es una prueba.", "ef_dora:0.70,em_alex:0.30", 1.0, "es", "fp32")
+        assert key == preview_key("Hola, esta es una prueba.", "ef_dora:0.70,em_alex:0.30", "1.0", "es", "fp32")
+        assert key != preview_key("Hola, esta es una prueba.", "ef_dora:0.70,em_alex:0.30", 1.2, "es", "fp32")
+
+        assert cache.get(key) is None
+        path = cache.put(key, b"RIFF" + b"a" * 996)
+        assert cache.get(key) == path and open(path, "rb").read(4) == b"RIFF"
+        cache.put("b", b"b" * 1000)
+        cache.get(key) # La previsualización repetida pasa a ser la más reciente
+        cache.put("c", b"c" * 1000) # Supera el límite: sale "b"
+        assert cache.get("b") is None and cache.get(key) == path
+        assert cache.put("enorme", b"x" * 3000) is None
+        stats = cache.stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["size_bytes"] <= 2500
+
+        # Persistente entre reinicios
+        assert PreviewCache(TEMP_DIR, max_bytes=2500).contains(key)
+
+        # Un fichero que desaparece (expulsado por otro hilo o proceso) es un fallo, no un error
+        os.remove(path)
+        assert cache.get(key) is None and not cache.contains(key)
+        assert cache.put(key, b"RIFF" + b"a" * 996) == path
+
+        # Muestras en segundo plano: solo con la síntesis ociosa, con el lock tomado
+        rendered = []
+        lock = threading.Lock()
+        idle = iter([False, False, True, True, True])
+        def render(text, voice):
+            assert lock.locked()
+            rendered.append(voice)
+            if voice == "rota":
+                raise RuntimeError("sin fonemas")
+            return b"RIFF" + voice.encode()
+        samples = [(preview_key("Hola", v, 1.0, "es"), ("Hola", v)) for v in ("ef_dora", "rota", "em_alex")]
+        generated = precompute_voice_samples(cache, samples, render, lambda: next(idle, True), lock=lock, poll=0.01)
+        assert generated == 2 and rendered == ["ef_dora", "rota", "em_alex"]
+        # Las que ya están no se vuelven a generar
+        assert precompute_voice_samples(cache, samples[:1] + samples[2:], render, lambda: True, lock=lock) == 0
+
+        stop = threading.Event()
+        stop.set()
+        assert precompute_voice_samples(cache, samples[1:2], render, lambda: False, stop=stop) == 0
+        print("\n✅ EXITO: Caché LRU de previsualizaciones y muestras de voz en segundo plano.")
+    finally:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_preview_lru_and_background_samples()
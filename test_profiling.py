@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import pstats
+import shutil
+import numpy as np
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+
+TEMP_DIR = "test_profiling_temp"
+
+def busy_synthesis(seconds):
+    """Trabajo de CPU reconocible en el perfil."""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+def busy_silence(sub_text):
+    busy_synthesis(0.2)
+    return np.zeros(2400, dtype=np.float32)
+
+def test_profiles_only_selected_jobs():
+    manager = StubBatchManager(TEMP_DIR, samples=busy_silence, split=False)
+    try:
+        project_id = manager.create_project("Perfil", ["uno", "dos", "tres"], "em_alex", 1.0, "es")
+        profiles_dir = os.path.join(TEMP_DIR, project_id, "profiles")
+
+        # Sin perfilado no se escribe nada
+        manager.process_chunk(project_id, 0)
+        assert not os.path.exists(profiles_dir)
+
+        # Perfil por petición: cProfile solo de esta síntesis
+        manager.process_chunk(project_id, 1, profile="cprofile")
+        prof = [f for f in os.listdir(profiles_dir) if f.endswith(".prof")]
+        assert len(prof) == 1 and prof[0].startswith("chunk_1_")
+        stats = pstats.Stats(os.path.join(profiles_dir, prof[0]))
+        assert any(func[2] == "busy_synthesis" for func in stats.stats)
+
+        # Perfil por proyecto: muestreo de pila
+        assert manager.set_profile(project_id, "sample")
+        manager.process_chunk(project_id, 2)
+        folded = [f for f in os.listdir(profiles_dir) if f.endswith(".folded")]
+        assert len(folded) == 1 and folded[0].startswith("chunk_2_")
+        with open(os.path.join(profiles_dir, folded[0]), encoding="utf-8") as f:
+            assert "busy_synthesis" in f.read()
+        print("\n✅ EXITO: El perfilado solo se activa en los trabajos elegidos.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_profiles_only_selected_jobs()
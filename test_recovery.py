@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from manager import ModelUnavailable
+from stub_manager import StubBatchManager
+from chunk_table import COMPLETED, PENDING, ERROR
+
+PROJECTS_DIR = "test_recovery_temp"
+
+def test_recovery():
+    if os.path.exists(PROJECTS_DIR):
+        shutil.rmtree(PROJECTS_DIR)
+    manager = StubBatchManager(PROJECTS_DIR)
+    try:
+        project_id = manager.create_project("Libro", [f"Texto {i}" for i in range(5)], "af_nicole", 1.0, "en-us")
+        chunks_dir = os.path.join(PROJECTS_DIR, project_id, "audio_chunks")
+        for cid in (0, 1, 2):
+            manager.process_chunk(project_id, cid)
+
+        # Simular una caída:
+        # - chunk 1 marcado como completado pero su WAV se perdió
+        os.remove(os.path.join(chunks_dir, "chunk_1.wav"))
+        # - chunk 2 con el WAV truncado y registrado como en vuelo en el journal
+        with open(os.path.join(chunks_dir, "chunk_2.wav"), "r+b") as f:
+            f.truncate(60)
+        manager.journal.begin(project_id, 2)
+        # - chunk 3 escrito a disco pero el estado no llegó a actualizarse
+        sf.write(os.path.join(chunks_dir, "chunk_3.wav"), np.zeros(240, dtype=np.float32), 24000)
+        with open(os.path.join(chunks_dir, "chunk_3.json"), "w", encoding="utf-8") as f:
+            f.write("[]")
+        # - chunk 4 con un temporal huérfano y en error
+        with open(os.path.join(chunks_dir, "chunk_4.wav.tmp"), "wb") as f:
+            f.write(b"RIFF")
+        manager._set_chunk_state(project_id, 4, ERROR)
+        manager.shutdown()
+
+        # "Reinicio": nuevo manager, reconciliación sin reanudar
+        fresh = StubBatchManager(PROJECTS_DIR)
+        assert fresh.recover_projects(resume=False) == [project_id]
+        table = fresh.chunk_tables[project_id]
+        assert [table.get(i) for i in range(5)] == [COMPLETED, PENDING, PENDING, COMPLETED, PENDING]
+        assert not os.path.exists(os.path.join(chunks_dir, "chunk_2.wav"))
+        assert not os.path.exists(os.path.join(chunks_dir, "chunk_4.wav.tmp"))
+        assert fresh.journal.in_flight(project_id) == set()
+
+        # Reanudación automática en segundo plano hasta ensamblar
+        fresh.recover_projects(resume=True)
+        deadline = time.time() + 10
+        while time.time() < deadline and not fresh.get_project(project_id).get("is_optimized"):
+            time.sleep(0.05)
+        project = fresh.get_project(project_id)
+        assert project["is_optimized"] and project["completed_chunks"] == 5
+        assert fresh.recover_projects(resume=False) == []
+        fresh.shutdown()
+        print("\n✅ EXITO: Proyecto reconciliado y reanudado tras la caída simulada.")
+    finally:
+        manager.shutdown()
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+class BlockingBatchManager(StubBatchManager):
+    """La síntesis se queda a medias hasta que el test la suelta."""
+    def __init__(self, projects_dir):
+        super().__init__(projects_dir)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def check_sub_part(self, sub_text):
+        self.started.set()
+        self.release.wait(10)
+
+def test_recovery_waits_for_running_synthesis():
+    if os.path.exists(PROJECTS_DIR):
+        shutil.rmtree(PROJECTS_DIR)
+    manager = BlockingBatchManager(PROJECTS_DIR)
+    try:
+        project_id = manager.create_project("Libro", ["Texto 0", "Texto 1"], "af_nicole", 1.0, "en-us")
+        synthesis = threading.Thread(target=manager.process_chunk, args=(project_id, 0))
+        synthesis.start()
+        assert manager.started.wait(5)
+
+        # La app arranca la reconciliación con un chunk en vuelo: debe esperar a que termine
+        recovery = threading.Thread(target=manager.recover_projects, kwargs={"resume": False})
+        recovery.start()
+        recovery.join(0.3)
+        assert recovery.is_alive()
+        assert manager.journal.in_flight(project_id) == {0}
+
+        manager.release.set()
+        synthesis.join(5)
+        recovery.join(5)
+        assert not recovery.is_alive()
+        assert manager.chunk_tables[project_id].get(0) == COMPLETED
+        assert os.path.exists(os.path.join(PROJECTS_DIR, project_id, "audio_chunks", "chunk_0.wav"))
+        print("\n✅ EXITO: La reconciliación no pisa una síntesis en curso.")
+    finally:
+        manager.release.set()
+        manager.shutdown()
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+class FailingBatchManager(StubBatchManager):
+    """Sin modelo (`unavailable`) o con un chunk cuyo texto no se puede sintetizar (`poison`)."""
+    def __init__(self, projects_dir):
+        super().__init__(projects_dir)
+        self.unavailable = False
+        self.error = ValueError
+
+    def check_sub_part(self, sub_text):
+        if self.unavailable:
+            raise ModelUnavailable("No se pudo cargar el modelo: sin fichero")
+        super().check_sub_part(sub_text)
+
+def test_resume_never_finishes_with_errors():
+    if os.path.exists(PROJECTS_DIR):
+        shutil.rmtree(PROJECTS_DIR)
+    manager = FailingBatchManager(PROJECTS_DIR)
+    try:
+        project_id = manager.create_project("Libro", [f"Texto {i}" for i in range(4)], "af_nicole", 1.0, "en-us")
+        final_path = os.path.join(PROJECTS_DIR, project_id, "final_output.wav")
+
+        # Modelo que no carga: la reanudación se detiene sin tocar los chunks
+        manager.unavailable = True
+        manager.enqueue_project(project_id)
+        thread = manager._resume_thread
+        thread.join(5)
+        assert not thread.is_alive() and manager._resume_thread is None
+        table = manager.chunk_tables[project_id]
+        assert [table.get(i) for i in range(4)] == [PENDING] * 4
+        assert not manager.get_project(project_id)["is_finished"]
+        assert manager.journal.in_flight(project_id) == set()
+
+        # Con modelo, un chunk en error no deja cerrar ni ensamblar el libro
+        manager.unavailable = False
+        manager.poison = {"Texto 2"}
+        manager.enqueue_project(project_id)
+        deadline = time.time() + 10
+        while time.time() < deadline and table.get(3) == PENDING:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        assert [table.get(i) for i in range(4)] == [COMPLETED, COMPLETED, ERROR, COMPLETED]
+        assert manager.process_next_chunk(project_id) is None
+        assert not manager.get_project(project_id)["is_finished"]
+        assert not os.path.exists(final_path)
+
+        # Tras reintentar el chunk, el proyecto se cierra
+        manager.poison = set()
+        manager.shutdown()
+        fresh = FailingBatchManager(PROJECTS_DIR)
+        assert fresh.recover_projects(resume=False) == [project_id]
+        assert fresh.process_next_chunk(project_id) == 2
+        assert fresh.process_next_chunk(project_id) is None
+        assert fresh.get_project(project_id)["is_finished"]
+        fresh.shutdown()
+        print("\n✅ EXITO: Sin modelo o con chunks en error el proyecto no se da por terminado.")
+    finally:
+        manager.shutdown()
+        if os.path.exists(PROJECTS_DIR):
+            shutil.rmtree(PROJECTS_DIR)
+
+if __name__ == "__main__":
+    test_recovery()
+    test_recovery_waits_for_running_synthesis()
+    test_resume_never_finishes_with_errors()
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import shutil
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from search_index import SearchIndex, SEARCH_INDEX_FILE, fold
+
+TEMP_DIR = "test_search_index_temp"
+
+def test_library_index_follows_projects():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    manager = StubBatchManager(TEMP_DIR)
+    try:
+        assert fold("Camión ÁRBOL ß") == "camion arbol ß"
+        lobo = manager.create_project("El lobo", [
+            "Harry Haller llegó a la ciudad una tarde de invierno.",
+            "Aquella noche vio el letrero: TEATRO MÁGICO. Entrada no para cualquiera.",
+        ], "em_alex", 1.0, "es")
+        otro = manager.create_project("Otro libro", [
+            "El camión cruzaba el teatro del pueblo; nada era mágico allí.",
+        ], "em_alex", 1.0, "es")
+
+        # Sin mayúsculas ni tildes; primero la frase exacta, con su offset en el chunk
+        matches = manager.search_index.search("teatro magico")
+        assert [(m["project_id"], m["chunk_id"], m["exact"]) for m in matches] == [(lobo, 1, True), (otro, 0, False)]
+        text = "Aquella noche vio el letrero: TEATRO MÁGICO. Entrada no para cualquiera."
+        assert matches[0]["offset"] == text.index("TEATRO") and "TEATRO MÁGICO" in matches[0]["snippet"]
+        assert manager.search_index.search("CAMION")[0]["chunk_id"] == 0
+        assert manager.search_index.search("teatro unicornio") == []
+        assert manager.search_index.search("teatro", project_id=otro)[0]["project_id"] == otro
+
+        # Renombrar y borrar actualizan el índice sin reindexar el resto
+        manager.rename_project(lobo, "El lobo estepario")
+        assert manager.search_index.search("Haller")[0]["name"] == "El lobo estepario"
+        manager.delete_project(otro)
+        assert manager.search_index.search("camión") == []
+        assert manager.search_index.stats()["projects"] == 1
+
+        # Proyecto de antes del índice: sync() solo indexa lo que falta
+        legacy_dir = os.path.join(TEMP_DIR, "1_antiguo")
+        os.makedirs(legacy_dir)
+        with open(os.path.join(legacy_dir, "status.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": "Antiguo", "chunks": [{"id": 0, "text": "Un viejo lobo de mar.", "status": "pending"}]}, f)
+        manager.sync_search_index()
+        assert {m["project_id"] for m in manager.search_index.search("lobo")} == {"1_antiguo"}
+        assert {m["project_id"] for m in manager.search_index.search("Harry")} == {lobo}
+
+        # Otro proceso (el servidor MCP) ve lo mismo abriendo el fichero
+        reader = SearchIndex(os.path.join(TEMP_DIR, SEARCH_INDEX_FILE))
+        assert reader.search("viejo lobo")[0] == dict(manager.search_index.search("viejo lobo")[0])
+        assert reader.sync(TEMP_DIR) == (0, 0)
+        reader.close()
+        print("\n✅ EXITO: Índice de búsqueda incremental de la biblioteca.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+class RacingConnection:
+    """Conexión que deja a otro proceso indexar el mismo proyecto justo tras buscarlo en projects."""
+    def __init__(self, conn, rival, project_id):
+        self.conn, self.rival, self.project_id = conn, rival, project_id
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def execute(self, sql, *args):
+        cursor = self.conn.execute(sql, *args)
+        if self.rival and "FROM projects WHERE project_id" in sql and not self.conn.in_transaction:
+            rival, self.rival = self.rival, None
+            rival.index_project(self.project_id, "Rival", ["Texto del rival."])
+        return cursor
+
+def test_concurrent_sync_and_late_exact_phrases():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    os.makedirs(TEMP_DIR)
+    path = os.path.join(TEMP_DIR, SEARCH_INDEX_FILE)
+    index, rival = SearchIndex(path), SearchIndex(path)
+    try:
+        # Dos procesos sincronizan a la vez: el segundo no choca con el proyecto del primero
+        for pid in ("1_uno", "2_dos"):
+            os.makedirs(os.path.join(TEMP_DIR, pid))
+            with open(os.path.join(TEMP_DIR, pid, "status.json"), "w", encoding="utf-8") as f:
+                json.dump({"name": pid, "chunks": [{"text": f"Libro {pid}."}]}, f)
+        index._conn = RacingConnection(index._connect(), rival, "1_uno")
+        assert index.sync(TEMP_DIR) == (2, 0)
+        assert index.project_ids() == {"1_uno", "2_dos"}
+        assert index.search("rival") == [] and index.search("1_uno")[0]["project_id"] == "1_uno"
+        assert index.stats()["chunks"] == 2
+
+        # La frase exacta aparece tras cientos de chunks con las dos palabras sueltas
+        chunks = ["El lobo dormía; el estepario velaba."] * 300 + ["Era el lobo estepario."]
+        index.index_project("3_lobo", "Lobo", chunks)
+        matches = index.search("lobo estepario", limit=3)
+        assert [(m["chunk_id"], m["exact"]) for m in matches] == [(300, True), (0, False), (1, False)]
+        print("\n✅ EXITO: Sincronización concurrente y frases exactas en chunks tardíos.")
+    finally:
+        index.close()
+        rival.close()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_library_index_follows_projects()
+    test_concurrent_sync_and_late_exact_phrases()
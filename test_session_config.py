@@ -0,0 +1,51 @@
+import os
+import sys
+import shutil
+import onnxruntime as rt
+
+sys.path.append(os.getcwd())
+from session_config import resolve_config, make_session_options, optimized_model_path
+
+TEMP_DIR = "test_session_config_temp"
+
+def test_session_options():
+    config = resolve_config({"intra_op_num_threads": 3, "execution_mode": "parallel",
+                             "inter_op_num_threads": 2, "graph_optimization_level": "extended",
+                             "enable_cpu_mem_arena": False})
+    so = make_session_options(config)
+    assert so.intra_op_num_threads == 3
+    assert so.inter_op_num_threads == 2
+    assert so.execution_mode == rt.ExecutionMode.ORT_PARALLEL
+    assert so.graph_optimization_level == rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    assert not so.enable_cpu_mem_arena
+
+    for bad in ({"threads": 4}, {"graph_optimization_level": "max"}, {"execution_mode": "async"}):
+        try:
+            resolve_config(bad)
+            assert False, f"Debería rechazar {bad}"
+        except ValueError:
+            pass
+
+def test_optimized_model_path():
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    try:
+        model = os.path.join(TEMP_DIR, "kokoro-v1.0.onnx")
+        with open(model, "wb") as f:
+            f.write(b"modelo")
+        config = resolve_config()
+        path = optimized_model_path(model, config, ["CPUExecutionProvider"])
+        assert os.path.dirname(path) == TEMP_DIR
+        assert os.path.basename(path).startswith("kokoro-v1.0.opt-") and path.endswith(".onnx")
+        # Mismo modelo y opciones: misma ruta. Otro nivel u otro modelo: otra ruta
+        assert path == optimized_model_path(model, config, ["CPUExecutionProvider"])
+        assert path != optimized_model_path(model, resolve_config({"graph_optimization_level": "basic"}), ["CPUExecutionProvider"])
+        with open(model, "ab") as f:
+            f.write(b" v2")
+        assert path != optimized_model_path(model, config, ["CPUExecutionProvider"])
+        print("\n✅ EXITO: Opciones de sesión y ruta de caché correctas.")
+    finally:
+        shutil.rmtree(TEMP_DIR)
+
+if __name__ == "__main__":
+    test_session_options()
+    test_optimized_model_path()
@@ -6,28 +6,19 @@ import sys
 
 # Añadir el directorio actual al path para importar manager
 sys.path.append(os.getcwd())
-from manager import BatchManager
+from stub_manager import StubBatchManager
 
 # Mock/Setup
 PROJECTS_DIR = "test_projects_temp"
 
 # No necesitamos cargar Kokoro real para este test de persistencia
-class MockBatchManager(BatchManager):
-    def __init__(self, projects_dir):
-        self.projects_dir = projects_dir
-        os.makedirs(self.projects_dir, exist_ok=True)
-        self.lock = threading.Lock()
-        self.status_lock = threading.Lock()
-        self.project_states = {}
-        # Saltamos la carga de Kokoro
-        print("[MOCK] Manager inicializado sin Kokoro para pruebas de estado.")
 
 def test_persistence():
     if os.path.exists(PROJECTS_DIR):
         import shutil
         shutil.rmtree(PROJECTS_DIR)
     
-    manager = MockBatchManager(PROJECTS_DIR)
+    manager = StubBatchManager(PROJECTS_DIR)
     
     # Crear un proyecto de prueba manual
     project_id = "test_project_concurrency"
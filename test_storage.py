@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import shutil
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+from storage import StorageManager, TRASH_DIR
+
+TEMP_DIR = "test_storage_temp"
+DAY = 24 * 3600
+
+def wave(sub_text):
+    t = np.arange(len(sub_text) * 200)
+    return (0.3 * np.sin(t / 9)).astype(np.float32)
+
+def make_book(manager, name, age_days):
+    project_id = manager.create_project(name, ["Capítulo uno. " * 20, "Capítulo dos. " * 20], "em_alex", 1.0, "es")
+    manager.process_chunk(project_id, 0)
+    manager.process_chunk(project_id, 1)
+    old = time.time() - age_days * DAY
+    for path in manager._status_paths(project_id):
+        os.utime(path, (old, old))
+    return project_id
+
+def test_quota_eviction_compaction_and_async_delete():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    manager = StubBatchManager(TEMP_DIR, samples=wave)
+    try:
+        old_book = make_book(manager, "Viejo", 30)
+        new_book = make_book(manager, "Nuevo", 10)
+        manager.update_last_chunk(new_book, 1) # Se está escuchando ahora
+        storage = StorageManager(manager, quota_bytes=None)
+
+        usage = storage.usage()
+        assert [p["project_id"] for p in usage["projects"]] == [new_book, old_book]
+        wav_bytes = usage["projects"][1]["audio_bytes"]
+        assert usage["projects"][1]["final_format"] == "wav"
+
+        # Compactación: solo el proyecto sin escuchar desde hace más de una semana
+        assert storage.compact_idle() == [old_book]
+        manager.cleanup.wait()
+        old_path = os.path.join(TEMP_DIR, old_book)
+        assert not os.path.exists(os.path.join(old_path, "final_output.wav"))
+        flac_path = manager.final_audio_path(old_book)
+        assert flac_path.endswith(".flac")
+        assert storage.project_usage(old_book)["audio_bytes"] < wav_bytes
+        # Sin pérdidas: mismas muestras y los segmentos HLS salen del FLAC
+        assert sf.info(flac_path).frames > 0 and manager.hls_segment_file(old_book, 0) is not None
+
+        # Cuota: se libera el audio del menos escuchado, conservando texto y tiempos
+        storage.quota_bytes = storage.usage()["total_bytes"] - 1
+        assert storage.enforce_quota() == [old_book]
+        manager.cleanup.wait()
+        project = manager.get_project(old_book)
+        assert project["audio_evicted"] and not project["is_optimized"] and project["completed_chunks"] == 0
+        assert os.path.exists(os.path.join(old_path, "chapters.json"))
+        assert manager.final_audio_path(old_book) is None
+        assert storage.project_usage(old_book)["audio_bytes"] == 0
+        assert storage.usage()["total_bytes"] <= storage.quota_bytes
+        assert not manager.reconcile_project(old_book) # No se reanuda solo al arrancar
+
+        # Se regenera bajo demanda al volver a escucharlo
+        manager.process_chunk(old_book, 0)
+        manager.process_chunk(old_book, 1)
+        project = manager.get_project(old_book)
+        assert project["is_optimized"] and "audio_evicted" not in project
+        assert manager.final_audio_path(old_book).endswith(".wav")
+
+        # Borrado asíncrono: desaparece al momento y la papelera se vacía en segundo plano
+        assert manager.delete_project(new_book)
+        assert not os.path.exists(os.path.join(TEMP_DIR, new_book))
+        assert new_book not in [p["id"] for p in manager.get_projects()]
+        manager.cleanup.wait()
+        assert os.listdir(os.path.join(TEMP_DIR, TRASH_DIR)) == []
+        assert manager.cleanup.stats()["deleted"] >= 1
+        print("\n✅ EXITO: Cuota con LRU, compactación a FLAC y borrado en segundo plano.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_eviction_keeps_chunk_timings():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    manager = StubBatchManager(TEMP_DIR, samples=wave)
+    try:
+        # A medio sintetizar: los chunks siguen en audio_chunks con su chunk_N.json
+        project_id = manager.create_project("A medias", ["Uno. Dos. " * 20, "Tres. " * 20], "em_alex", 1.0, "es")
+        manager.process_chunk(project_id, 0)
+        chunks_dir = os.path.join(TEMP_DIR, project_id, "audio_chunks")
+        meta_path = os.path.join(chunks_dir, "chunk_0.json")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            timings = f.read()
+
+        storage = StorageManager(manager, quota_bytes=None)
+        assert storage.project_usage(project_id)["audio_bytes"] > 0
+        assert manager.evict_audio(project_id) > 0
+        manager.cleanup.wait()
+        # Se borra el audio, no los tiempos del karaoke
+        assert os.listdir(chunks_dir) == ["chunk_0.json"]
+        assert storage.project_usage(project_id)["audio_bytes"] == 0
+        assert not manager.reconcile_project(project_id)
+        assert os.path.exists(meta_path) # La reconciliación tampoco los borra
+
+        # Al regenerarse, los tiempos coinciden con los de antes
+        manager.process_chunk(project_id, 0)
+        assert os.path.exists(os.path.join(chunks_dir, "chunk_0.wav"))
+        with open(meta_path, "r", encoding="utf-8") as f:
+            assert f.read() == timings
+        print("\n✅ EXITO: Liberar el audio conserva los tiempos de los chunks.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_quota_eviction_compaction_and_async_delete()
+    test_eviction_keeps_chunk_timings()
@@ -0,0 +1,39 @@
+import os
+import sys
+import shutil
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+from stub_manager import StubBatchManager
+
+TEMP_DIR = "test_streaming_temp"
+
+def noise(sub_text):
+    """Señal determinista y distinta para cada sub-parte."""
+    rng = np.random.default_rng(list(sub_text.encode("utf-8")))
+    return (rng.standard_normal(len(sub_text) * 100) * 0.1).astype(np.float32)
+
+def test_streaming_matches_concatenation():
+    manager = StubBatchManager(TEMP_DIR, samples=noise)
+    try:
+        text = " ".join(f"Frase número {i} del capítulo, con algo de texto." for i in range(40))
+        streamed_path = os.path.join(TEMP_DIR, "streamed.wav")
+        meta_stream, sr_stream = manager._generate_audio_to_file(text, "em_alex", 1.0, "es", streamed_path)
+
+        meta_concat, samples, sr_concat = manager._generate_audio_safe(text, "em_alex", 1.0, "es")
+        concat_path = os.path.join(TEMP_DIR, "concat.wav")
+        sf.write(concat_path, samples, sr_concat)
+
+        assert len(meta_stream) > 1, "El texto debería dividirse en varias sub-partes"
+        assert meta_stream == meta_concat and sr_stream == sr_concat
+        streamed, _ = sf.read(streamed_path, dtype="int16")
+        concatenated, _ = sf.read(concat_path, dtype="int16")
+        assert np.array_equal(streamed, concatenated)
+        print("\n✅ EXITO: La escritura por sub-partes produce el mismo WAV y metadatos.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_streaming_matches_concatenation()
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.getcwd())
+import manager as manager_module
+import stub_manager
+
+TEMP_DIR = "test_subpart_checkpoint_temp"
+
+SENTENCES = [f"Esta es la frase número {i} del capítulo, con bastante texto para llenar una sub-parte entera." for i in range(8)]
+BAD = "La palabra Xqzzy rompe el fonemizador."
+
+def constant(sub_text):
+    return np.full(len(sub_text) * 10, 0.1, dtype=np.float32)
+
+class StubBatchManager(stub_manager.StubBatchManager):
+    """10 muestras por carácter; las marcas de `poison` fallan como un error del texto."""
+    def __init__(self, projects_dir):
+        super().__init__(projects_dir, samples=constant)
+        self.sub_part_backoff = 0.01
+        self.error = ValueError # Del texto, como un fonema fuera del vocabulario
+        self.fail_once = set() # Marcas que fallan solo la primera vez (fallo transitorio)
+        self.broken = False # Fallo persistente que no depende del texto
+        self.unavailable = False # Modelo sin cargar
+
+    def check_sub_part(self, sub_text):
+        if self.unavailable:
+            raise manager_module.ModelUnavailable("modelo sin cargar")
+        if self.broken:
+            raise RuntimeError("fallo persistente simulado")
+        super().check_sub_part(sub_text)
+        transient = [mark for mark in self.fail_once if mark in sub_text]
+        if transient:
+            self.fail_once.difference_update(transient)
+            raise RuntimeError("fallo transitorio simulado")
+
+def test_retry_only_failed_sub_parts():
+    manager = StubBatchManager(TEMP_DIR)
+    try:
+        text = " ".join(SENTENCES[:4] + [BAD] + SENTENCES[4:])
+        project_id = manager.create_project("Checkpoint", [text, "Fin del libro."], "em_alex", 1.0, "es")
+        parts_dir = os.path.join(TEMP_DIR, project_id, "audio_chunks", "chunk_0.parts")
+        manager.poison = {"Xqzzy"}
+
+        try:
+            manager.process_chunk(project_id, 0)
+            assert False, "El chunk debería fallar"
+        except ValueError:
+            pass
+        assert manager.get_project(project_id)["chunks"][0]["status"] == "error"
+        # Las sub-partes anteriores a la mala quedaron en disco
+        with open(os.path.join(parts_dir, "parts.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        done = manifest["done"]
+        assert 1 <= len(done) < manifest["count"]
+        assert all(os.path.exists(os.path.join(parts_dir, f"part_{i}.wav")) for i in done)
+
+        # Reintento: solo se sintetiza lo que faltaba
+        manager.poison = set()
+        manager.calls = []
+        manager.process_chunk(project_id, 0)
+        assert not os.path.exists(parts_dir)
+        assert len(manager.calls) == manifest["count"] - len(done)
+
+        chunk_path = os.path.join(TEMP_DIR, project_id, "audio_chunks", "chunk_0.wav")
+        with open(chunk_path.replace(".wav", ".json"), encoding="utf-8") as f:
+            metadata = json.load(f)
+        samples, sr = sf.read(chunk_path)
+        assert len(samples) == sum(len(m["text"]) * 10 for m in metadata)
+        assert abs(sum(m["duration"] for m in metadata) - len(samples) / sr) < 1e-6
+        print("\n✅ EXITO: El reintento solo rehace las sub-partes que faltaban.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_bisect_isolates_bad_words():
+    manager = StubBatchManager(TEMP_DIR)
+    try:
+        # Una sola sub-parte con una palabra imposible: se divide hasta aislarla
+        manager.poison = {"Xqzzy"}
+        text = "Una frase larga y normal que contiene una palabra Xqzzy imposible en el centro de todo."
+        try:
+            manager._synthesize_resilient(text, "em_alex", 1.0, "es")
+            assert False, "La palabra imposible debería seguir fallando"
+        except ValueError:
+            pass
+        assert all(len(call) < len(text) for call in manager.calls[1:])
+        # Un error del texto no se reintenta: cada pieza se intenta una sola vez
+        assert len(manager.calls) == len(set(manager.calls))
+
+        # Un fallo transitorio se reintenta entero, sin partir la frase
+        manager.poison = set()
+        manager.fail_once = {"transitorio"}
+        manager.calls = []
+        text = "Primera mitad de la frase sin problemas, y segunda mitad con un fallo transitorio."
+        samples, sr = manager._synthesize_resilient(text, "em_alex", 1.0, "es")
+        assert len(samples) == len(text) * 10
+        assert manager.calls == [text, text]
+
+        # Un fallo que persiste se reintenta de forma acotada y se propaga sin dividir
+        manager.fail_once = set()
+        manager.calls = []
+        manager.broken = True
+        try:
+            manager._synthesize_resilient(text, "em_alex", 1.0, "es")
+            assert False, "El fallo persistente debería propagarse"
+        except RuntimeError:
+            pass
+        assert manager.calls == [text] * (1 + manager.sub_part_retries)
+        manager.broken = False
+
+        # Sin modelo se falla al momento, sin reintentos ni esperas
+        manager.unavailable = True
+        manager.sub_part_backoff = 60
+        manager.calls = []
+        try:
+            manager._synthesize_resilient(text, "em_alex", 1.0, "es")
+            assert False, "Sin modelo debería fallar"
+        except manager_module.ModelUnavailable:
+            pass
+        assert manager.calls == [text]
+
+        assert manager_module._bisect_text("corto") is None
+        left, right = manager_module._bisect_text("uno dos tres cuatro cinco seis siete ocho")
+        assert left.endswith("cuatro") or left.endswith("cinco")
+        print("\n✅ EXITO: Las sub-partes fallidas se dividen y reintentan de forma acotada.")
+    finally:
+        manager.shutdown()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_retry_only_failed_sub_parts()
+    test_bisect_isolates_bad_words()
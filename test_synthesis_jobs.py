@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.getcwd())
+from synthesis_jobs import SynthesisJobs, QueueFull
+
+class BlockingManager:
+    """process_chunk espera a que el test lo libere; el chunk 99 falla."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def process_chunk(self, project_id, chunk_id):
+        self.calls.append(chunk_id)
+        self.started.set()
+        self.release.wait(5)
+        if chunk_id == 99:
+            raise RuntimeError("fallo simulado")
+
+def test_jobs_return_immediately_and_report_queue():
+    manager = BlockingManager()
+    jobs = SynthesisJobs(manager, max_workers=1, max_queue=2)
+    try:
+        first = jobs.submit("p", 0)
+        assert first["status"] == "queued" and first["id"]
+        assert manager.started.wait(5)
+        assert jobs.get(first["id"])["status"] == "running"
+
+        # El mismo chunk no se encola dos veces
+        assert jobs.submit("p", 0)["id"] == first["id"]
+
+        second = jobs.submit("p", 1)
+        third = jobs.submit("p", 99)
+        assert jobs.get(third["id"])["queue_position"] == 1
+        try:
+            jobs.submit("p", 2)
+            assert False, "La cola debería estar llena"
+        except QueueFull:
+            pass
+        stats = jobs.stats()
+        assert stats["running"] == 1 and stats["queued"] == 2 and stats["rejected"] == 1
+
+        manager.release.set()
+        assert jobs.wait(first["id"], timeout=5)["status"] == "done"
+        assert jobs.wait(second["id"], timeout=5)["status"] == "done"
+        failed = jobs.wait(third["id"], timeout=5)
+        assert failed["status"] == "error" and "fallo simulado" in failed["error"]
+        stats = jobs.stats()
+        assert stats["completed"] == 2 and stats["failed"] == 1 and stats["queued"] == 0
+        assert manager.calls == [0, 1, 99]
+        print("\n✅ EXITO: Los trabajos de síntesis se encolan sin bloquear y la cola es visible.")
+    finally:
+        manager.release.set()
+        jobs.shutdown(wait=True)
+
+if __name__ == "__main__":
+    test_jobs_return_immediately_and_report_queue()
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import shutil
+import numpy as np
+import onnxruntime as rt
+
+sys.path.append(os.getcwd())
+import shared_weights
+from voice_pack import VoicePack, load_voice_pack, voice_pack_path
+from session_config import build_session
+
+TEMP_DIR = "test_voice_pack_temp"
+
+def make_voices(path, names=("ef_dora", "em_alex", "af_bella")):
+    rng = np.random.default_rng(0)
+    voices = {name: rng.standard_normal((510, 1, 256)).astype(np.float32) for name in names}
+    with open(path, "wb") as f:
+        np.savez(f, **voices)
+    return voices
+
+def make_model(path):
+    """MatMul + Tanh con un peso de 256x256 (se comparte) y un sesgo pequeño (se queda en el grafo)."""
+    from onnx import helper, numpy_helper, TensorProto, save
+    rng = np.random.default_rng(1)
+    weight = numpy_helper.from_array(rng.standard_normal((256, 256)).astype(np.float32), "weight")
+    bias = numpy_helper.from_array(rng.standard_normal(256).astype(np.float32), "bias")
+    graph = helper.make_graph(
+        [helper.make_node("MatMul", ["x", "weight"], ["h"]),
+         helper.make_node("Add", ["h", "bias"], ["a"]),
+         helper.make_node("Tanh", ["a"], ["y"])],
+        "prueba", [helper.make_tensor_value_info("x", TensorProto.FLOAT, [None, 256])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [None, 256])], [weight, bias])
+    save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)], ir_version=8), path)
+
+def test_voice_pack_is_memory_mapped():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    os.makedirs(TEMP_DIR)
+    try:
+        voices_path = os.path.join(TEMP_DIR, "voices-v1.0.bin")
+        voices = make_voices(voices_path)
+        pack = load_voice_pack(voices_path)
+        assert os.path.exists(voice_pack_path(voices_path))
+        assert load_voice_pack(voices_path) is pack # Uno por proceso
+
+        # Mismo interfaz que el .npz que usa kokoro-onnx
+        assert sorted(pack.keys()) == sorted(voices) and len(pack) == 3 and "em_alex" in pack
+        assert "xx_nadie" not in pack
+        for name, style in voices.items():
+            assert np.array_equal(pack[name], style)
+        # Cada voz es una vista de solo lectura sobre el fichero mapeado, sin copia
+        style = pack["em_alex"]
+        assert np.shares_memory(style, pack.array) and isinstance(pack.array, np.memmap)
+        assert not style.flags.writeable
+        assert np.shares_memory(style[4], pack["em_alex"]) # Lo que hace Kokoro con cada chunk
+
+        # Otro fichero de voces (otro tamaño o mtime): otro paquete
+        time.sleep(0.01)
+        voices = make_voices(voices_path, names=("ef_dora", "em_santa"))
+        assert voice_pack_path(voices_path) != pack.path
+        assert sorted(load_voice_pack(voices_path)) == ["ef_dora", "em_santa"]
+        assert np.array_equal(VoicePack(voice_pack_path(voices_path))["em_santa"], voices["em_santa"])
+        print("\n✅ EXITO: Paquete de voces mapeado en memoria.")
+    finally:
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+def test_shared_weights_session():
+    if not shared_weights.available():
+        print("onnx no está instalado: se omite la prueba de pesos compartidos.")
+        return
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    os.makedirs(TEMP_DIR)
+    try:
+        model_path = os.path.join(TEMP_DIR, "modelo.onnx")
+        make_model(model_path)
+        x = np.random.default_rng(2).standard_normal((4, 256)).astype(np.float32)
+        expected = build_session(model_path, {"cache_optimized_model": False}).run(None, {"x": x})[0]
+
+        config = {"shared_weights": True, "prepack_weights": False}
+        session = build_session(model_path, config)
+        assert np.allclose(session.run(None, {"x": x})[0], expected, atol=1e-5)
+
+        # El peso grande está en el fichero compartido, alineado a página; el sesgo no
+        optimized = [p for p in os.listdir(TEMP_DIR) if ".opt-" in p and ".shared-" not in p]
+        assert len(optimized) == 1 # Se parte del grafo optimizado en caché
+        graph_path, weights_path, index_path = shared_weights.shared_model_paths(os.path.join(TEMP_DIR, optimized[0]))
+        values = shared_weights.shared_initializers(weights_path, index_path)
+        assert list(values) == ["weight"] and os.path.getsize(weights_path) == 256 * 256 * 4
+
+        # Una segunda sesión del proceso reutiliza los mismos OrtValue sobre el mapeo
+        again = build_session(model_path, config)
+        assert shared_weights.shared_initializers(weights_path, index_path)["weight"] is values["weight"]
+        assert np.allclose(again.run(None, {"x": x})[0], expected, atol=1e-5)
+
+        # El grafo reescrito es un .onnx válido por sí solo (datos externos)
+        standalone = rt.InferenceSession(graph_path, providers=["CPUExecutionProvider"])
+        assert np.allclose(standalone.run(None, {"x": x})[0], expected, atol=1e-5)
+        print("\n✅ EXITO: Sesiones con pesos compartidos.")
+    finally:
+        shared_weights._SHARED.clear()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_voice_pack_is_memory_mapped()
+    test_shared_weights_session()
@@ -0,0 +1,86 @@
+"""
+Paquete de voces en un único array mapeado en memoria.
+
+voices-v1.0.bin es un .npz: kokoro-onnx lo abre con np.load y cada consulta de una voz
+lee y descomprime su array (510 x 1 x 256 float32) en memoria privada del proceso, en
+cada chunk. Aquí las voces se convierten una vez a un .npy contiguo
+(<voces>.pack-<huella>.npy, con los nombres en un .json al lado) que se abre con
+mmap_mode="r": cada voz es una vista sin copia sobre el fichero y las páginas las
+comparte el sistema operativo entre todos los procesos que lo abren (workers del modo
+batch, varias instancias del servidor). VoicePack se comporta como el diccionario de
+voces de kokoro-onnx, así que sustituye a Kokoro.voices sin más cambios.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections.abc import Mapping
+import numpy as np
+
+_PACKS = {} # Ruta del paquete -> VoicePack, uno por proceso
+_PACKS_LOCK = threading.Lock()
+
+def voice_pack_path(voices_path):
+    """Ruta del paquete, con una huella (tamaño y mtime) del fichero de voces original."""
+    st = os.stat(voices_path)
+    digest = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+    base, _ = os.path.splitext(voices_path)
+    return f"{base}.pack-{digest}.npy"
+
+def build_voice_pack(voices_path, pack_path):
+    """Convierte el .npz de voces al paquete. Escritura atómica (varios procesos pueden construirlo a la vez)."""
+    with np.load(voices_path) as voices:
+        names = sorted(voices.files)
+        first = voices[names[0]]
+        tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+        # Voz a voz sobre un memmap: no hace falta tener todas en memoria a la vez
+        pack = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=first.dtype, shape=(len(names),) + first.shape)
+        for i, name in enumerate(names):
+            pack[i] = voices[name]
+        pack.flush()
+        del pack
+    names_path = pack_path[:-len(".npy")] + ".json"
+    with open(names_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    os.replace(names_path + ".tmp", names_path)
+    os.replace(tmp_path, pack_path)
+
+class VoicePack(Mapping):
+    def __init__(self, pack_path):
+        self.path = pack_path
+        with open(pack_path[:-len(".npy")] + ".json", "r", encoding="utf-8") as f:
+            names = json.load(f)
+        self.array = np.load(pack_path, mmap_mode="r")
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def __getitem__(self, name):
+        # Vista de solo lectura sobre el fichero mapeado (sin copia)
+        return self.array[self.index[name]]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+def load_voice_pack(voices_path):
+    """VoicePack de `voices_path`; lo construye la primera vez y lo reutiliza en el proceso."""
+    pack_path = voice_pack_path(voices_path)
+    with _PACKS_LOCK:
+        pack = _PACKS.get(pack_path)
+        if pack is None:
+            if not os.path.exists(pack_path):
+                print(f"Creando paquete de voces mapeable: {pack_path}")
+                build_voice_pack(voices_path, pack_path)
+            pack = _PACKS[pack_path] = VoicePack(pack_path)
+        return pack